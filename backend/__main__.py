@@ -1,4 +1,74 @@
-import uvicorn
+"""
+Backend entry point.
+
+    python -m backend                      # run the API (same as before)
+    python -m backend serve --port 8000
+    python -m backend index ./corpus --domain education
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Backend modules import each other from the backend directory (config.settings, agents...)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def serve(args):
+    import uvicorn
+
+    uvicorn.run("main:app", host=args.host, port=args.port, reload=args.reload, app_dir=BACKEND_DIR)
+
+
+def index(args):
+    from agents.ingestion.bulk_indexer import BulkIndexer
+    from utils.pdf_extraction import shutdown_process_pool
+
+    indexer = BulkIndexer(args.directory, domain=args.domain, manifest_path=args.manifest,
+                          concurrency=args.concurrency, user_id=args.user_id, force=args.force)
+    try:
+        report = asyncio.run(indexer.run())
+    finally:
+        shutdown_process_pool()
+
+    print(f"{report.indexed} indexed, {report.skipped} skipped (unchanged), {len(report.failed)} failed")
+    print(f"{report.pages} pages, {report.chunks} chunks in {report.seconds:.1f}s: "
+          f"{report.pages_per_second:.1f} pages/s, {report.chunks_per_second:.1f} chunks/s")
+    if report.failed:
+        print("failed: " + ", ".join(report.failed))
+        sys.exit(1)
+
+
+def main():
+    from config.settings import settings
+
+    parser = argparse.ArgumentParser(prog="python -m backend")
+    commands = parser.add_subparsers(dest="command")
+
+    serve_parser = commands.add_parser("serve", help="run the API server")
+    serve_parser.add_argument("--host", default="0.0.0.0")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    serve_parser.add_argument("--no-reload", dest="reload", action="store_false")
+    serve_parser.set_defaults(handler=serve)
+
+    index_parser = commands.add_parser("index", help="bulk index a directory of PDFs into the configured vector store "
+                                                   f"({settings.VECTOR_BACKEND})")
+    index_parser.add_argument("directory")
+    index_parser.add_argument("--domain", choices=("health", "education"), default="health")
+    index_parser.add_argument("--manifest", help="progress file (default: <directory>/.index_manifest.json)")
+    index_parser.add_argument("--concurrency", type=int, help="files indexed at once (default: INDEX_CONCURRENCY)")
+    index_parser.add_argument("--user-id", help="owner recorded on the indexed chunks")
+    index_parser.add_argument("--force", action="store_true", help="re-index files the manifest marks as done")
+    index_parser.set_defaults(handler=index)
+
+    args = parser.parse_args()
+    if args.command is None:
+        args = parser.parse_args(["serve"])
+    args.handler(args)
+
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    main()
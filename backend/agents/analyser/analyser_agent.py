@@ -1,9 +1,10 @@
 # backend/agents/analyser/analyser_agent.py
 
 import httpx
-import json
-from typing import List, Dict, Any, Union
+from httpx_sse import aconnect_sse
+from typing import Callable, List, Dict, Any, Optional, Union
 from core.config import settings
+from utils.stream_parser import JsonStreamParser
 
 
 GROQ_API_KEY = settings.GROQ_API_KEY
@@ -27,15 +28,21 @@ class AnalyserAgent:
         self.endpoint = "https://api.groq.com/openai/v1/chat/completions"
 
     async def analyse(
-        self, points: List[str], title: str, audience: str
+        self, points: List[str], title: str, audience: str,
+        on_field: Optional[Callable[[str, Any], None]] = None,
     ) -> Dict[str, Union[str, List[str]]]:
         """
         Generate a structured report JSON object from bullet points.
 
+        The completion is streamed and parsed as it arrives; a truncated or
+        trailing-garbage reply is repaired instead of discarded.
+
         Args:
             points (List[str]): Extracted bullet points.
             title (str): Report title.
             audience (str): Target audience.
+            on_field (Callable, optional): Called with (field, value) as soon
+                as each top-level report field is complete.
 
         Returns:
             Dict[str, Any]: Structured report.
@@ -65,28 +72,44 @@ class AnalyserAgent:
                 {"role": "user", "content": prompt},
             ],
             "temperature": 0.3,
+            "stream": True,
         }
 
+        parser = JsonStreamParser(max_depth=1)
+        deltas: List[str] = []
         async with httpx.AsyncClient(timeout=60) as client:
             try:
-                resp = await client.post(self.endpoint, headers=self.headers, json=payload)
-                resp.raise_for_status()
-                data = resp.json()
+                async with aconnect_sse(client, "POST", self.endpoint, headers=self.headers, json=payload) as events:
+                    if events.response.is_error:
+                        await events.response.aread()
+                    events.response.raise_for_status()
+                    async for event in events.aiter_sse():
+                        if event.data == "[DONE]":
+                            break
+                        # Extract model output
+                        try:
+                            delta = event.json()["choices"][0]["delta"].get("content")
+                        except (KeyError, IndexError, ValueError) as e:
+                            return {"error": f"⚠️ Unexpected Groq response format: {e}", "main_points": points}
+                        if not delta:
+                            continue
+                        deltas.append(delta)
+                        for path, value in parser.feed(delta):
+                            if on_field:
+                                on_field(path[0], value)
             except httpx.RequestError as e:
                 return {"error": f"❌ Request failed: {str(e)}", "main_points": points}
             except httpx.HTTPStatusError as e:
                 return {"error": f"❌ Groq API returned {e.response.status_code}: {e.response.text}", "main_points": points}
 
-        # Extract model output
-        try:
-            raw = data["choices"][0]["message"]["content"]
-        except (KeyError, IndexError) as e:
-            return {"error": f"⚠️ Unexpected Groq response format: {e}", "main_points": points}
+        raw = "".join(deltas)
 
-        # Parse JSON safely
+        # Parse JSON safely, repairing a truncated reply
         try:
-            parsed = json.loads(raw)
-        except json.JSONDecodeError:
+            parsed = parser.close()
+            if not isinstance(parsed, dict):
+                raise ValueError("report is not a JSON object")
+        except ValueError:
             return {
                 "introduction": raw[:300],
                 "main_points": points,
@@ -0,0 +1,156 @@
+# agents/education/bulk_grader.py
+import asyncio
+import logging
+import re
+import statistics
+import time
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from config.settings import settings
+from utils.pdf_extraction import PdfSource, stream_pdf_page_batches
+from agents.education.evaluator import evaluator
+from agents.education.feedback_templates import SCORE_BUCKETS, score_bucket
+
+logger = logging.getLogger(__name__)
+
+# Lowest-accuracy questions listed in the class summary
+HARDEST_QUESTIONS = 5
+
+
+def parse_answer_key(raw: Optional[str]) -> Optional[List[str]]:
+    """'A,C,B,D', 'A C B D' or 'ACBD' -> ['A', 'C', 'B', 'D']"""
+    if not raw or not raw.strip():
+        return None
+    letters = re.findall(r'[A-D]', raw.upper())
+    if not letters or re.sub(r'[A-D\s,;|\[\]"\']', '', raw.upper()):
+        raise ValueError("Answer key must list options A-D in question order, e.g. 'A,C,B,D'")
+    return letters
+
+
+def summarize_class(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Class-level aggregates over the per-student results"""
+    graded = [result for result in results if not result.get("error")]
+    scores = [result["score_percentage"] for result in graded]
+
+    per_question: Dict[int, Counter] = {}
+    for result in graded:
+        for item in result["detailed_results"]:
+            counts = per_question.setdefault(item["question_number"], Counter())
+            counts["attempts"] += 1
+            counts["correct"] += int(item["is_correct"])
+    question_stats = [
+        {
+            "question_number": number,
+            "attempts": counts["attempts"],
+            "correct": counts["correct"],
+            "accuracy": round(counts["correct"] / counts["attempts"] * 100, 2),
+        }
+        for number, counts in sorted(per_question.items())
+    ]
+
+    distribution = Counter(score_bucket(score) for score in scores)
+    return {
+        "type": "summary",
+        "students": len(results),
+        "graded": len(graded),
+        "failed": [result["student"] for result in results if result.get("error")],
+        "average_score": round(statistics.mean(scores), 2) if scores else 0.0,
+        "median_score": round(statistics.median(scores), 2) if scores else 0.0,
+        "highest_score": max(scores, default=0.0),
+        "lowest_score": min(scores, default=0.0),
+        "score_distribution": {bucket: distribution.get(bucket, 0) for bucket, _ in SCORE_BUCKETS},
+        "question_stats": question_stats,
+        "hardest_questions": [
+            item["question_number"]
+            for item in sorted(question_stats, key=lambda item: item["accuracy"])[:HARDEST_QUESTIONS]
+        ],
+    }
+
+
+class BulkGrader:
+    """
+    Grades a class's answer sheets. Each sheet is extracted in the shared
+    process pool and parsed with evaluator.parse_answer_sheet: the regex
+    parser reads it page by page, and only pages it can't fully read go to
+    the LLM, under a cap shared by every sheet in the batch.
+    Grading itself uses template feedback, so it makes no network call.
+    """
+
+    def __init__(self, concurrency: Optional[int] = None, llm_concurrency: Optional[int] = None):
+        self.concurrency = concurrency or settings.BULK_GRADE_CONCURRENCY
+        self.llm_concurrency = llm_concurrency or settings.BULK_GRADE_LLM_CONCURRENCY
+
+    async def grade_sheet(self, index: int, student: str, source: PdfSource,
+                          answer_key: Optional[List[str]] = None,
+                          llm_semaphore: Optional[asyncio.Semaphore] = None) -> Dict[str, Any]:
+        """Grade one student's sheet; failures are reported in the result instead of raised"""
+        llm_semaphore = llm_semaphore or asyncio.Semaphore(self.llm_concurrency)
+        started = time.perf_counter()
+        counts: Dict[str, int] = {}
+        try:
+            pages = []
+            async for batch in stream_pdf_page_batches(source):
+                pages.extend(page.text for page in batch)
+
+            questions = await evaluator.parse_answer_sheet(pages, answer_key is not None,
+                                                           llm_semaphore, stats=counts)
+            if not questions:
+                raise ValueError("No questions found in PDF")
+
+            for question in questions:
+                question["user_answer"] = str(question.get("user_answer") or "")
+                question["correct_answer"] = str(question.get("correct_answer") or "")
+            if answer_key:
+                for question, correct_answer in zip(questions, answer_key):
+                    question["correct_answer"] = correct_answer
+
+            evaluation = await evaluator.grade_answers(
+                questions, [question["user_answer"] for question in questions]
+            )
+            result = {"type": "student", "index": index, "student": student, **evaluation}
+        except Exception as e:
+            logger.error(f"Grading sheet {student} failed: {e}")
+            result = {"type": "student", "index": index, "student": student, "error": str(e)}
+
+        result["pages"] = dict(counts)
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        return result
+
+    async def grade_sheets(self, sheets: List[Tuple[str, PdfSource]],
+                           answer_key: Optional[List[str]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield each student's result as soon as their sheet is graded (in
+        completion order, tagged with its upload index), then the class summary.
+        """
+        started = time.perf_counter()
+        sheet_semaphore = asyncio.Semaphore(self.concurrency)
+        llm_semaphore = asyncio.Semaphore(self.llm_concurrency)
+
+        async def grade(index: int, student: str, source: PdfSource) -> Dict[str, Any]:
+            async with sheet_semaphore:
+                return await self.grade_sheet(index, student, source, answer_key, llm_semaphore)
+
+        tasks = [asyncio.create_task(grade(index, student, source))
+                 for index, (student, source) in enumerate(sheets)]
+        results: List[Dict[str, Any]] = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                results.append(result)
+                yield result
+        finally:
+            # The client went away mid-stream: stop grading the rest
+            for task in tasks:
+                task.cancel()
+
+        summary = summarize_class(sorted(results, key=lambda result: result["index"]))
+        summary["llm_pages"] = sum(result["pages"].get("llm", 0) for result in results)
+        summary["regex_pages"] = sum(result["pages"].get("regex", 0) for result in results)
+        summary["seconds"] = round(time.perf_counter() - started, 3)
+        logger.info(f"Graded {summary['graded']}/{summary['students']} sheets in {summary['seconds']}s "
+                    f"({summary['regex_pages']} pages by regex, {summary['llm_pages']} by LLM)")
+        yield summary
+
+# Global bulk grader instance
+bulk_grader = BulkGrader()
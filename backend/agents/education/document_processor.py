@@ -1,131 +1,187 @@
 # agents/education/document_processor.py
 import logging
-import re
 import uuid
-from typing import List, Dict, Any
-import PyPDF2
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Any, AsyncIterator, Iterable, Iterator, Optional
 
 from config.settings import settings
-from agents.health.qdrant_client import qdrant_client  # Reuse existing Qdrant client
+from agents.health.qdrant_client import vector_stores
+from utils.pdf_extraction import (PageText, PdfSource, describe_source, iter_pdf_pages,
+                                  stream_pdf_page_batches)
+from utils.text_chunker import Chunk, TextChunker
+from utils.keyword_tagger import KeywordTagger
+from utils.embedding_service import embedding_service
 
 logger = logging.getLogger(__name__)
 
+# Chunks embedded and upserted per round trip while streaming a document
+STORE_BATCH_SIZE = 64
+
+SOURCE = "educational_content"
+
+# Education chunks live in their own collection, apart from health documents
+education_store = vector_stores["education"]
+
+# Keyword vocabularies for chunk tagging; pass another mapping to the processor to override
+EDUCATION_VOCABULARY = {
+    "concepts": [
+        'definition', 'concept', 'theory', 'principle', 'example',
+        'exercise', 'problem', 'solution', 'method', 'technique',
+        'algorithm', 'formula', 'equation', 'theorem', 'proof'
+    ],
+    "difficulty_hard": ['advanced', 'complex', 'sophisticated', 'proof', 'theorem'],
+    "difficulty_medium": ['intermediate', 'method', 'technique', 'example'],
+}
+
 class EducationDocumentProcessor:
-    def __init__(self):
-        self.embedding_model = None
+    def __init__(self, vocabulary: Optional[Dict[str, List[str]]] = None):
+        self.tagger = KeywordTagger(vocabulary or EDUCATION_VOCABULARY)
+        # Paragraphs stay separate chunks; long ones are split on sentences
+        self.chunker = TextChunker(settings.EDU_CHUNK_TOKENS, split_on_paragraphs=True)
         
     async def initialize(self):
         """Initialize document processor"""
         try:
-            self.embedding_model = SentenceTransformer(settings.HF_MODEL_NAME)
-            return True
+            # The embedding model is shared with the health agent
+            return await embedding_service.initialize() and await education_store.initialize()
         except Exception as e:
             logger.error(f"Failed to initialize education document processor: {e}")
             return False
     
-    def extract_text_from_pdf(self, pdf_path: str) -> str:
+    def extract_text_from_pdf(self, pdf_path: PdfSource) -> str:
         """Extract text from educational PDF"""
         try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                full_text = ""
-                
-                for page_num, page in enumerate(pdf_reader.pages):
-                    text = page.extract_text()
-                    if text:
-                        # Add page context for educational content
-                        full_text += f"## Page {page_num+1} ##\n{text}\n\n"
-                return full_text
+            # Add page context for educational content
+            return "".join(f"## Page {page.page_number} ##\n{page.text}\n\n"
+                           for page in iter_pdf_pages(pdf_path))
         except Exception as e:
             logger.error(f"PDF extraction failed: {e}")
             raise
     
-    def chunk_educational_content(self, text: str, chunk_size: int = 800) -> List[Dict[str, Any]]:
-        """Split educational content into meaningful chunks"""
-        # Split by sections, headings, or paragraphs
-        sections = re.split(r'(?:\n\s*){2,}', text)  # Split by multiple newlines
-        
-        chunks = []
-        chunk_id = 0
-        
-        for section in sections:
-            if not section.strip():
-                continue
-                
-            # Further split large sections
-            if len(section) > chunk_size:
-                sentences = re.split(r'(?<=[.!?])\s+', section)
-                current_chunk = ""
-                
-                for sentence in sentences:
-                    if len(current_chunk) + len(sentence) <= chunk_size:
-                        current_chunk += sentence + " "
-                    else:
-                        if current_chunk.strip():
-                            chunks.append(self._create_chunk(current_chunk.strip(), chunk_id))
-                            chunk_id += 1
-                        current_chunk = sentence + " "
-                
-                if current_chunk.strip():
-                    chunks.append(self._create_chunk(current_chunk.strip(), chunk_id))
-                    chunk_id += 1
-            else:
-                chunks.append(self._create_chunk(section.strip(), chunk_id))
-                chunk_id += 1
-        
-        return chunks
+    def chunk_educational_content(self, text: str, chunk_size: int = None) -> List[Dict[str, Any]]:
+        """Split educational content into meaningful chunks (chunk_size in tokens)"""
+        chunker = self.chunker
+        if chunk_size:
+            chunker = TextChunker(chunk_size, split_on_paragraphs=True)
+        return self._apply_tags([self._create_chunk(chunk) for chunk in chunker.chunk_text(text)])
+    
+    def chunk_pages(self, pages: Iterable[PageText]) -> Iterator[Dict[str, Any]]:
+        """Chunk a stream of pages, yielding chunks page by page"""
+        for chunk in self.chunker.iter_chunks(pages):
+            yield self._apply_tags([self._create_chunk(chunk)])[0]
     
-    def _create_chunk(self, text: str, chunk_id: int) -> Dict[str, Any]:
+    def _create_chunk(self, chunk: Chunk, doc_id: Optional[str] = None) -> Dict[str, Any]:
         """Create a standardized chunk with metadata"""
         return {
-            "id": str(uuid.uuid4()),
-            "text": text,
-            "chunk_index": chunk_id,
-            "source": "educational_content",
+            # Deterministic per document, so indexing the same PDF again overwrites instead of duplicating
+            "id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"edu:{doc_id}:{chunk.chunk_index}")) if doc_id else str(uuid.uuid4()),
+            "text": chunk.text,
+            "chunk_index": chunk.chunk_index,
+            "source": SOURCE,
+            "doc_id": doc_id,
             "metadata": {
-                "chunk_size": len(text),
-                "contains_concepts": self._contains_educational_concepts(text),
-                "difficulty_level": self._estimate_difficulty(text)
+                "chunk_size": len(chunk.text),
+                "token_count": chunk.token_count,
+                "start_char": chunk.start,
+                "end_char": chunk.end,
+                "page_start": chunk.page_start,
+                "page_end": chunk.page_end
             }
         }
     
+    def _apply_tags(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Tag a batch of chunks with keyword metadata in one scan"""
+        counts_batch = self.tagger.tag_batch([chunk["text"] for chunk in chunks])
+        for chunk, counts in zip(chunks, counts_batch):
+            chunk["metadata"].update({
+                "keyword_counts": counts,
+                "contains_concepts": counts["concepts"] > 0,
+                "difficulty_level": self._difficulty_from_counts(counts)
+            })
+        return chunks
+    
     def _contains_educational_concepts(self, text: str) -> bool:
         """Check if text contains educational concepts"""
-        educational_keywords = [
-            'definition', 'concept', 'theory', 'principle', 'example',
-            'exercise', 'problem', 'solution', 'method', 'technique',
-            'algorithm', 'formula', 'equation', 'theorem', 'proof'
-        ]
-        text_lower = text.lower()
-        return any(keyword in text_lower for keyword in educational_keywords)
+        return self.tagger.tag(text)["concepts"] > 0
     
     def _estimate_difficulty(self, text: str) -> str:
         """Estimate difficulty level of educational content"""
-        text_lower = text.lower()
-        
+        return self._difficulty_from_counts(self.tagger.tag(text))
+    
+    def _difficulty_from_counts(self, counts: Dict[str, int]) -> str:
         # Simple heuristic based on content characteristics
-        if any(word in text_lower for word in ['advanced', 'complex', 'sophisticated', 'proof', 'theorem']):
+        if counts["difficulty_hard"]:
             return "hard"
-        elif any(word in text_lower for word in ['intermediate', 'method', 'technique', 'example']):
+        elif counts["difficulty_medium"]:
             return "medium"
         else:
             return "easy"
     
-    async def process_educational_content(self, pdf_path: str) -> bool:
-        """Process educational PDF and store in Qdrant"""
+    async def _store_page_batches(self, page_batches: AsyncIterator[List[PageText]], doc_id: Optional[str],
+                                  label: str, stats: Optional[Dict[str, int]] = None) -> bool:
+        if not await education_store.initialize():
+            return False
+        # Chunk and store page by page; only one batch is held at a time
+        stream = self.chunker.stream()
+        batch: List[Dict[str, Any]] = []
+        total_pages = total_chunks = 0
+        success = True
+        async for pages in page_batches:
+            total_pages += len(pages)
+            for page in pages:
+                batch.extend(self._create_chunk(chunk, doc_id) for chunk in stream.feed(*page))
+                if len(batch) >= STORE_BATCH_SIZE:
+                    # Store in Qdrant with educational metadata
+                    success = await education_store.store_documents(self._apply_tags(batch)) and success
+                    total_chunks += len(batch)
+                    batch = []
+        
+        batch.extend(self._create_chunk(chunk, doc_id) for chunk in stream.flush())
+        if batch:
+            success = await education_store.store_documents(self._apply_tags(batch)) and success
+            total_chunks += len(batch)
+        
+        logger.info(f"Processed {total_chunks} educational chunks from {label}")
+        if stats is not None:
+            stats["pages"] = stats.get("pages", 0) + total_pages
+            stats["chunks"] = stats.get("chunks", 0) + total_chunks
+        return success
+    
+    async def process_educational_content(self, pdf_path: PdfSource, stats: Optional[Dict[str, int]] = None,
+                                          doc_id: Optional[str] = None) -> bool:
+        """
+        Process educational PDF and store in Qdrant; page/chunk counts are added to `stats`.
+        Chunks carry `doc_id` (the content hash), which scopes textbook Q&A to the document.
+        """
         try:
-            text = self.extract_text_from_pdf(pdf_path)
-            chunks = self.chunk_educational_content(text)
-            
-            # Store in Qdrant with educational metadata
-            success = await qdrant_client.store_documents(chunks)
-            logger.info(f"Processed {len(chunks)} educational chunks from {pdf_path}")
-            return success
-            
+            # Pages are extracted in the process pool and arrive in order, range by range
+            return await self._store_page_batches(stream_pdf_page_batches(pdf_path), doc_id,
+                                                  describe_source(pdf_path), stats)
         except Exception as e:
             logger.error(f"Educational content processing failed: {e}")
             return False
+    
+    async def index_pages(self, pages: List[PageText], doc_id: str,
+                          stats: Optional[Dict[str, int]] = None) -> bool:
+        """Store already extracted pages (e.g. from /process-education) without reading the PDF again"""
+        async def single_batch():
+            yield pages
+        
+        try:
+            return await self._store_page_batches(single_batch(), doc_id, f"document {doc_id[:12]}", stats)
+        except Exception as e:
+            logger.error(f"Educational content indexing failed: {e}")
+            return False
+    
+    async def is_indexed(self, doc_id: str) -> bool:
+        if not await education_store.initialize():
+            return False
+        return await education_store.count_documents(doc_id=doc_id) > 0
+    
+    async def search_educational_content(self, query: str, doc_id: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """Top chunks of one indexed document for a query"""
+        if not await education_store.initialize():
+            return []
+        return await education_store.search_similar(query, top_k, doc_id=doc_id)
 
 # Global document processor instance
 education_processor = EducationDocumentProcessor()
\ No newline at end of file
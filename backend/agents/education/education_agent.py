@@ -3,9 +3,9 @@ from __future__ import annotations
 
 import asyncio
 import logging
-import PyPDF2
 import re
-from typing import Any, Dict, List, TypedDict, Optional
+from collections import Counter
+from typing import Any, Dict, List, Tuple, TypedDict, Optional
 from groq import Groq
 
 # LangGraph imports
@@ -13,13 +13,19 @@ from langgraph.graph import StateGraph, END
 
 # Import settings (adjust path as needed)
 from config.settings import settings
+from utils.pdf_extraction import PAGE_MARKER_TEMPLATE, PdfSource, extract_pdf_text
+from utils.text_chunker import split_into_sections
+from utils.stream_parser import loads_lenient
+from agents.education.question_bank import question_bank
+from agents.education.result_cache import education_result_cache
+from agents.education.textbook_qa import textbook_qa
 
 logger = logging.getLogger(__name__)
 
 # ---------- Education Graph State ----------
 class EducationState(TypedDict, total=False):
     # Input
-    pdf_path: str
+    pdf_path: PdfSource  # file path or in-memory PDF bytes
     
     # Processing state
     raw_text: str
@@ -40,15 +46,8 @@ async def extract_content_node(state: EducationState) -> EducationState:
         return state
     
     try:
-        # Extract text from PDF
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            raw_text = ""
-            
-            for page_num, page in enumerate(pdf_reader.pages):
-                text = page.extract_text()
-                if text:
-                    raw_text += f"--- Page {page_num + 1} ---\n{text}\n\n"
+        # Extract text from PDF (in the process pool, off the event loop)
+        raw_text = await extract_pdf_text(pdf_path, PAGE_MARKER_TEMPLATE)
         
         if not raw_text.strip():
             state["errors"] = ["No text content found in PDF"]
@@ -64,21 +63,13 @@ async def extract_content_node(state: EducationState) -> EducationState:
         state["errors"] = [f"Content extraction failed: {e}"]
         return state
 
-async def analyze_content_node(state: EducationState) -> EducationState:
-    """Analyze the extracted content using AI"""
-    raw_text = state.get("raw_text")
-    
-    if not raw_text:
-        state["errors"] = ["No content to analyze"]
-        return state
-    
-    try:
-        # Initialize Groq client
-        groq_client = Groq(api_key=settings.GROQ_API_KEY)
-        
-        # Create analysis prompt
-        prompt = f"""
-        Analyze this educational document and extract key information:
+# ---------- Content Analysis (single pass or map-reduce over sections) ----------
+ANALYSIS_SYSTEM_PROMPT = "You are an expert educational content analyzer."
+DIFFICULTY_LEVELS = ("easy", "medium", "hard")
+
+def _analysis_prompt(content: str, scope: str = "this educational document") -> str:
+    return f"""
+        Analyze {scope} and extract key information:
         
         1. Identify the subject/topic
         2. Find any questions and answers (if present)
@@ -87,7 +78,7 @@ async def analyze_content_node(state: EducationState) -> EducationState:
         5. Summarize the main learning objectives
         
         Document content:
-        {raw_text[:3000]}  # Limit to avoid token limits
+        {content}
         
         Provide your analysis in JSON format:
         {{
@@ -106,33 +97,130 @@ async def analyze_content_node(state: EducationState) -> EducationState:
             "learning_objectives": ["objective1", "objective2"]
         }}
         """
+
+async def _request_analysis(groq_client: Groq, prompt: str) -> Dict[str, Any]:
+    """One analysis call (off the event loop); raises ValueError on a reply that can't be repaired into JSON"""
+    loop = asyncio.get_running_loop()
+    response = await loop.run_in_executor(None, lambda: groq_client.chat.completions.create(
+        model=settings.GROQ_MODEL,
+        messages=[
+            {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.3,
+        max_tokens=1500
+    ))
+    return loads_lenient(response.choices[0].message.content)
+
+def _unique(items: List[Any], key=lambda item: item) -> List[Any]:
+    seen = set()
+    unique = []
+    for item in items:
+        marker = key(item)
+        if marker and marker not in seen:
+            seen.add(marker)
+            unique.append(item)
+    return unique
+
+def _normalized(text: Any) -> str:
+    return re.sub(r"\s+", " ", str(text or "")).strip().lower()
+
+def merge_section_analyses(analyses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combine per-section analyses: most common subject/topic, majority
+    difficulty, concepts ranked by how many sections mention them, and the
+    union of questions and learning objectives (deduplicated).
+    """
+    def most_common(field: str, default: str) -> str:
+        values = [str(analysis[field]).strip() for analysis in analyses if analysis.get(field)]
+        if not values:
+            return default
+        counts = Counter(_normalized(value) for value in values)
+        best = max(counts.values())
+        # Ties go to the earliest section
+        return next(value for value in values if counts[_normalized(value)] == best)
+    
+    difficulties = Counter(str(analysis.get("difficulty", "")).lower() for analysis in analyses)
+    difficulty = max(DIFFICULTY_LEVELS, key=lambda level: (difficulties[level], level == "medium"))
+    if not difficulties[difficulty]:
+        difficulty = "medium"
+    
+    concepts = [concept for analysis in analyses for concept in analysis.get("key_concepts", [])
+                if isinstance(concept, str)]
+    mentions = Counter(_normalized(concept) for concept in concepts)
+    key_concepts = sorted(_unique(concepts, _normalized), key=lambda concept: -mentions[_normalized(concept)])
+    
+    questions = [question for analysis in analyses for question in analysis.get("questions_found", [])
+                 if isinstance(question, dict) and question.get("question")]
+    objectives = [objective for analysis in analyses for objective in analysis.get("learning_objectives", [])
+                  if isinstance(objective, str)]
+    summaries = _unique([str(analysis["summary"]).strip() for analysis in analyses if analysis.get("summary")],
+                        _normalized)
+    
+    return {
+        "subject": most_common("subject", "General Education"),
+        "topic": most_common("topic", "Document Analysis"),
+        "difficulty": difficulty,
+        "key_concepts": key_concepts,
+        "questions_found": _unique(questions, lambda question: _normalized(question["question"])),
+        "summary": " ".join(summaries),
+        "learning_objectives": _unique(objectives, _normalized)
+    }
+
+async def analyze_sections(groq_client: Groq, sections: List[str],
+                           concurrency: int = None) -> List[Dict[str, Any]]:
+    """Analyze sections concurrently under a cap; sections whose call fails are left out"""
+    semaphore = asyncio.Semaphore(concurrency or settings.EDU_ANALYSIS_CONCURRENCY)
+    
+    async def analyze(index: int, section: str) -> Optional[Dict[str, Any]]:
+        async with semaphore:
+            scope = f"section {index + 1} of {len(sections)} of an educational document"
+            try:
+                return await _request_analysis(groq_client, _analysis_prompt(section, scope))
+            except Exception as e:
+                logger.warning(f"Analysis of section {index + 1}/{len(sections)} failed: {e}")
+                return None
+    
+    results = await asyncio.gather(*(analyze(index, section) for index, section in enumerate(sections)))
+    return [result for result in results if isinstance(result, dict)]
+
+async def analyze_content_node(state: EducationState) -> EducationState:
+    """Analyze the extracted content using AI"""
+    raw_text = state.get("raw_text")
+    
+    if not raw_text:
+        state["errors"] = ["No content to analyze"]
+        return state
+    
+    try:
+        # Initialize Groq client
+        groq_client = Groq(api_key=settings.GROQ_API_KEY)
+        sections_analyzed = 1
         
-        # Get AI analysis
-        response = groq_client.chat.completions.create(
-            model=settings.GROQ_MODEL,
-            messages=[
-                {"role": "system", "content": "You are an expert educational content analyzer."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=1500
-        )
-        
-        # Parse AI response
-        import json
-        try:
-            analysis = json.loads(response.choices[0].message.content)
-        except json.JSONDecodeError:
-            # Fallback if JSON parsing fails
-            analysis = {
-                "subject": "General Education",
-                "topic": "Document Analysis",
-                "difficulty": "medium",
-                "key_concepts": ["content analysis"],
-                "questions_found": [],
-                "summary": "Document contains educational content",
-                "learning_objectives": ["understand content"]
-            }
+        if settings.EDU_ANALYSIS_MODE == "map_reduce":
+            # Map: every section of the document in parallel; reduce: merged locally
+            sections = split_into_sections(raw_text, settings.EDU_SECTION_TOKENS, settings.EDU_MAX_SECTIONS)
+            section_analyses = await analyze_sections(groq_client, sections)
+            if not section_analyses:
+                raise RuntimeError(f"All {len(sections)} section analyses failed")
+            analysis = merge_section_analyses(section_analyses)
+            sections_analyzed = len(section_analyses)
+        else:
+            try:
+                analysis = await _request_analysis(
+                    groq_client, _analysis_prompt(raw_text[:3000])  # Limit to avoid token limits
+                )
+            except ValueError:
+                # Fallback if JSON parsing fails
+                analysis = {
+                    "subject": "General Education",
+                    "topic": "Document Analysis",
+                    "difficulty": "medium",
+                    "key_concepts": ["content analysis"],
+                    "questions_found": [],
+                    "summary": "Document contains educational content",
+                    "learning_objectives": ["understand content"]
+                }
         
         state["questions"] = analysis.get("questions_found", [])
         state["result"] = {
@@ -141,7 +229,8 @@ async def analyze_content_node(state: EducationState) -> EducationState:
                 "total_characters": len(raw_text),
                 "estimated_pages": len(raw_text) // 2000,  # Rough estimate
                 "questions_found": len(analysis.get("questions_found", [])),
-                "key_concepts_count": len(analysis.get("key_concepts", []))
+                "key_concepts_count": len(analysis.get("key_concepts", [])),
+                "sections_analyzed": sections_analyzed
             }
         }
         
@@ -370,8 +459,42 @@ class EducationAgent:
     def __init__(self):
         self.pipeline = build_education_pipeline()
     
-    async def process_pdf(self, pdf_path: str) -> Dict[str, Any]:
-        """Process a PDF file with comprehensive analysis"""
+    async def process_pdf(self, pdf_path: PdfSource, doc_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Process a PDF (path or in-memory bytes) with comprehensive analysis.
+        With a `doc_id` (content hash) the document's question bank starts
+        filling and its chunks are indexed for textbook Q&A, both in the
+        background. Successful results are cached: the same PDF again
+        returns without any work.
+        """
+        if not doc_id or not settings.EDU_CACHE_ENABLED:
+            response, _ = await self._run_pipeline(pdf_path, doc_id)
+            return response
+        
+        cached = await education_result_cache.get(doc_id)
+        if cached is None:
+            async with education_result_cache.single_flight(doc_id):
+                # An identical upload may have finished while this one waited
+                cached = await education_result_cache.get(doc_id)
+                if cached is None:
+                    response, raw_text = await self._run_pipeline(pdf_path, doc_id)
+                    if response["success"]:
+                        await education_result_cache.put(doc_id, {"response": response, "text": raw_text})
+                    return response
+        
+        logger.info(f"Education result cache hit for {doc_id[:12]}")
+        if settings.QUESTION_BANK_ENABLED and not question_bank.has_document(doc_id):
+            # The bank was evicted (or lives in another worker): refill it from the cached text
+            question_bank.register(doc_id, cached["text"])
+        if settings.EDU_QA_ENABLED:
+            # No-op when the chunks are already in the vector store
+            textbook_qa.index_in_background(doc_id, cached["text"])
+        response = cached["response"]
+        response["result"]["cached"] = True
+        return response
+    
+    async def _run_pipeline(self, pdf_path: PdfSource, doc_id: Optional[str]) -> Tuple[Dict[str, Any], str]:
+        """The full pipeline: (response, extracted text)"""
         initial_state = {"pdf_path": pdf_path}
         
         try:
@@ -382,20 +505,28 @@ class EducationAgent:
                     "success": False,
                     "errors": final_state["errors"],
                     "result": None
-                }
+                }, ""
+            
+            result = final_state.get("result", {})
+            if doc_id:
+                result["doc_id"] = doc_id
+                if settings.QUESTION_BANK_ENABLED:
+                    question_bank.register(doc_id, final_state["raw_text"])
+                if settings.EDU_QA_ENABLED:
+                    textbook_qa.index_in_background(doc_id, final_state["raw_text"])
             
             return {
                 "success": True,
                 "errors": [],
-                "result": final_state.get("result", {})
-            }
+                "result": result
+            }, final_state["raw_text"]
             
         except Exception as e:
             return {
                 "success": False,
                 "errors": [f"Pipeline execution failed: {e}"],
                 "result": None
-            }
+            }, ""
 
 # Export the agent
 education_agent = EducationAgent()
\ No newline at end of file
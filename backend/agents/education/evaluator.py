@@ -1,25 +1,38 @@
+import asyncio
 import logging
 import re
-import PyPDF2
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from groq import Groq
 
 from config.settings import settings
+from utils.pdf_extraction import PdfSource, extract_pdf_text
+from utils.stream_parser import loads_lenient
+from agents.education.feedback_templates import feedback_templates
 
 logger = logging.getLogger(__name__)
 
+# Answer lines the regex parser understands, e.g. "Your answer: B", "Correct answer - (C)"
+USER_ANSWER_PATTERN = re.compile(r'(?:user|student|your|selected|marked)\s*answer\s*[:\-]?\s*\(?([A-D])\b', re.IGNORECASE)
+CORRECT_ANSWER_PATTERN = re.compile(r'correct\s*answer\s*[:\-]?\s*\(?([A-D])\b', re.IGNORECASE)
+
+# Option markers or a question mark: the page may hold questions the regex missed
+QUESTION_SIGNAL = re.compile(r'(?:^|\s)[A-D][).]\s|\?', re.MULTILINE)
+
+# Consecutive pages the regex parser can't read are sent to the LLM up to this many at a time
+LLM_PARSE_MAX_PAGES = 4
+
 class EducationEvaluator:
     def __init__(self):
         self.groq_client = Groq(api_key=settings.GROQ_API_KEY)
     
-    async def evaluate_answers(self, pdf_path: str) -> Dict[str, Any]:
+    async def evaluate_answers(self, pdf_path: PdfSource) -> Dict[str, Any]:
         """
         Extract questions and answers from PDF, then evaluate
         PDF should contain both questions and user answers
         """
         try:
             # Extract content from PDF
-            pdf_content = self._extract_pdf_content(pdf_path)
+            pdf_content = await self._extract_pdf_content(pdf_path)
             
             # Parse questions and answers from PDF
             parsed_data = await self._parse_questions_and_answers(pdf_content)
@@ -51,19 +64,10 @@ class EducationEvaluator:
                 'overall_feedback': f'Error: {str(e)}'
             }
     
-    def _extract_pdf_content(self, pdf_path: str) -> str:
+    async def _extract_pdf_content(self, pdf_path: PdfSource) -> str:
         """Extract text content from PDF"""
         try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                full_text = ""
-                
-                for page in pdf_reader.pages:
-                    text = page.extract_text()
-                    if text:
-                        full_text += text + "\n"
-                        
-                return full_text
+            return await extract_pdf_text(pdf_path)
         except Exception as e:
             logger.error(f"PDF extraction failed: {e}")
             raise
@@ -73,58 +77,69 @@ class EducationEvaluator:
         Parse questions and user answers from PDF content using AI
         """
         try:
-            prompt = f"""
-            Extract multiple choice questions and user answers from this educational content.
-            Look for:
-            1. Questions with multiple choice options (A, B, C, D)
-            2. User answers or marked/selected options
-            3. Correct answers if provided
-            
-            Return the data in this JSON format:
-            {{
-                "questions": [
-                    {{
-                        "question": "Question text",
-                        "options": {{
-                            "A": "Option A text",
-                            "B": "Option B text", 
-                            "C": "Option C text",
-                            "D": "Option D text"
-                        }},
-                        "correct_answer": "A",
-                        "user_answer": "B"
-                    }}
-                ],
-                "user_answers": ["A", "B", "C"]
-            }}
-            
-            Content to parse:
-            {pdf_content}
-            """
-            
-            response = self.groq_client.chat.completions.create(
-                model=settings.GROQ_MODEL,
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "You are an expert at parsing educational documents. Extract questions and answers accurately."
-                    },
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=2000
-            )
-            
-            # Parse the JSON response
-            import json
-            result = json.loads(response.choices[0].message.content)
-            return result
-            
+            return await self._llm_parse(pdf_content)
         except Exception as e:
             logger.error(f"Question parsing failed: {e}")
             # Fallback: try simple regex parsing
             return self._fallback_parse(pdf_content)
     
+    async def _llm_parse(self, pdf_content: str) -> Dict[str, Any]:
+        """LLM extraction of questions and answers; raises when the reply isn't usable JSON"""
+        prompt = f"""
+        Extract multiple choice questions and user answers from this educational content.
+        Look for:
+        1. Questions with multiple choice options (A, B, C, D)
+        2. User answers or marked/selected options
+        3. Correct answers if provided
+        
+        Return the data in this JSON format:
+        {{
+            "questions": [
+                {{
+                    "question": "Question text",
+                    "options": {{
+                        "A": "Option A text",
+                        "B": "Option B text", 
+                        "C": "Option C text",
+                        "D": "Option D text"
+                    }},
+                    "correct_answer": "A",
+                    "user_answer": "B"
+                }}
+            ],
+            "user_answers": ["A", "B", "C"]
+        }}
+        
+        Content to parse:
+        {pdf_content}
+        """
+        
+        # Groq's client is synchronous; keep it off the event loop
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(None, lambda: self.groq_client.chat.completions.create(
+            model=settings.GROQ_MODEL,
+            messages=[
+                {
+                    "role": "system", 
+                    "content": "You are an expert at parsing educational documents. Extract questions and answers accurately."
+                },
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.1,
+            max_tokens=2000
+        ))
+        
+        # Truncated or chatty replies are repaired rather than thrown away
+        result = loads_lenient(response.choices[0].message.content)
+        if not isinstance(result, dict) or not isinstance(result.get('questions'), list):
+            raise ValueError("LLM reply has no question list")
+        # Drop malformed items (strings, nulls) rather than failing on them later
+        result['questions'] = [q for q in result['questions'] if isinstance(q, dict)]
+        if not isinstance(result.get('user_answers'), list):
+            result.pop('user_answers', None)
+        result.setdefault('user_answers', [q.get('user_answer', 'A') for q in result['questions']])
+        return result
+    
     def _fallback_parse(self, content: str) -> Dict[str, Any]:
         """Fallback parser using regex patterns"""
         questions = []
@@ -147,18 +162,82 @@ class EducationEvaluator:
                     options[option] = option_match.group(1).strip()
             
             if len(options) >= 2:  # At least 2 options found
+                user_match = USER_ANSWER_PATTERN.search(question_text)
+                correct_match = CORRECT_ANSWER_PATTERN.search(question_text)
                 questions.append({
                     'question': question_text.split('\n')[0],
                     'options': options,
-                    'correct_answer': 'A',  # Default
-                    'user_answer': 'A'      # Default
+                    'correct_answer': correct_match.group(1).upper() if correct_match else 'A',  # Default
+                    'user_answer': user_match.group(1).upper() if user_match else 'A',           # Default
+                    'answer_found': user_match is not None,
+                    'key_found': correct_match is not None
                 })
         
         return {
             'questions': questions,
-            'user_answers': ['A'] * len(questions)
+            'user_answers': [question['user_answer'] for question in questions]
         }
     
+    async def parse_answer_sheet(self, pages: List[str], has_answer_key: bool = False,
+                                 llm_semaphore: Optional[asyncio.Semaphore] = None,
+                                 stats: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+        """
+        Questions of a whole answer sheet, in order, from its page texts. The
+        regex parser reads every page; each run of consecutive pages it can't
+        fully read (missing answers, or question-like text it found nothing in)
+        goes to the LLM in one request, under `llm_semaphore` when given. Pages
+        handled per way ("regex", "llm", "skipped", "unparsed") are added to `stats`.
+        """
+        stats = stats if stats is not None else {}
+        llm_semaphore = llm_semaphore or asyncio.Semaphore(settings.BULK_GRADE_LLM_CONCURRENCY)
+        
+        def count(outcome: str, pages_handled: int = 1):
+            stats[outcome] = stats.get(outcome, 0) + pages_handled
+        
+        # Runs of page indexes, each either read by the regex parser or left to the LLM
+        page_questions = []
+        runs: List[Tuple[bool, List[int]]] = []
+        for index, text in enumerate(pages):
+            questions = self._fallback_parse(text)['questions']
+            page_questions.append(questions)
+            needs_llm = True
+            if questions and all(q['answer_found'] and (has_answer_key or q['key_found']) for q in questions):
+                count('regex')
+                needs_llm = False
+            elif not questions and not QUESTION_SIGNAL.search(text):
+                # Cover page, instructions, blank page
+                count('skipped')
+                needs_llm = False
+            if runs and runs[-1][0] == needs_llm and (not needs_llm or len(runs[-1][1]) < LLM_PARSE_MAX_PAGES):
+                runs[-1][1].append(index)
+            else:
+                runs.append((needs_llm, [index]))
+        
+        async def read(needs_llm: bool, indexes: List[int]) -> List[Dict[str, Any]]:
+            regex_result = [question for index in indexes for question in page_questions[index]]
+            if not needs_llm:
+                return regex_result
+            try:
+                async with llm_semaphore:
+                    parsed = await self._llm_parse("\n\n".join(pages[index] for index in indexes))
+            except Exception as e:
+                logger.warning(f"LLM parse of {len(indexes)} page(s) failed, keeping the regex result: {e}")
+                count('unparsed', len(indexes))
+                return regex_result
+            count('llm', len(indexes))
+            user_answers = parsed['user_answers']
+            for index, question in enumerate(parsed['questions']):
+                if not question.get('user_answer') and index < len(user_answers):
+                    question['user_answer'] = user_answers[index]
+            return parsed['questions']
+        
+        results = await asyncio.gather(*(read(needs_llm, indexes) for needs_llm, indexes in runs))
+        return [question for run_questions in results for question in run_questions]
+    
+    async def grade_answers(self, questions: List[Dict], user_answers: List[str]) -> Dict[str, Any]:
+        """Grade already structured questions; no network call with template feedback"""
+        return await self._evaluate_parsed_answers(questions, user_answers)
+    
     async def _evaluate_parsed_answers(self, questions: List[Dict], 
                                      user_answers: List[str]) -> Dict[str, Any]:
         """Evaluate the parsed questions and answers"""
@@ -202,6 +281,10 @@ class EducationEvaluator:
     async def _generate_overall_feedback(self, total: int, correct: int, 
                                        percentage: float) -> str:
         """Generate encouraging overall feedback"""
+        if settings.FEEDBACK_MODE != "llm":
+            # Score-bucket templates: same kind of feedback, no round-trip
+            return feedback_templates.render(total, correct, percentage)
+        
         try:
             prompt = f"""
             A student completed a quiz with these results:
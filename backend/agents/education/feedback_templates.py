@@ -0,0 +1,152 @@
+# agents/education/feedback_templates.py
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from groq import Groq
+
+from config.settings import settings
+from utils.stream_parser import loads_lenient
+
+logger = logging.getLogger(__name__)
+
+# (bucket, minimum percentage), checked top to bottom
+SCORE_BUCKETS: List[Tuple[str, float]] = [
+    ("perfect", 100.0),
+    ("excellent", 85.0),
+    ("good", 65.0),
+    ("fair", 40.0),
+    ("needs_work", 0.0),
+]
+
+# Placeholders available to every template
+TEMPLATE_FIELDS = ("correct", "total", "percentage")
+
+DEFAULT_TEMPLATES: Dict[str, List[str]] = {
+    "perfect": [
+        "Outstanding! You answered all {total} questions correctly. You clearly have a solid grasp of this material, so try a harder set to keep stretching yourself.",
+        "A perfect score: {correct} out of {total}. Great preparation! Challenge yourself next by explaining these concepts to someone else.",
+    ],
+    "excellent": [
+        "Excellent work! You scored {percentage}% ({correct}/{total}), which shows strong understanding of the material. Review the few questions you missed to make it complete.",
+        "Great job: {correct} of {total} correct. You're very close to mastery, so a quick look at the explanations for your misses will get you there.",
+    ],
+    "good": [
+        "Good effort! You got {correct} of {total} questions right ({percentage}%). Review the areas where you missed questions to strengthen your knowledge.",
+        "Solid result at {percentage}%. You understand the core ideas; going back over the concepts behind your incorrect answers will lift your score further.",
+    ],
+    "fair": [
+        "You're on your way with {correct} of {total} correct ({percentage}%). Revisit the key concepts in the material and try the quiz again to reinforce them.",
+        "A fair start at {percentage}%. Focus on the questions you missed, read their explanations, and practice similar questions before retrying.",
+    ],
+    "needs_work": [
+        "Keep practicing! You scored {percentage}% this time. Focus on understanding the key concepts first, then try again; every attempt builds your knowledge.",
+        "This topic needs a bit more study ({correct} of {total} correct). Work through the material section by section and take the quiz again when you're ready.",
+    ],
+}
+
+
+def score_bucket(percentage: float) -> str:
+    for bucket, minimum in SCORE_BUCKETS:
+        if percentage >= minimum:
+            return bucket
+    return SCORE_BUCKETS[-1][0]
+
+
+# What str.format raises for a placeholder our fields can't fill, e.g. {name}, {0}, {total.x}, {percentage:.1f}
+FORMAT_ERRORS = (KeyError, IndexError, ValueError, AttributeError, TypeError)
+
+
+def _format(template: str, total: int, correct: int, percentage: float) -> str:
+    return template.format(correct=correct, total=total, percentage=f"{percentage:.0f}")
+
+
+def _is_valid_template(template: str) -> bool:
+    # Must format with our fields, exactly as render() fills them, and nothing else
+    try:
+        _format(template, 0, 0, 0.0)
+    except FORMAT_ERRORS:
+        return False
+    return 0 < len(template) <= 400
+
+
+class FeedbackTemplates:
+    """
+    Overall quiz feedback from templates keyed by score bucket, so grading
+    needs no LLM call. The templates can optionally be refreshed by the LLM
+    every FEEDBACK_REFRESH_SECONDS to keep the wording varied; the built-in
+    templates are used until (and whenever) a refresh fails.
+    """
+
+    def __init__(self, refresh_seconds: Optional[float] = None):
+        self.refresh_seconds = refresh_seconds if refresh_seconds is not None else settings.FEEDBACK_REFRESH_SECONDS
+        self.templates: Dict[str, List[str]] = {bucket: list(items) for bucket, items in DEFAULT_TEMPLATES.items()}
+        self.refreshed_at: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def render(self, total: int, correct: int, percentage: float) -> str:
+        """Feedback for a score, with no network call"""
+        self._ensure_refresh_loop()
+        bucket = score_bucket(percentage)
+        try:
+            return _format(random.choice(self.templates[bucket]), total, correct, percentage)
+        except FORMAT_ERRORS as e:
+            logger.warning(f"Feedback template for '{bucket}' failed to render, using a built-in one: {e}")
+            return _format(random.choice(DEFAULT_TEMPLATES[bucket]), total, correct, percentage)
+
+    async def refresh(self, groq_client: Optional[Groq] = None) -> bool:
+        """Ask the LLM for fresh templates; buckets with no valid reply keep their current ones"""
+        groq_client = groq_client or Groq(api_key=settings.GROQ_API_KEY)
+        prompt = f"""
+        Write short, encouraging quiz feedback templates for students, 2-3 sentences each.
+        Be positive and suggest improvement strategies where the score calls for it.
+        Templates may use these placeholders: {{correct}}, {{total}}, {{percentage}} (a whole number, without %).
+        Write 3 templates for each score bucket: {", ".join(bucket for bucket, _ in SCORE_BUCKETS)}
+        (minimum scores: {", ".join(f"{bucket} {minimum:.0f}%" for bucket, minimum in SCORE_BUCKETS)}).
+        Return only JSON: {{"bucket_name": ["template", ...], ...}}
+        """
+        try:
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(None, lambda: groq_client.chat.completions.create(
+                model=settings.GROQ_MODEL,
+                messages=[
+                    {"role": "system", "content": "You are a supportive educational tutor."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.8,
+                max_tokens=1200
+            ))
+            proposed = loads_lenient(response.choices[0].message.content)
+        except Exception as e:
+            logger.warning(f"Feedback template refresh failed: {e}")
+            return False
+
+        updated = 0
+        for bucket in self.templates:
+            candidates = proposed.get(bucket) if isinstance(proposed, dict) else None
+            valid = [item.strip() for item in candidates or [] if isinstance(item, str) and _is_valid_template(item)]
+            if valid:
+                self.templates[bucket] = valid
+                updated += 1
+        self.refreshed_at = time.time()
+        logger.info(f"Refreshed feedback templates for {updated}/{len(self.templates)} score buckets")
+        return updated > 0
+
+    def _ensure_refresh_loop(self):
+        if self.refresh_seconds <= 0 or (self._refresh_task is not None and not self._refresh_task.done()):
+            return
+        try:
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh_loop())
+        except RuntimeError:
+            # No running loop (sync caller); templates stay as they are
+            pass
+
+    async def _refresh_loop(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_seconds)
+
+# Global feedback templates instance
+feedback_templates = FeedbackTemplates()
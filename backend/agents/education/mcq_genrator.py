@@ -1,14 +1,21 @@
 # agents/education/mcq_generator.py
+import asyncio
 import logging
-import re
 import random
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, AsyncIterator, Optional
 from groq import Groq
+import numpy as np
 
 from config.settings import settings
+from utils.embedding_service import embedding_service
+from utils.text_chunker import split_into_sections
+from utils.stream_parser import MCQStreamParser, stream_completion
 
 logger = logging.getLogger(__name__)
 
+MCQ_SYSTEM_PROMPT = ("You are an expert educational content creator. Generate high-quality multiple "
+                     "choice questions based on the provided educational content.")
+
 class MCQGenerator:
     def __init__(self):
         self.groq_client = Groq(api_key=settings.GROQ_API_KEY)
@@ -16,28 +23,133 @@ class MCQGenerator:
     async def generate_mcqs(self, context: str, num_questions: int = 5, 
                           difficulty: str = "medium") -> List[Dict[str, Any]]:
         """Generate multiple choice questions from educational content"""
+        mcqs = []
         try:
-            prompt = self._create_mcq_prompt(context, num_questions, difficulty)
-            
-            response = self.groq_client.chat.completions.create(
-                model=settings.GROQ_MODEL,
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "You are an expert educational content creator. Generate high-quality multiple choice questions based on the provided educational content."
-                    },
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=2000
-            )
-            
-            mcq_text = response.choices[0].message.content
-            return self._parse_mcqs(mcq_text, num_questions)
-            
+            async for mcq in self.stream_mcqs(context, num_questions, difficulty):
+                mcqs.append(mcq)
         except Exception as e:
-            logger.error(f"MCQ generation failed: {e}")
-            return []
+            # Questions parsed before the failure are kept
+            logger.error(f"MCQ generation failed after {len(mcqs)} questions: {e}")
+        return mcqs
+    
+    def _stream_complete(self, prompt: str, max_tokens: int) -> AsyncIterator[str]:
+        """One streamed MCQ completion: content deltas as they arrive, off the event loop"""
+        return stream_completion(lambda: self.groq_client.chat.completions.create(
+            model=settings.GROQ_MODEL,
+            messages=[
+                {"role": "system", "content": MCQ_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            max_tokens=max_tokens,
+            stream=True
+        ))
+    
+    async def stream_mcqs(self, context: str, num_questions: int = 5, difficulty: str = "medium",
+                          max_tokens: int = 2000) -> AsyncIterator[Dict[str, Any]]:
+        """
+        generate_mcqs(), streamed: each question is yielded as soon as it is
+        complete in the completion. If the stream breaks off, the questions
+        already yielded stand.
+        """
+        parser = MCQStreamParser()
+        yielded = 0
+        prompt = self._create_mcq_prompt(context, num_questions, difficulty)
+        async for delta in self._stream_complete(prompt, max_tokens):
+            for mcq in parser.feed(delta):
+                yield mcq
+                yielded += 1
+                if yielded >= num_questions:
+                    return
+        for mcq in parser.close()[:num_questions - yielded]:
+            yield mcq
+    
+    def _allocate_questions(self, sections: List[str], num_questions: int) -> Dict[int, int]:
+        """Spread the question count over evenly spaced sections (section index -> count)"""
+        if len(sections) > num_questions:
+            step = len(sections) / num_questions
+            chosen = [int(i * step) for i in range(num_questions)]
+        else:
+            chosen = list(range(len(sections)))
+        base, extra = divmod(num_questions, len(chosen))
+        return {index: base + (1 if position < extra else 0) for position, index in enumerate(chosen)}
+    
+    async def stream_mcqs_by_section(self, text: str, num_questions: int = 20,
+                                     difficulty: str = "medium",
+                                     concurrency: Optional[int] = None,
+                                     similarity_threshold: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Generate MCQs across the whole document: the count is spread over its
+        sections, sections are generated concurrently, and each question is
+        yielded as soon as its section's stream completes it, passes
+        validate_mcqs and is not a near-duplicate (embedding cosine >=
+        threshold) of one already yielded. Each section asks for one spare
+        question so drops rarely leave the total short.
+        """
+        if num_questions <= 0 or not text.strip():
+            return
+        threshold = settings.MCQ_DEDUP_THRESHOLD if similarity_threshold is None else similarity_threshold
+        semaphore = asyncio.Semaphore(concurrency or settings.MCQ_CONCURRENCY)
+        sections = split_into_sections(text, settings.MCQ_SECTION_TOKENS, num_questions)
+        allocation = self._allocate_questions(sections, num_questions)
+        
+        # Sections push questions here as they stream in; None marks the end
+        ready: asyncio.Queue = asyncio.Queue()
+        
+        async def generate(index: int, count: int):
+            async with semaphore:
+                try:
+                    async for mcq in self.stream_mcqs(sections[index], count + 1, difficulty,
+                                                      max_tokens=min(2000, 300 * (count + 1) + 200)):
+                        if self.validate_mcqs([mcq]):
+                            mcq["section"] = index
+                            await ready.put(mcq)
+                except Exception as e:
+                    logger.warning(f"MCQ generation for section {index + 1}/{len(sections)} failed: {e}")
+        
+        async def generate_all():
+            try:
+                await asyncio.gather(*(generate(index, count) for index, count in allocation.items()))
+            finally:
+                ready.put_nowait(None)
+        
+        producer = asyncio.ensure_future(generate_all())
+        accepted_vectors: List[np.ndarray] = []
+        accepted_stems = set()
+        yielded = 0
+        try:
+            while True:
+                mcq = await ready.get()
+                if mcq is None:
+                    return
+                stem = " ".join(mcq["question"].lower().split())
+                if stem in accepted_stems:
+                    continue
+                
+                try:
+                    vector = np.asarray((await embedding_service.encode([mcq["question"]]))[0], dtype=np.float32)
+                    vector /= max(float(np.linalg.norm(vector)), 1e-12)
+                except Exception as e:
+                    # Without embeddings only exact repeats are caught
+                    logger.warning(f"MCQ dedupe embeddings unavailable: {e}")
+                    vector = None
+                if vector is not None:
+                    if accepted_vectors and float(np.max(np.stack(accepted_vectors) @ vector)) >= threshold:
+                        continue
+                    accepted_vectors.append(vector)
+                accepted_stems.add(stem)
+                
+                yield mcq
+                yielded += 1
+                if yielded >= num_questions:
+                    return
+        finally:
+            producer.cancel()
+    
+    async def generate_mcqs_by_section(self, text: str, num_questions: int = 20,
+                                       difficulty: str = "medium") -> List[Dict[str, Any]]:
+        """stream_mcqs_by_section() collected into a list"""
+        return [mcq async for mcq in self.stream_mcqs_by_section(text, num_questions, difficulty)]
     
     def _create_mcq_prompt(self, context: str, num_questions: int, difficulty: str) -> str:
         """Create prompt for MCQ generation"""
@@ -69,50 +181,8 @@ class MCQGenerator:
     
     def _parse_mcqs(self, mcq_text: str, expected_count: int) -> List[Dict[str, Any]]:
         """Parse the generated MCQ text into structured format"""
-        questions = []
-        current_question = {}
-        
-        lines = mcq_text.strip().split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            
-            # Detect question start
-            if line.lower().startswith('question'):
-                if current_question:
-                    questions.append(current_question)
-                current_question = {
-                    'question': line.split(':', 1)[1].strip() if ':' in line else line,
-                    'options': {},
-                    'correct_answer': '',
-                    'explanation': ''
-                }
-            
-            # Detect options
-            elif re.match(r'^[A-D]\)', line):
-                option = line[0]
-                option_text = line[3:].strip()
-                if '(Correct)' in option_text:
-                    option_text = option_text.replace('(Correct)', '').strip()
-                    current_question['correct_answer'] = option
-                current_question['options'][option] = option_text
-            
-            # Detect correct answer
-            elif line.lower().startswith('correct answer:'):
-                current_question['correct_answer'] = line.split(':', 1)[1].strip()
-            
-            # Detect explanation
-            elif line.lower().startswith('explanation:'):
-                current_question['explanation'] = line.split(':', 1)[1].strip()
-            
-            # Continue building current question text
-            elif current_question and not current_question.get('options'):
-                current_question['question'] += ' ' + line
-        
-        # Add the last question
-        if current_question:
-            questions.append(current_question)
-        
+        parser = MCQStreamParser()
+        questions = parser.feed(mcq_text.strip()) + parser.close()
         return questions[:expected_count]
     
     def validate_mcqs(self, mcqs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
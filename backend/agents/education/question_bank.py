@@ -0,0 +1,158 @@
+# agents/education/question_bank.py
+import asyncio
+import logging
+import random
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from config.settings import settings
+from agents.education.mcq_genrator import mcq_generator
+
+logger = logging.getLogger(__name__)
+
+DIFFICULTIES = ("easy", "medium", "hard")
+
+@dataclass
+class _DocumentBank:
+    text: str
+    questions: Dict[str, List[Dict[str, Any]]] = field(
+        default_factory=lambda: {difficulty: [] for difficulty in DIFFICULTIES}
+    )
+    stems: Dict[str, Set[str]] = field(
+        default_factory=lambda: {difficulty: set() for difficulty in DIFFICULTIES}
+    )
+    fills: Dict[str, asyncio.Task] = field(default_factory=dict)
+    queued: Set[str] = field(default_factory=set)  # background fills still waiting for a slot
+    updated_at: float = field(default_factory=time.monotonic)
+
+class QuestionBank:
+    """
+    Pre-generated MCQs per document, keyed by the document's content hash and
+    tagged by difficulty and section. The prefill difficulties are filled in
+    the background after a PDF is processed, the others on first request;
+    quizzes are sampled from the bank, and a difficulty is only topped up
+    (again in the background) once it runs low. Background fills share a few
+    process-wide slots, so a burst of uploads queues its generator calls
+    instead of starting them all at once.
+    """
+
+    def __init__(self, target_per_difficulty: Optional[int] = None, low_water: Optional[int] = None,
+                 max_documents: Optional[int] = None):
+        self.target = target_per_difficulty or settings.QUESTION_BANK_TARGET
+        self.low_water = low_water or settings.QUESTION_BANK_LOW_WATER
+        self.max_documents = max_documents or settings.QUESTION_BANK_MAX_DOCS
+        self.prefill = [difficulty for difficulty in settings.QUESTION_BANK_PREFILL if difficulty in DIFFICULTIES]
+        self._banks: "OrderedDict[str, _DocumentBank]" = OrderedDict()
+        self._fill_slots: Optional[asyncio.Semaphore] = None
+
+    def has_document(self, doc_id: str) -> bool:
+        return doc_id in self._banks
+
+    def register(self, doc_id: str, text: str, fill: bool = True):
+        """Remember a document's text and (optionally) start filling its prefill difficulties"""
+        bank = self._banks.get(doc_id)
+        if bank is None:
+            bank = self._banks[doc_id] = _DocumentBank(text=text)
+            while len(self._banks) > self.max_documents:
+                _, evicted = self._banks.popitem(last=False)
+                for task in evicted.fills.values():
+                    task.cancel()
+        self._banks.move_to_end(doc_id)
+        if fill:
+            for difficulty in self.prefill:
+                self._schedule_fill(doc_id, difficulty)
+
+    def _schedule_fill(self, doc_id: str, difficulty: str, target: Optional[int] = None,
+                       background: bool = True) -> Optional[asyncio.Task]:
+        bank = self._banks[doc_id]
+        running = bank.fills.get(difficulty)
+        if running is not None and not running.done():
+            if background or difficulty not in bank.queued:
+                return running
+            # Someone is waiting for these questions; don't leave them queued behind other documents
+            bank.queued.discard(difficulty)
+            running.cancel()
+        missing = max(target or 0, self.target) - len(bank.questions[difficulty])
+        if missing <= 0:
+            return None
+        task = asyncio.create_task(self._fill(doc_id, bank, difficulty, missing, background))
+        bank.fills[difficulty] = task
+        return task
+
+    async def _fill(self, doc_id: str, bank: _DocumentBank, difficulty: str, count: int, background: bool):
+        if not background:
+            await self._generate(doc_id, bank, difficulty, count)
+            return
+        if self._fill_slots is None:
+            self._fill_slots = asyncio.Semaphore(max(1, settings.QUESTION_BANK_FILL_CONCURRENCY))
+        bank.queued.add(difficulty)
+        try:
+            async with self._fill_slots:
+                bank.queued.discard(difficulty)
+                await self._generate(doc_id, bank, difficulty, count)
+        finally:
+            # Unless a newer fill already took this difficulty over
+            if bank.fills.get(difficulty) is asyncio.current_task():
+                bank.queued.discard(difficulty)
+
+    async def _generate(self, doc_id: str, bank: _DocumentBank, difficulty: str, count: int):
+        added = 0
+        try:
+            async for mcq in mcq_generator.stream_mcqs_by_section(bank.text, count, difficulty):
+                stem = " ".join(mcq["question"].lower().split())
+                if stem in bank.stems[difficulty]:
+                    continue
+                bank.stems[difficulty].add(stem)
+                bank.questions[difficulty].append({**mcq, "difficulty": difficulty})
+                added += 1
+            bank.updated_at = time.monotonic()
+            logger.info(f"Question bank {doc_id[:12]}: +{added} {difficulty} "
+                        f"({len(bank.questions[difficulty])} total)")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Question bank fill for {doc_id[:12]} ({difficulty}) failed: {e}")
+
+    async def get_quiz(self, doc_id: str, num_questions: int = 10, difficulty: str = "medium",
+                       wait: bool = True) -> List[Dict[str, Any]]:
+        """
+        Sample a quiz from the document's bank. When the bank can't cover the
+        request yet, wait for the running fill (if `wait`); otherwise a
+        background top-up is only scheduled once the difficulty runs low.
+        """
+        if difficulty not in DIFFICULTIES:
+            raise ValueError(f"Unknown difficulty '{difficulty}', expected one of {DIFFICULTIES}")
+        bank = self._banks.get(doc_id)
+        if bank is None:
+            raise KeyError(doc_id)
+        self._banks.move_to_end(doc_id)
+
+        questions = bank.questions[difficulty]
+        if len(questions) < num_questions and wait:
+            task = self._schedule_fill(doc_id, difficulty, target=num_questions, background=False)
+            if task is not None:
+                await asyncio.shield(task)
+
+        if len(questions) < max(self.low_water, num_questions):
+            self._schedule_fill(doc_id, difficulty, target=num_questions)
+        return random.sample(questions, min(num_questions, len(questions)))
+
+    def get_stats(self, doc_id: Optional[str] = None) -> Dict[str, Any]:
+        if doc_id is not None:
+            bank = self._banks.get(doc_id)
+            if bank is None:
+                return {}
+            return {
+                "questions": {difficulty: len(items) for difficulty, items in bank.questions.items()},
+                "filling": [difficulty for difficulty, task in bank.fills.items() if not task.done()],
+                "queued": sorted(bank.queued),
+            }
+        return {
+            "documents": len(self._banks),
+            "questions": sum(len(items) for bank in self._banks.values() for items in bank.questions.values()),
+        }
+
+# Global question bank instance
+question_bank = QuestionBank()
@@ -0,0 +1,235 @@
+# agents/education/quiz_sessions.py
+import asyncio
+import json
+import logging
+import secrets
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from config.settings import settings
+from agents.education.feedback_templates import feedback_templates
+
+logger = logging.getLogger(__name__)
+
+REDIS_PREFIX = "quiz"
+OPTIONS = ("A", "B", "C", "D")
+
+# Per-session keys, in the order the grading script receives them
+SESSION_KEYS = ("meta", "key", "answers", "explain", "questions")
+
+# Grades one answer atomically: O(1) hash reads and writes, no read-modify-write race
+# between two tabs of the same student. Replies {status, ...}: -3 no such session,
+# -1 no such question, -2 already answered, else 0/1 for incorrect/correct.
+GRADE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return {-3} end
+local correct = redis.call('HGET', KEYS[2], ARGV[1])
+if not correct then return {-1} end
+if redis.call('HSETNX', KEYS[3], ARGV[1], ARGV[2]) == 0 then
+    return {-2, correct, redis.call('HGET', KEYS[3], ARGV[1])}
+end
+local is_correct = 0
+if correct == ARGV[2] then is_correct = 1 end
+local answered = redis.call('HINCRBY', KEYS[1], 'answered', 1)
+local score = redis.call('HINCRBY', KEYS[1], 'correct', is_correct)
+redis.call('HSET', KEYS[1], 'updated_at', ARGV[3])
+for i = 1, #KEYS do redis.call('EXPIRE', KEYS[i], ARGV[4]) end
+return {is_correct, correct, answered, score, redis.call('HGET', KEYS[1], 'total'),
+        redis.call('HGET', KEYS[4], ARGV[1]) or ''}
+"""
+
+
+class QuizSessionError(Exception):
+    """
+    A request the session store can't serve; `reason` is 'expired', 'bad_question',
+    'bad_answer', 'answered', or 'unavailable' when Redis can't be reached
+    """
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+def _text(value: Any) -> str:
+    return value.decode() if isinstance(value, (bytes, bytearray)) else str(value)
+
+
+def _score(correct: int, answered: int, total: int) -> Dict[str, Any]:
+    return {
+        "total_questions": total,
+        "answered": answered,
+        "correct_answers": correct,
+        # Percentage of the questions answered so far
+        "score_percentage": round(correct / answered * 100, 2) if answered else 0.0,
+        "finished": answered >= total,
+    }
+
+
+class QuizSessionStore:
+    """
+    Server-side quiz state in Redis, so a student answers a generated quiz one
+    question at a time instead of uploading an answered PDF. Each session is a
+    few small keys sharing a hash tag (one cluster slot): a meta hash with the
+    running score, the answer key, the student's answers, the explanations and
+    the question text without answers. Grading an answer is a single script
+    call; every answer pushes the session's expiry out by the idle TTL.
+    """
+
+    def __init__(self, ttl_seconds: Optional[int] = None, max_questions: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds or settings.QUIZ_SESSION_TTL_SECONDS
+        self.max_questions = max_questions or settings.QUIZ_SESSION_MAX_QUESTIONS
+        self._redis = None
+        self._grade = None
+
+    def _keys(self, session_id: str) -> List[str]:
+        return [f"{REDIS_PREFIX}:{{{session_id}}}:{name}" for name in SESSION_KEYS]
+
+    async def _call_redis(self, operation: Callable[[Any], Any]) -> Any:
+        """Run a Redis command off the event loop on the process-wide client; Redis failures raise 'unavailable'"""
+        if self._redis is None:
+            try:
+                from utils.redis_memory import shared_client
+            except RuntimeError as e:
+                raise QuizSessionError("unavailable", "Quiz sessions are unavailable") from e
+            self._redis = shared_client()
+            self._grade = self._redis.register_script(GRADE_SCRIPT)
+        from redis.exceptions import RedisError
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(None, operation, self._redis)
+        except RedisError as e:
+            logger.error(f"Quiz session Redis command failed: {e}")
+            raise QuizSessionError("unavailable", "Quiz sessions are unavailable") from e
+
+    async def create(self, questions: List[Dict[str, Any]], doc_id: Optional[str] = None,
+                     difficulty: Optional[str] = None) -> Dict[str, Any]:
+        """Store a new session for MCQs in the generator's format; raises ValueError if none are usable"""
+        usable = [
+            question for question in questions
+            if question.get("question") and all(question.get("options", {}).get(option) for option in OPTIONS)
+            and str(question.get("correct_answer", "")).strip().upper() in OPTIONS
+        ][:self.max_questions]
+        if not usable:
+            raise ValueError("No complete multiple-choice questions to build a quiz from")
+
+        session_id = secrets.token_urlsafe(16)
+        meta_key, answer_key, _, explain_key, questions_key = self._keys(session_id)
+        now = int(time.time())
+        public = [
+            {"question_index": index, "question": question["question"],
+             "options": {option: question["options"][option] for option in OPTIONS}}
+            for index, question in enumerate(usable)
+        ]
+        meta = {
+            "doc_id": doc_id or "",
+            "difficulty": difficulty or "",
+            "total": len(usable),
+            "answered": 0,
+            "correct": 0,
+            "created_at": now,
+            "updated_at": now,
+        }
+        key = {index: str(question["correct_answer"]).strip().upper() for index, question in enumerate(usable)}
+        explanations = {index: question.get("explanation") or "" for index, question in enumerate(usable)}
+
+        def write(client):
+            pipeline = client.pipeline()
+            pipeline.hset(meta_key, mapping=meta)
+            pipeline.hset(answer_key, mapping=key)
+            pipeline.hset(explain_key, mapping=explanations)
+            pipeline.set(questions_key, json.dumps(public))
+            # The answers hash is created by the first answer and gets its expiry then
+            for name in (meta_key, answer_key, explain_key, questions_key):
+                pipeline.expire(name, self.ttl_seconds)
+            pipeline.execute()
+
+        await self._call_redis(write)
+        logger.info(f"Created quiz session {session_id[:8]} with {len(usable)} questions")
+        return {
+            "session_id": session_id,
+            "doc_id": doc_id,
+            "difficulty": difficulty,
+            "questions": public,
+            "expires_in": self.ttl_seconds,
+            **_score(0, 0, len(usable)),
+        }
+
+    async def answer(self, session_id: str, question_index: int, answer: str) -> Dict[str, Any]:
+        """Grade one answer and return it with the running score; raises QuizSessionError"""
+        answer = answer.strip().upper()
+        if answer not in OPTIONS:
+            raise QuizSessionError("bad_answer", "Answer must be one of A, B, C or D")
+        keys = self._keys(session_id)
+        reply = await self._call_redis(lambda client: self._grade(
+            keys=keys, args=[question_index, answer, int(time.time()), self.ttl_seconds], client=client
+        ))
+
+        status = int(reply[0])
+        if status == -3:
+            raise QuizSessionError("expired", "Unknown or expired quiz session")
+        if status == -1:
+            raise QuizSessionError("bad_question", f"No question {question_index} in this quiz")
+        if status == -2:
+            raise QuizSessionError("answered", f"Question {question_index} was already answered "
+                                               f"({_text(reply[2])})")
+
+        is_correct, correct_answer = bool(status), _text(reply[1])
+        answered, correct, total = int(reply[2]), int(reply[3]), int(reply[4])
+        result = {
+            "session_id": session_id,
+            "question_index": question_index,
+            "answer": answer,
+            "correct_answer": correct_answer,
+            "is_correct": is_correct,
+            "feedback": 'Correct!' if is_correct else f'Incorrect. The correct answer is {correct_answer}.',
+            "explanation": _text(reply[5]),
+            **_score(correct, answered, total),
+        }
+        if result["finished"]:
+            result["overall_feedback"] = feedback_templates.render(total, correct, result["score_percentage"])
+        return result
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Questions, answers so far and running score; None once the session has expired"""
+        meta_key, answer_key, answers_key, explain_key, questions_key = self._keys(session_id)
+        meta, key, answers, explanations, questions, ttl = await self._call_redis(
+            lambda client: client.pipeline().hgetall(meta_key).hgetall(answer_key).hgetall(answers_key)
+            .hgetall(explain_key).get(questions_key).ttl(meta_key).execute()
+        )
+        if not meta or questions is None:
+            return None
+
+        meta = {_text(name): _text(value) for name, value in meta.items()}
+        key = {_text(index): _text(option) for index, option in key.items()}
+        explanations = {_text(index): _text(text) for index, text in explanations.items()}
+        results = []
+        for index, answer in sorted(((int(_text(index)), _text(answer)) for index, answer in answers.items())):
+            # Answers and explanations are only revealed for questions already answered
+            results.append({
+                "question_index": index,
+                "answer": answer,
+                "correct_answer": key.get(str(index), ""),
+                "is_correct": answer == key.get(str(index)),
+                "explanation": explanations.get(str(index), ""),
+            })
+
+        session = {
+            "session_id": session_id,
+            "doc_id": meta.get("doc_id") or None,
+            "difficulty": meta.get("difficulty") or None,
+            "questions": json.loads(questions),
+            "results": results,
+            "expires_in": max(int(ttl), 0),
+            **_score(int(meta["correct"]), int(meta["answered"]), int(meta["total"])),
+        }
+        if session["finished"]:
+            session["overall_feedback"] = feedback_templates.render(
+                session["total_questions"], session["correct_answers"], session["score_percentage"]
+            )
+        return session
+
+    async def delete(self, session_id: str) -> bool:
+        keys = self._keys(session_id)
+        return bool(await self._call_redis(lambda client: client.delete(*keys)))
+
+# Global quiz session store instance
+quiz_sessions = QuizSessionStore()
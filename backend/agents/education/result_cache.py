@@ -0,0 +1,135 @@
+# agents/education/result_cache.py
+import asyncio
+import copy
+import json
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+REDIS_PREFIX = "edu:result"
+
+class EducationResultCache:
+    """
+    Full /process-education results keyed by the PDF's content hash, so a
+    re-uploaded handout skips extraction and every LLM call. Two tiers: an
+    in-process LRU, and (with EDU_CACHE_REDIS) a Redis tier shared by every
+    worker. Entries expire after the TTL; bumping EDU_CACHE_VERSION (e.g.
+    after a prompt change) orphans every older entry at once.
+    """
+
+    def __init__(self, ttl_seconds: Optional[float] = None, max_entries: Optional[int] = None,
+                 use_redis: Optional[bool] = None):
+        self.ttl_seconds = ttl_seconds or settings.EDU_CACHE_TTL_SECONDS
+        self.max_entries = max_entries or settings.EDU_CACHE_MAX_ENTRIES
+        self.use_redis = settings.EDU_CACHE_REDIS if use_redis is None else use_redis
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._locks: Dict[str, List[Any]] = {}
+        self._redis = None
+        self.hits = {"memory": 0, "redis": 0}
+        self.misses = 0
+
+    def _key(self, doc_id: str) -> str:
+        return f"{REDIS_PREFIX}:{settings.EDU_CACHE_VERSION}:{doc_id}"
+
+    async def _call_redis(self, operation: Callable[[Any], Any]) -> Any:
+        """Run a Redis command off the event loop; errors degrade to a memory-only miss"""
+        if not self.use_redis:
+            return None
+        if self._redis is None:
+            try:
+                from utils.redis_memory import shared_client
+                self._redis = shared_client()
+            except Exception as e:
+                logger.warning(f"Redis result cache unavailable, using memory only: {e}")
+                self.use_redis = False
+                return None
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(None, operation, self._redis)
+        except Exception as e:
+            logger.warning(f"Redis result cache command failed: {e}")
+            return None
+
+    def _memory_get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(doc_id)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[doc_id]
+            return None
+        self._entries.move_to_end(doc_id)
+        return value
+
+    def _memory_put(self, doc_id: str, value: Dict[str, Any], ttl_seconds: float):
+        self._entries[doc_id] = (time.monotonic() + ttl_seconds, value)
+        self._entries.move_to_end(doc_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """A copy of the cached entry, from memory or else Redis (which then warms memory)"""
+        value = self._memory_get(doc_id)
+        if value is not None:
+            self.hits["memory"] += 1
+            return copy.deepcopy(value)
+
+        key = self._key(doc_id)
+        found = await self._call_redis(lambda client: client.pipeline().get(key).ttl(key).execute())
+        if found and found[0]:
+            try:
+                value = json.loads(found[0])
+            except ValueError:
+                value = None
+            if value is not None:
+                # Don't let the memory copy outlive the shared entry
+                remaining = found[1] if found[1] and found[1] > 0 else self.ttl_seconds
+                self._memory_put(doc_id, value, min(self.ttl_seconds, remaining))
+                self.hits["redis"] += 1
+                return copy.deepcopy(value)
+
+        self.misses += 1
+        return None
+
+    async def put(self, doc_id: str, value: Dict[str, Any]):
+        self._memory_put(doc_id, copy.deepcopy(value), self.ttl_seconds)
+        key = self._key(doc_id)
+        payload = json.dumps(value, default=str)
+        await self._call_redis(lambda client: client.set(key, payload, ex=max(1, int(self.ttl_seconds))))
+
+    async def invalidate(self, doc_id: str) -> bool:
+        """Drop a document's entry from both tiers; True if either had it"""
+        removed = self._entries.pop(doc_id, None) is not None
+        key = self._key(doc_id)
+        deleted = await self._call_redis(lambda client: client.delete(key))
+        return removed or bool(deleted)
+
+    @asynccontextmanager
+    async def single_flight(self, doc_id: str) -> AsyncIterator[None]:
+        """Serialize work per document, so identical concurrent uploads are processed once"""
+        holder = self._locks.setdefault(doc_id, [asyncio.Lock(), 0])
+        holder[1] += 1
+        try:
+            async with holder[0]:
+                yield
+        finally:
+            holder[1] -= 1
+            if holder[1] == 0:
+                del self._locks[doc_id]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "hits": dict(self.hits),
+            "misses": self.misses,
+            "redis": self.use_redis,
+        }
+
+# Global result cache instance
+education_result_cache = EducationResultCache()
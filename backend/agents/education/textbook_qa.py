@@ -0,0 +1,131 @@
+# agents/education/textbook_qa.py
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from groq import Groq
+
+from config.settings import settings
+from utils.pdf_extraction import split_marked_pages
+from utils.text_chunker import count_tokens
+from agents.education.document_processor import education_processor
+from agents.health.reranker import reranker
+
+logger = logging.getLogger(__name__)
+
+TUTOR_SYSTEM_PROMPT = ("You are a patient tutor answering a student's questions about their textbook. "
+                       "Answer only from the provided excerpts.")
+
+class TextbookQA:
+    """
+    "Ask the textbook": answers a student's question from the top chunks of
+    one indexed document instead of resending the document. Retrieval is
+    scoped by doc_id and the context is capped at EDU_QA_CONTEXT_TOKENS, so
+    the cost per question stays flat however long the book is.
+    """
+
+    def __init__(self, top_k: Optional[int] = None, context_tokens: Optional[int] = None):
+        self.groq_client = Groq(api_key=settings.GROQ_API_KEY)
+        self.top_k = top_k or settings.EDU_QA_TOP_K
+        self.context_tokens = context_tokens or settings.EDU_QA_CONTEXT_TOKENS
+        self._indexing: Dict[str, asyncio.Task] = {}
+
+    def index_in_background(self, doc_id: str, raw_text: str) -> asyncio.Task:
+        """Index a processed document's text (page-marked) unless it is already indexed"""
+        running = self._indexing.get(doc_id)
+        if running is not None and not running.done():
+            return running
+        task = asyncio.create_task(self._index(doc_id, raw_text))
+        self._indexing[doc_id] = task
+        task.add_done_callback(lambda _: self._indexing.pop(doc_id, None))
+        return task
+
+    async def _index(self, doc_id: str, raw_text: str) -> bool:
+        if await education_processor.is_indexed(doc_id):
+            return True
+        stats: Dict[str, int] = {}
+        success = await education_processor.index_pages(split_marked_pages(raw_text), doc_id, stats)
+        logger.info(f"Indexed {doc_id[:12]} for textbook Q&A: {stats.get('pages', 0)} pages, "
+                    f"{stats.get('chunks', 0)} chunks")
+        return success
+
+    def _fit_context(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Best passages first, as many as fit the token budget (always at least one)"""
+        passages, used = [], 0
+        for result in results:
+            tokens = result.get("metadata", {}).get("token_count") or count_tokens(result["text"])
+            if passages and used + tokens > self.context_tokens:
+                break
+            passages.append(result)
+            used += tokens
+        return passages
+
+    async def ask(self, doc_id: str, question: str, top_k: Optional[int] = None) -> Dict[str, Any]:
+        """Answer from the document's top chunks; raises KeyError if the document isn't indexed"""
+        running = self._indexing.get(doc_id)
+        if running is not None:
+            # Asked right after upload: wait for indexing rather than answer from nothing
+            await asyncio.shield(running)
+
+        top_k = top_k or self.top_k
+        candidates = max(settings.RERANK_CANDIDATES, top_k) if settings.RERANK_ENABLED else top_k
+        results = await education_processor.search_educational_content(question, doc_id, candidates)
+        if not results:
+            raise KeyError(doc_id)
+        if settings.RERANK_ENABLED:
+            try:
+                results = await reranker.rerank(question, results, top_k)
+            except Exception as e:
+                # Reranking is an optimisation; fall back to dense ordering
+                logger.warning(f"Reranking failed, using dense ranking: {e}")
+        passages = self._fit_context(results[:top_k])
+
+        answer = await self._generate_answer(question, passages)
+        return {
+            "doc_id": doc_id,
+            "question": question,
+            "answer": answer,
+            "sources": [
+                {
+                    "text": passage["text"],
+                    "score": passage.get("rerank_score", passage["score"]),
+                    "page_start": passage.get("metadata", {}).get("page_start"),
+                    "page_end": passage.get("metadata", {}).get("page_end"),
+                }
+                for passage in passages
+            ],
+        }
+
+    async def _generate_answer(self, question: str, passages: List[Dict[str, Any]]) -> str:
+        excerpts = []
+        for passage in passages:
+            metadata = passage.get("metadata", {})
+            start, end = metadata.get("page_start"), metadata.get("page_end")
+            pages = f"p. {start}" if start == end else f"pp. {start}-{end}"
+            excerpts.append(f"[{pages}]\n{passage['text']}")
+        excerpts_text = "\n\n".join(excerpts)
+
+        prompt = f"""
+        TEXTBOOK EXCERPTS:
+        {excerpts_text}
+
+        STUDENT QUESTION: {question}
+
+        Answer clearly at the student's level, citing pages like (p. 12).
+        If the excerpts don't cover the question, say so instead of guessing.
+        """
+
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(None, lambda: self.groq_client.chat.completions.create(
+            model=settings.GROQ_MODEL,
+            messages=[
+                {"role": "system", "content": TUTOR_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.2,
+            max_tokens=700
+        ))
+        return response.choices[0].message.content
+
+# Global textbook Q&A instance
+textbook_qa = TextbookQA()
@@ -0,0 +1,116 @@
+# agents/health/answer_cache.py
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class _CachedAnswer:
+    question: str
+    vector: np.ndarray
+    result: Dict[str, Any]
+    created_at: float = field(default_factory=time.monotonic)
+    hits: int = 0
+
+class SemanticAnswerCache:
+    """
+    Answers keyed by document hash and question embedding.
+    A new question whose embedding is within `threshold` cosine similarity of
+    a cached question for the same document (and user context) reuses that
+    answer. Entries expire after `ttl_seconds`; the least recently used
+    documents and oldest questions are evicted when limits are reached.
+    """
+
+    def __init__(self, threshold: Optional[float] = None, ttl_seconds: Optional[float] = None,
+                 max_entries_per_doc: Optional[int] = None, max_documents: Optional[int] = None):
+        self.threshold = threshold or settings.ANSWER_CACHE_THRESHOLD
+        self.ttl_seconds = ttl_seconds or settings.ANSWER_CACHE_TTL_SECONDS
+        self.max_entries_per_doc = max_entries_per_doc or settings.ANSWER_CACHE_MAX_PER_DOC
+        self.max_documents = max_documents or settings.ANSWER_CACHE_MAX_DOCS
+        self._scopes: "OrderedDict[str, List[_CachedAnswer]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _scope(self, doc_id: str, user_context: str = "") -> str:
+        # The prompt includes the user context, so answers are only shared when it matches
+        context_hash = hashlib.sha1((user_context or "").encode("utf-8")).hexdigest()[:16]
+        return f"{doc_id}:{context_hash}"
+
+    def _normalize(self, vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _live_entries(self, scope: str) -> List[_CachedAnswer]:
+        entries = self._scopes.get(scope)
+        if not entries:
+            return []
+        now = time.monotonic()
+        live = [entry for entry in entries if now - entry.created_at < self.ttl_seconds]
+        if len(live) != len(entries):
+            if live:
+                self._scopes[scope] = live
+            else:
+                del self._scopes[scope]
+        return live
+
+    def lookup(self, doc_id: str, question_vector, user_context: str = "") -> Optional[Dict[str, Any]]:
+        """Return the cached result for the most similar question above the threshold"""
+        scope = self._scope(doc_id, user_context)
+        entries = self._live_entries(scope)
+        if not entries:
+            self.misses += 1
+            return None
+
+        query = self._normalize(question_vector)
+        similarities = np.stack([entry.vector for entry in entries]) @ query
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            self.misses += 1
+            return None
+
+        entry = entries[best]
+        entry.hits += 1
+        self.hits += 1
+        self._scopes.move_to_end(scope)
+        logger.info(f"Answer cache hit ({similarities[best]:.3f}) for '{entry.question}'")
+        return dict(entry.result, cached_question=entry.question,
+                    cache_similarity=float(similarities[best]))
+
+    def store(self, doc_id: str, question: str, question_vector, result: Dict[str, Any],
+              user_context: str = ""):
+        """Cache a freshly generated result for this document"""
+        scope = self._scope(doc_id, user_context)
+        entries = self._live_entries(scope)
+        entries.append(_CachedAnswer(question, self._normalize(question_vector), result))
+        if len(entries) > self.max_entries_per_doc:
+            del entries[:len(entries) - self.max_entries_per_doc]
+
+        self._scopes[scope] = entries
+        self._scopes.move_to_end(scope)
+        while len(self._scopes) > self.max_documents:
+            self._scopes.popitem(last=False)
+
+    def invalidate(self, doc_id: str):
+        """Drop every cached answer for a document"""
+        for scope in [scope for scope in self._scopes if scope.startswith(f"{doc_id}:")]:
+            del self._scopes[scope]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "documents": len(self._scopes),
+            "entries": sum(len(entries) for entries in self._scopes.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+# Global answer cache instance
+answer_cache = SemanticAnswerCache()
@@ -1,18 +1,35 @@
 # agents/health/document_processor.py
+import hashlib
 import logging
-import re
 import uuid
-from typing import List, Dict, Any
-import PyPDF2
+from typing import List, Dict, Any, Optional, Iterable, Iterator
 
 from config.settings import settings
 from agents.health.qdrant_client import qdrant_client
+from agents.health.answer_cache import answer_cache
+from utils.pdf_extraction import (PageText, PdfSource, describe_source, is_in_memory,
+                                  iter_pdf_pages, stream_pdf_page_batches)
+from utils.text_chunker import Chunk, TextChunker
+from utils.keyword_tagger import KeywordTagger
 
 logger = logging.getLogger(__name__)
 
+# Chunks embedded and upserted per round trip while streaming a document
+STORE_BATCH_SIZE = 64
+
+# Keyword vocabularies for chunk tagging; pass another mapping to the processor to override
+MEDICAL_VOCABULARY = {
+    "medical_terms": [
+        'patient', 'treatment', 'diagnosis', 'symptoms', 'medication',
+        'dose', 'therapy', 'clinical', 'hospital', 'doctor', 'nurse',
+        'blood', 'pressure', 'heart', 'lung', 'kidney', 'liver'
+    ],
+}
+
 class HealthDocumentProcessor:
-    def __init__(self):
-        pass
+    def __init__(self, vocabulary: Optional[Dict[str, List[str]]] = None):
+        self.tagger = KeywordTagger(vocabulary or MEDICAL_VOCABULARY)
+        self.chunker = TextChunker(settings.CHUNK_TOKENS, settings.CHUNK_OVERLAP_TOKENS)
         
     async def initialize(self):
         """Initialize document processor"""
@@ -22,108 +39,240 @@ class HealthDocumentProcessor:
             logger.error(f"Failed to initialize document processor: {e}")
             return False
     
-    def extract_text_from_pdf(self, pdf_path: str) -> str:
+    def compute_doc_id(self, pdf_path: PdfSource) -> str:
+        """Content hash of the PDF, used as a stable document id in Qdrant payloads"""
+        if is_in_memory(pdf_path):
+            return hashlib.sha256(pdf_path).hexdigest()
+        digest = hashlib.sha256()
+        with open(pdf_path, 'rb') as file:
+            for block in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def extract_text_from_pdf(self, pdf_path: PdfSource) -> str:
         """Extract text from PDF document"""
         try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                full_text = ""
-                
-                for page_num, page in enumerate(pdf_reader.pages):
-                    text = page.extract_text()
-                    if text:
-                        full_text += f"Page {page_num+1}: {text}\n\n"
-            return full_text
+            return "".join(f"Page {page.page_number}: {page.text}\n\n"
+                           for page in iter_pdf_pages(pdf_path))
         except Exception as e:
             logger.error(f"PDF extraction failed: {e}")
             raise
     
-    def chunk_text(self, text: str, chunk_size: int = None, 
-                  chunk_overlap: int = None) -> List[Dict[str, Any]]:
+    def chunk_text(self, text: str, chunk_tokens: int = None, 
+                  overlap_tokens: int = None) -> List[Dict[str, Any]]:
         """Split text into meaningful chunks with metadata"""
-        chunk_size = chunk_size or settings.CHUNK_SIZE
-        chunk_overlap = chunk_overlap or settings.CHUNK_OVERLAP
-        
-        # Split by sentences first
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        
-        chunks = []
-        current_chunk = ""
-        chunk_id = 0
-        
-        for sentence in sentences:
-            if len(current_chunk) + len(sentence) < chunk_size:
-                current_chunk += sentence + " "
-            else:
-                if current_chunk:
-                    chunks.append({
-                        "id": str(uuid.uuid4()),
-                        "text": current_chunk.strip(),
-                        "chunk_index": chunk_id,
-                        "source": "pdf_extraction",
-                        "metadata": {
-                            "chunk_size": len(current_chunk),
-                            "contains_medical_terms": self._contains_medical_terms(current_chunk)
-                        }
-                    })
-                    chunk_id += 1
-                
-                # Keep overlap from previous chunk
-                overlap_start = max(0, len(current_chunk) - chunk_overlap)
-                current_chunk = current_chunk[overlap_start:] + sentence + " "
-        
-        # Add the last chunk
-        if current_chunk:
-            chunks.append({
-                "id": str(uuid.uuid4()),
-                "text": current_chunk.strip(),
-                "chunk_index": chunk_id,
-                "source": "pdf_extraction",
-                "metadata": {
-                    "chunk_size": len(current_chunk),
-                    "contains_medical_terms": self._contains_medical_terms(current_chunk)
-                }
+        chunker = self.chunker
+        if chunk_tokens or overlap_tokens is not None:
+            chunker = TextChunker(chunk_tokens or settings.CHUNK_TOKENS,
+                                  overlap_tokens if overlap_tokens is not None else settings.CHUNK_OVERLAP_TOKENS)
+        return self._apply_tags([self._create_chunk(chunk) for chunk in chunker.chunk_text(text)])
+    
+    def chunk_pages(self, pages: Iterable[PageText]) -> Iterator[Dict[str, Any]]:
+        """Chunk a stream of pages, yielding chunks as soon as they fill up"""
+        for chunk in self.chunker.iter_chunks(pages):
+            yield self._apply_tags([self._create_chunk(chunk)])[0]
+    
+    def _create_chunk(self, chunk: Chunk) -> Dict[str, Any]:
+        return {
+            "id": str(uuid.uuid4()),
+            "text": chunk.text,
+            "chunk_index": chunk.chunk_index,
+            "source": "pdf_extraction",
+            "metadata": {
+                "chunk_size": len(chunk.text),
+                "token_count": chunk.token_count,
+                "start_char": chunk.start,
+                "end_char": chunk.end,
+                "page_start": chunk.page_start,
+                "page_end": chunk.page_end
+            }
+        }
+    
+    def _apply_tags(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Tag a batch of chunks with keyword metadata in one scan"""
+        counts_batch = self.tagger.tag_batch([chunk["text"] for chunk in chunks])
+        for chunk, counts in zip(chunks, counts_batch):
+            chunk["metadata"].update({
+                "keyword_counts": counts,
+                "contains_medical_terms": counts["medical_terms"] > 0
             })
-        
         return chunks
     
     def _contains_medical_terms(self, text: str) -> bool:
         """Simple check for medical terms in text"""
-        medical_keywords = [
-            'patient', 'treatment', 'diagnosis', 'symptoms', 'medication',
-            'dose', 'therapy', 'clinical', 'hospital', 'doctor', 'nurse',
-            'blood', 'pressure', 'heart', 'lung', 'kidney', 'liver'
-        ]
-        
-        text_lower = text.lower()
-        return any(keyword in text_lower for keyword in medical_keywords)
+        return self.tagger.tag(text)["medical_terms"] > 0
+    
+    def _page_key(self, text: str, occurrences: Dict[str, int]) -> str:
+        # Content hash of the page; repeated identical pages are told apart by occurrence
+        page_hash = hashlib.sha1(text.strip().encode("utf-8")).hexdigest()
+        occurrence = occurrences.get(page_hash, 0)
+        occurrences[page_hash] = occurrence + 1
+        return f"{page_hash}:{occurrence}"
+    
+    def _page_chunk_id(self, doc_key: str, doc_id: str, page_key: str, chunk_index: int) -> str:
+        # Stable for the same page of the same version, so a retried page overwrites itself
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{doc_key}/{doc_id}/{page_key}/{chunk_index}"))
+    
+    def _chunk_page(self, page: PageText, doc_key: str, doc_id: str, page_key: str) -> List[Dict[str, Any]]:
+        """Chunks of a single page of one version of a document"""
+        stream = self.chunker.stream()
+        chunks = [self._create_chunk(chunk) for chunk in stream.feed(*page) + stream.flush()]
+        for chunk in chunks:
+            chunk["id"] = self._page_chunk_id(doc_key, doc_id, page_key, chunk["chunk_index"])
+            chunk["doc_key"] = doc_key
+            chunk["page_key"] = page_key
+            chunk["page_number"] = page.page_number
+        return chunks
     
-    async def process_and_store_documents(self, pdf_path: str) -> bool:
-        """Process PDF and store chunks in Qdrant"""
+    async def reindex_document(self, pdf_path: PdfSource, doc_key: str, doc_id: Optional[str] = None,
+                               user_id: Optional[str] = None,
+                               stats: Optional[Dict[str, int]] = None) -> bool:
+        """
+        Index this version of the document under `doc_key`, reusing what earlier
+        versions already embedded. Pages are matched by content hash: only new or
+        changed pages are chunked and embedded, and the chunks of kept pages are
+        copied with their vectors into the new version (renumbered if they moved).
+        Every version has its own points, so chunks a search may be reading are
+        never rewritten; the versions indexed before this one are deleted once
+        it is complete. Chunks never span pages in this mode.
+        Page and embedded-chunk counts are added to `stats` when given.
+        """
         try:
-            # Extract text
-            text = self.extract_text_from_pdf(pdf_path)
+            doc_id = doc_id or self.compute_doc_id(pdf_path)
+            indexed = await qdrant_client.get_indexed_pages(doc_key)
+            if indexed is None:
+                return False
+            
+            occurrences: Dict[str, int] = {}
+            kept_pages: Dict[str, int] = {}
+            batch: List[Dict[str, Any]] = []
+            total_pages = new_pages = total_chunks = 0
+            success = True
+            
+            async def store_batch(chunks: List[Dict[str, Any]]) -> bool:
+                for chunk in self._apply_tags(chunks):
+                    chunk["doc_id"] = doc_id
+                    chunk["user_id"] = user_id
+                return await qdrant_client.store_documents(chunks)
+            
+            async for pages in stream_pdf_page_batches(pdf_path):
+                total_pages += len(pages)
+                for page in pages:
+                    page_key = self._page_key(page.text, occurrences)
+                    versions = indexed.get(page_key)
+                    if versions is not None:
+                        # Already in this version when the same file is uploaded again
+                        if doc_id not in versions:
+                            kept_pages[page_key] = page.page_number
+                        continue
+                    
+                    new_pages += 1
+                    batch.extend(self._chunk_page(page, doc_key, doc_id, page_key))
+                    if len(batch) >= STORE_BATCH_SIZE:
+                        success = await store_batch(batch) and success
+                        total_chunks += len(batch)
+                        batch = []
+            
+            if batch:
+                success = await store_batch(batch) and success
+                total_chunks += len(batch)
+            
+            success = await qdrant_client.copy_pages(
+                doc_key, kept_pages, {"doc_id": doc_id, "user_id": user_id},
+                point_id=lambda chunk: self._page_chunk_id(doc_key, doc_id, chunk["page_key"], chunk["chunk_index"])
+            ) and success
+            
+            # Older versions stay searchable until this one is complete; versions
+            # that appeared since the pages were listed belong to other uploads
+            old_doc_ids = sorted(set().union(*indexed.values()) - {doc_id})
+            if success and old_doc_ids:
+                success = await qdrant_client.delete_documents(filter={"must": [
+                    {"key": "doc_key", "match": {"value": doc_key}},
+                    {"key": "doc_id", "match": {"any": old_doc_ids}},
+                ]})
+                # Answers about superseded versions can no longer be served
+                for old_doc_id in old_doc_ids:
+                    answer_cache.invalidate(old_doc_id)
+            
+            logger.info(f"Reindexed {doc_key}: {new_pages} new/changed pages ({total_chunks} chunks), "
+                        f"{len(kept_pages)} copied from {len(old_doc_ids)} earlier version(s)")
+            if stats is not None:
+                stats["pages"] = stats.get("pages", 0) + total_pages
+                stats["chunks"] = stats.get("chunks", 0) + total_chunks
+            return success
+            
+        except Exception as e:
+            logger.error(f"Incremental reindex of {doc_key} failed: {e}")
+            return False
+    
+    async def process_and_store_documents(self, pdf_path: PdfSource, doc_id: Optional[str] = None,
+                                          user_id: Optional[str] = None,
+                                          doc_key: Optional[str] = None,
+                                          stats: Optional[Dict[str, int]] = None) -> bool:
+        """
+        Process PDF and store chunks in Qdrant.
+        With a `doc_key` (a stable name for the document across versions) only
+        the pages that changed since the last upload are re-embedded.
+        """
+        if doc_key:
+            return await self.reindex_document(pdf_path, doc_key, doc_id=doc_id, user_id=user_id,
+                                               stats=stats)
+        
+        try:
+            doc_id = doc_id or self.compute_doc_id(pdf_path)
+            
+            # Extract, chunk and store page by page; only one batch is held at a time
+            stream = self.chunker.stream()
+            batch: List[Dict[str, Any]] = []
+            total_pages = total_chunks = 0
+            success = True
+            
+            async def store_batch(chunks: List[Dict[str, Any]]) -> bool:
+                for chunk in self._apply_tags(chunks):
+                    # Tag chunks with their owner so searches can be scoped; the same
+                    # upload again overwrites its points instead of duplicating them
+                    chunk["id"] = str(uuid.uuid5(uuid.NAMESPACE_URL,
+                                                 f"{user_id}/{doc_id}/{chunk['chunk_index']}"))
+                    chunk["doc_id"] = doc_id
+                    chunk["user_id"] = user_id
+                return await qdrant_client.store_documents(chunks)
             
-            # Chunk text
-            chunks = self.chunk_text(text)
+            # Pages are extracted in the process pool and arrive in order, range by range
+            async for pages in stream_pdf_page_batches(pdf_path):
+                total_pages += len(pages)
+                for page in pages:
+                    batch.extend(self._create_chunk(chunk) for chunk in stream.feed(*page))
+                    if len(batch) >= STORE_BATCH_SIZE:
+                        success = await store_batch(batch) and success
+                        total_chunks += len(batch)
+                        batch = []
             
-            # Store in Qdrant
-            success = await qdrant_client.store_documents(chunks)
+            batch.extend(self._create_chunk(chunk) for chunk in stream.flush())
+            if batch:
+                success = await store_batch(batch) and success
+                total_chunks += len(batch)
             
-            logger.info(f"Processed {len(chunks)} chunks from {pdf_path}")
+            logger.info(f"Processed {total_chunks} chunks from {describe_source(pdf_path)}")
+            if stats is not None:
+                stats["pages"] = stats.get("pages", 0) + total_pages
+                stats["chunks"] = stats.get("chunks", 0) + total_chunks
             return success
             
         except Exception as e:
             logger.error(f"Document processing failed: {e}")
             return False
     
-    async def search_health_documents(self, query: str, top_k: int = None) -> List[Dict[str, Any]]:
-        """Search health documents"""
+    async def search_health_documents(self, query: str, top_k: int = None,
+                                      doc_id: Optional[str] = None,
+                                      user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Search health documents, scoped to a document and/or user when given"""
         top_k = top_k or settings.TOP_K_RESULTS
         
         try:
             # Get semantic search results
-            semantic_results = await qdrant_client.search_similar(query, top_k)
+            semantic_results = await qdrant_client.search_similar(
+                query, top_k, doc_id=doc_id, user_id=user_id
+            )
             
             return semantic_results
             
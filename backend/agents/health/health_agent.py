@@ -3,7 +3,7 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from typing import Any, Dict, List, TypedDict, Optional
+from typing import Any, AsyncIterator, Dict, List, TypedDict, Optional
 from groq import Groq
 
 # LangGraph imports
@@ -13,16 +13,25 @@ from langgraph.checkpoint.memory import MemorySaver
 from config.settings import settings
 from agents.health.qdrant_client import qdrant_client
 from agents.health.document_processor import document_processor
+from agents.health.reranker import reranker
+from agents.health.answer_cache import answer_cache
+from utils.embedding_service import embedding_service
+from utils.pdf_extraction import PdfSource
 
 logger = logging.getLogger(__name__)
 
+# Prefix of the fallback answer returned when the LLM call fails (never cached)
+LLM_ERROR_PREFIX = "I encountered an error generating the answer."
+
 # ---------- Health Graph State ----------
 class HealthState(TypedDict, total=False):
     # inputs
-    pdf_path: str
+    pdf_path: PdfSource  # file path or in-memory PDF bytes
     question: str
     user_context: str
     user_id: str
+    doc_id: str
+    doc_key: str  # stable name of the document across versions, enables incremental reindexing
     
     # processing state
     extracted_text: str
@@ -64,7 +73,12 @@ async def process_documents_node(state: HealthState) -> HealthState:
         return state
     
     try:
-        success = await document_processor.process_and_store_documents(pdf_path)
+        success = await document_processor.process_and_store_documents(
+            pdf_path,
+            doc_id=state.get("doc_id"),
+            user_id=state.get("user_id"),
+            doc_key=state.get("doc_key")
+        )
         if not success:
             state["errors"] = ["Failed to process and store documents"]
         
@@ -90,10 +104,15 @@ async def search_documents_node(state: HealthState) -> HealthState:
         if user_context:
             enhanced_query = f"{question} Context: {user_context}"
         
-        # Search for relevant documents
+        # Pull a wider candidate set when a rerank stage follows
+        top_k = settings.RERANK_CANDIDATES if settings.RERANK_ENABLED else settings.TOP_K_RESULTS
+        
+        # Search only the uploaded document, or the user's own documents
         results = await document_processor.search_health_documents(
             enhanced_query, 
-            settings.TOP_K_RESULTS
+            top_k,
+            doc_id=state.get("doc_id"),
+            user_id=state.get("user_id")
         )
         
         state["search_results"] = results
@@ -103,6 +122,27 @@ async def search_documents_node(state: HealthState) -> HealthState:
         state["errors"] = [f"Document search failed: {e}"]
         return state
 
+async def rerank_documents_node(state: HealthState) -> HealthState:
+    """Rescore dense candidates with a cross-encoder and keep the best few"""
+    if state.get("errors"):
+        return state
+    
+    search_results = state.get("search_results", [])
+    if not search_results:
+        return state
+    
+    try:
+        state["search_results"] = await reranker.rerank(
+            state.get("question", ""),
+            search_results,
+            settings.RERANK_TOP_N
+        )
+        return state
+    except Exception as e:
+        # Reranking is an optimisation; fall back to dense ordering
+        logger.warning(f"Reranking failed, using dense ranking: {e}")
+        return state
+
 async def generate_answer_node(state: HealthState) -> HealthState:
     """Generate answer based on search results"""
     if state.get("errors"):
@@ -117,25 +157,34 @@ async def generate_answer_node(state: HealthState) -> HealthState:
         return state
     
     try:
-        # If we have search results, use them as context
-        if search_results:
-            context = "\n\n".join([result["text"] for result in search_results[:3]])
-            answer = await _generate_llm_answer(question, context, user_context)
-            state["answer"] = answer
-            state["sources"] = search_results
-            state["confidence"] = _calculate_confidence(search_results)
-        else:
-            # If no search results, generate answer directly
-            answer = await _generate_llm_answer(question, "", user_context)
-            state["answer"] = answer
-            state["confidence"] = 0.5  # Medium confidence for direct answers
-        
+        state.update(await _answer_from_results(question, search_results, user_context))
         return state
         
     except Exception as e:
         state["errors"] = [f"Answer generation failed: {e}"]
         return state
 
+async def _answer_from_results(question: str, search_results: List[Dict[str, Any]],
+                               user_context: str) -> Dict[str, Any]:
+    """Answer, sources and confidence for a question given its search results"""
+    # If we have search results, use them as context
+    if search_results:
+        context = "\n\n".join([result["text"] for result in search_results[:3]])
+        answer = await _generate_llm_answer(question, context, user_context)
+        return {
+            "answer": answer,
+            "sources": search_results,
+            "confidence": _calculate_confidence(search_results)
+        }
+    
+    # If no search results, generate answer directly
+    answer = await _generate_llm_answer(question, "", user_context)
+    return {
+        "answer": answer,
+        "sources": [],
+        "confidence": 0.5  # Medium confidence for direct answers
+    }
+
 async def _generate_llm_answer(question: str, context: str, user_context: str) -> str:
     """Generate answer using GROQ LLM"""
     try:
@@ -170,7 +219,9 @@ async def _generate_llm_answer(question: str, context: str, user_context: str) -
             ANSWER:
             """
         
-        response = groq_client.chat.completions.create(
+        # The Groq client is synchronous; run it off the event loop so answers can overlap
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(None, lambda: groq_client.chat.completions.create(
             model=settings.GROQ_MODEL,
             messages=[
                 {"role": "system", "content": "You are a helpful medical AI assistant that provides accurate information."},
@@ -178,13 +229,13 @@ async def _generate_llm_answer(question: str, context: str, user_context: str) -
             ],
             temperature=0.1,
             max_tokens=1000
-        )
+        ))
         
         return response.choices[0].message.content
         
     except Exception as e:
         logger.error(f"GROQ API call failed: {e}")
-        return f"I encountered an error generating the answer. Please try again. Error: {str(e)}"
+        return f"{LLM_ERROR_PREFIX} Please try again. Error: {str(e)}"
 
 def _calculate_confidence(search_results: List[Dict[str, Any]]) -> float:
     """Calculate confidence score based on search results"""
@@ -200,6 +251,12 @@ def _calculate_confidence(search_results: List[Dict[str, Any]]) -> float:
 def has_errors(state: HealthState) -> str:
     return "ERR" if state.get("errors") else "OK"
 
+def should_rerank(state: HealthState) -> str:
+    """Route through the rerank stage when it is enabled"""
+    if state.get("errors"):
+        return "ERR"
+    return "RERANK" if settings.RERANK_ENABLED else "OK"
+
 def should_process_documents(state: HealthState) -> str:
     """Check if we need to process documents"""
     return "PROCESS" if state.get("pdf_path") else "SKIP_PROCESS"
@@ -213,6 +270,7 @@ def build_health_pipeline() -> Any:
     graph.add_node("initialize", initialize_node)
     graph.add_node("process_documents", process_documents_node)
     graph.add_node("search_documents", search_documents_node)
+    graph.add_node("rerank_documents", rerank_documents_node)
     graph.add_node("generate_answer", generate_answer_node)
 
     # Set entry point
@@ -233,6 +291,12 @@ def build_health_pipeline() -> Any:
     
     graph.add_conditional_edges(
         "search_documents",
+        should_rerank,
+        {"ERR": END, "RERANK": "rerank_documents", "OK": "generate_answer"}
+    )
+    
+    graph.add_conditional_edges(
+        "rerank_documents",
         has_errors,
         {"ERR": END, "OK": "generate_answer"}
     )
@@ -253,10 +317,12 @@ class HealthAgent:
     def __init__(self):
         self.pipeline = build_health_pipeline()
     
-    async def process_health_query(self, pdf_path: Optional[str], 
+    async def process_health_query(self, pdf_path: Optional[PdfSource], 
                                  question: str, 
                                  user_context: str = "",
-                                 user_id: str = "anonymous") -> Dict[str, Any]:
+                                 user_id: str = "anonymous",
+                                 doc_id: Optional[str] = None,
+                                 doc_key: Optional[str] = None) -> Dict[str, Any]:
         """Process a health-related query"""
         initial_state = {
             "pdf_path": pdf_path,
@@ -264,26 +330,122 @@ class HealthAgent:
             "user_context": user_context,
             "user_id": user_id
         }
+        if doc_key:
+            initial_state["doc_key"] = doc_key
         
         try:
+            # Scope storage and search to this upload
+            if pdf_path and not doc_id:
+                doc_id = document_processor.compute_doc_id(pdf_path)
+            if doc_id:
+                initial_state["doc_id"] = doc_id
+            
+            # Near-identical questions about the same document reuse a cached answer
+            question_vector = None
+            if doc_id and settings.ANSWER_CACHE_ENABLED:
+                question_vector = await embedding_service.encode_one(question)
+                cached = answer_cache.lookup(doc_id, question_vector, user_context)
+                if cached:
+                    return {**cached, "cache_hit": True}
+            
             # Run the pipeline
             final_state = await self.pipeline.ainvoke(initial_state)
             
             # Return the results
-            return {
+            result = {
                 "answer": final_state.get("answer", ""),
                 "sources": final_state.get("sources", []),
                 "confidence": final_state.get("confidence", 0.0),
                 "errors": final_state.get("errors", [])
             }
             
+            if (question_vector is not None and result["answer"] and not result["errors"]
+                    and not result["answer"].startswith(LLM_ERROR_PREFIX)):
+                answer_cache.store(doc_id, question, question_vector, result, user_context)
+            
+            return {**result, "cache_hit": False}
+            
         except Exception as e:
             return {
                 "answer": "",
                 "sources": [],
                 "confidence": 0.0,
-                "errors": [f"Pipeline execution failed: {e}"]
+                "errors": [f"Pipeline execution failed: {e}"],
+                "cache_hit": False
             }
 
+    async def process_batch_questions(self, pdf_path: Optional[PdfSource],
+                                      questions: List[str],
+                                      user_context: str = "",
+                                      user_id: str = "anonymous",
+                                      doc_id: Optional[str] = None,
+                                      doc_key: Optional[str] = None,
+                                      concurrency: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Answer many questions about one document.
+        The document is ingested once, all questions are embedded in one batch,
+        searches run concurrently and answers are generated concurrently under
+        a cap. Results are yielded as each answer completes, tagged with the
+        index of their question.
+        """
+        concurrency = concurrency or settings.HEALTH_BATCH_CONCURRENCY
+        
+        if not (await qdrant_client.initialize() and await document_processor.initialize()):
+            yield {"index": -1, "errors": ["Failed to initialize health agent components"]}
+            return
+        
+        if pdf_path and not doc_id:
+            doc_id = document_processor.compute_doc_id(pdf_path)
+        
+        # Ingest once for all questions
+        if pdf_path and not await document_processor.process_and_store_documents(
+                pdf_path, doc_id=doc_id, user_id=user_id, doc_key=doc_key):
+            yield {"index": -1, "errors": ["Failed to process and store documents"]}
+            return
+        
+        # One embedding call: raw questions (cache keys) followed by search queries
+        queries = [f"{question} Context: {user_context}" if user_context else question
+                   for question in questions]
+        vectors = await embedding_service.encode(list(questions) + queries)
+        question_vectors, query_vectors = vectors[:len(questions)], vectors[len(questions):]
+        
+        top_k = settings.RERANK_CANDIDATES if settings.RERANK_ENABLED else settings.TOP_K_RESULTS
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def answer(index: int) -> Dict[str, Any]:
+            question = questions[index]
+            use_cache = doc_id and settings.ANSWER_CACHE_ENABLED
+            try:
+                if use_cache:
+                    cached = answer_cache.lookup(doc_id, question_vectors[index], user_context)
+                    if cached:
+                        return {"index": index, "question": question, **cached,
+                                "errors": [], "cache_hit": True}
+                
+                results = await qdrant_client.search_by_vector(
+                    query_vectors[index], top_k, doc_id=doc_id, user_id=user_id
+                )
+                if settings.RERANK_ENABLED and results:
+                    results = await reranker.rerank(question, results, settings.RERANK_TOP_N)
+                
+                async with semaphore:
+                    result = await _answer_from_results(question, results, user_context)
+                result["errors"] = []
+                
+                if use_cache and not result["answer"].startswith(LLM_ERROR_PREFIX):
+                    answer_cache.store(doc_id, question, question_vectors[index], result, user_context)
+                return {"index": index, "question": question, **result, "cache_hit": False}
+            except Exception as e:
+                return {"index": index, "question": question, "answer": "", "sources": [],
+                        "confidence": 0.0, "errors": [f"Question failed: {e}"], "cache_hit": False}
+        
+        tasks = [asyncio.create_task(answer(index)) for index in range(len(questions))]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
 # Export the health agent
 health_agent = HealthAgent()
\ No newline at end of file
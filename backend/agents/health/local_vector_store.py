@@ -0,0 +1,521 @@
+# agents/health/local_vector_store.py
+"""
+In-process vector store with the same interface as QdrantHealthClient.
+
+Select it with VECTOR_BACKEND=local; `agents.health.qdrant_client.qdrant_client`
+is then a LocalVectorStore, so every caller keeps working unchanged.
+
+Vectors are held normalized in one float32 matrix, so cosine search over a
+small collection (or over the rows a doc_id/user_id filter selects, found via
+in-memory payload indexes) is a single matrix multiply. Once a collection
+grows past LOCAL_VECTOR_EXACT_MAX live points it also gets an HNSW graph index
+(hnswlib), used by every search that still matches more than that many points;
+a filtered search walks the graph with hnswlib's label filter. Without
+hnswlib every search is exact.
+
+State lives under LOCAL_VECTOR_DIR/<collection>: vectors.npy (memory-mapped on
+restore, so cold start doesn't read the whole matrix), records.json (ids and
+payloads) and hnsw.bin. snapshot() writes it atomically; close() snapshots
+if anything changed.
+"""
+
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import os
+import shutil
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from config.settings import settings
+from utils.embedding_service import embedding_service
+
+# optional: approximate search for large collections
+try:
+    import hnswlib  # type: ignore
+    _HAS_HNSWLIB = True
+except Exception:
+    _HAS_HNSWLIB = False
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.npy"
+RECORDS_FILE = "records.json"
+HNSW_FILE = "hnsw.bin"
+
+# (payload key, accepted values) pairs that must all hold
+Conditions = List[Tuple[str, Set[Any]]]
+
+
+def _payload_value(payload: Dict[str, Any], key: str) -> Any:
+    # Dotted keys reach into nested payload, e.g. "metadata.contains_medical_terms"
+    value: Any = payload
+    for part in key.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class LocalVectorStore:
+    def __init__(self, collection_name: Optional[str] = None, path: Optional[str] = None,
+                 index_fields: Iterable[str] = (), exact_max: Optional[int] = None):
+        self.collection_name = collection_name or settings.QDRANT_COLLECTION
+        self.path = os.path.join(path or settings.LOCAL_VECTOR_DIR, self.collection_name)
+        self.index_fields = tuple(index_fields)
+        self.exact_max = exact_max or settings.LOCAL_VECTOR_EXACT_MAX
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._reset()
+
+    def _reset(self):
+        self._vectors: Optional[np.ndarray] = None  # capacity x dim, rows [0, _size) in use
+        self._live = np.zeros(0, dtype=bool)
+        self._size = 0
+        self._ids: List[str] = []
+        self._payloads: List[Optional[Dict[str, Any]]] = []  # None for deleted rows
+        self._rows: Dict[str, int] = {}
+        self._field_index: Dict[str, Dict[Any, Set[int]]] = {field: {} for field in self.index_fields}
+        self._hnsw = None
+        self._dirty = False
+
+    async def initialize(self):
+        """Start the embedding service and restore the last snapshot (once)"""
+        try:
+            if not await embedding_service.initialize():
+                return False
+            if not self._loaded:
+                if os.path.exists(os.path.join(self.path, RECORDS_FILE)):
+                    self.restore()
+                self._loaded = True
+                if _HAS_HNSWLIB:
+                    logger.info(f"Local vector store {self.collection_name}: exact search up to "
+                                f"{self.exact_max} matching points, HNSW above "
+                                f"({'built' if self._hnsw is not None else 'not built yet'})")
+                else:
+                    logger.warning(f"Local vector store {self.collection_name}: hnswlib is not installed, "
+                                   f"every search is exact")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to initialize local vector store: {e}")
+            return False
+
+    @property
+    def live_count(self) -> int:
+        return len(self._rows)
+
+    # ---------- Payload indexes and filters ----------
+    def _index_row(self, row: int, payload: Dict[str, Any], add: bool = True):
+        for field, values in self._field_index.items():
+            value = payload.get(field)
+            if value is None:
+                continue
+            rows = values.setdefault(value, set())
+            if add:
+                rows.add(row)
+            else:
+                rows.discard(row)
+                if not rows:
+                    del values[value]
+
+    def _conditions(self, filter: Optional[Dict] = None, doc_id: Optional[str] = None,
+                    user_id: Optional[str] = None) -> Conditions:
+        """Scoping arguments plus a Qdrant-style {"must": [{"key", "match"}]} filter dict"""
+        conditions: Conditions = []
+        if doc_id:
+            conditions.append(("doc_id", {doc_id}))
+        if user_id:
+            conditions.append(("user_id", {user_id}))
+        for condition in (filter or {}).get("must", []):
+            match = condition["match"]
+            values = set(match["any"]) if "any" in match else {match["value"]}
+            conditions.append((condition["key"], values))
+        unsupported = set(filter or {}) - {"must"}
+        if unsupported:
+            raise ValueError(f"Local vector store only supports 'must' filters, got {sorted(unsupported)}")
+        return conditions
+
+    def _matching_rows(self, conditions: Conditions) -> Optional[np.ndarray]:
+        """Live rows matching every condition, or None when nothing is filtered"""
+        if not conditions:
+            return None
+        rows: Optional[Set[int]] = None
+        scanned: Conditions = []
+        for key, values in conditions:
+            if key in self._field_index:
+                index = self._field_index[key]
+                matched = set().union(*(index.get(value, set()) for value in values))
+                rows = matched if rows is None else rows & matched
+            else:
+                scanned.append((key, values))
+        if rows is None:
+            rows = set(self._rows.values())
+        if scanned:
+            rows = {row for row in rows
+                    if all(_payload_value(self._payloads[row], key) in values for key, values in scanned)}
+        return np.fromiter(sorted(rows), dtype=np.int64, count=len(rows))
+
+    # ---------- Writes ----------
+    def _ensure_capacity(self, needed: int, dim: int):
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if self._vectors is not None and self._vectors.shape[1] != dim:
+            raise ValueError(f"Vector size {dim} does not match collection size {self._vectors.shape[1]}")
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        vectors = np.zeros((new_capacity, dim), dtype=np.float32)
+        live = np.zeros(new_capacity, dtype=bool)
+        if self._vectors is not None:
+            vectors[:self._size] = self._vectors[:self._size]
+            live[:self._size] = self._live[:self._size]
+        self._vectors, self._live = vectors, live
+        if self._hnsw is not None:
+            self._hnsw.resize_index(new_capacity)
+
+    def _upsert_sync(self, ids: List[str], vectors: np.ndarray, payloads: List[Dict[str, Any]]):
+        with self._lock:
+            self._ensure_capacity(self._size + len(ids), vectors.shape[1])
+            rows = []
+            for point_id, vector, payload in zip(ids, vectors, payloads):
+                row = self._rows.get(point_id)
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                    self._ids.append(point_id)
+                    self._payloads.append(None)
+                    self._rows[point_id] = row
+                else:
+                    self._index_row(row, self._payloads[row], add=False)
+                self._vectors[row] = vector
+                self._live[row] = True
+                self._payloads[row] = payload
+                self._index_row(row, payload)
+                rows.append(row)
+            if self._hnsw is not None:
+                self._hnsw.add_items(self._vectors[rows], rows)
+            self._dirty = True
+
+    def _store_sync(self, ids: List[str], vectors: np.ndarray, payloads: List[Dict[str, Any]]):
+        self._upsert_sync(ids, vectors, payloads)
+        self._maybe_build_hnsw()
+
+    def _delete_rows(self, rows: Iterable[int]) -> int:
+        deleted = 0
+        with self._lock:
+            for row in rows:
+                payload = self._payloads[row]
+                if payload is None:
+                    continue
+                self._index_row(row, payload, add=False)
+                self._payloads[row] = None
+                self._live[row] = False
+                del self._rows[self._ids[row]]
+                if self._hnsw is not None:
+                    self._hnsw.mark_deleted(row)
+                deleted += 1
+            self._dirty = self._dirty or deleted > 0
+        return deleted
+
+    async def store_documents(self, documents: List[Dict[str, Any]]) -> bool:
+        """Store documents with embeddings (upsert by id)"""
+        try:
+            embeddings = await embedding_service.encode([doc["text"] for doc in documents])
+            payloads = [{
+                "text": doc["text"],
+                "source": doc.get("source", "unknown"),
+                "chunk_index": doc.get("chunk_index", 0),
+                "doc_id": doc.get("doc_id"),
+                "user_id": doc.get("user_id"),
+                "doc_key": doc.get("doc_key"),
+                "page_key": doc.get("page_key"),
+                "page_number": doc.get("page_number"),
+                "metadata": doc.get("metadata", {})
+            } for doc in documents]
+            vectors = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+            # Row writes and HNSW inserts (or the first index build) are CPU work; keep them off the loop
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._store_sync, [str(doc["id"]) for doc in documents],
+                                       vectors, payloads)
+            logger.info(f"Stored {len(documents)} documents in local store {self.collection_name}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to store documents: {e}")
+            return False
+
+    async def count_documents(self, filter: Optional[Dict] = None, doc_id: Optional[str] = None,
+                              user_id: Optional[str] = None) -> int:
+        """Number of points matching the filter/scope (0 on error)"""
+        try:
+            conditions = self._conditions(filter, doc_id, user_id)
+            with self._lock:
+                rows = self._matching_rows(conditions)
+                return self.live_count if rows is None else len(rows)
+        except Exception as e:
+            logger.error(f"Failed to count documents: {e}")
+            return 0
+
+    async def delete_documents(self, filter: Optional[Dict] = None, doc_id: Optional[str] = None,
+                               user_id: Optional[str] = None) -> bool:
+        """Delete every point matching the filter/scope"""
+        try:
+            conditions = self._conditions(filter, doc_id, user_id)
+            if not conditions:
+                raise ValueError("Refusing to delete without a filter; use delete_collection()")
+            with self._lock:
+                deleted = self._delete_rows(self._matching_rows(conditions).tolist())
+            logger.info(f"Deleted {deleted} documents from local store {self.collection_name}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to delete documents: {e}")
+            return False
+
+    # ---------- Search ----------
+    def _maybe_build_hnsw(self):
+        with self._lock:
+            if self._hnsw is not None or not _HAS_HNSWLIB or self.live_count <= self.exact_max:
+                return
+            rows = np.flatnonzero(self._live[:self._size])
+            index = hnswlib.Index(space="ip", dim=self._vectors.shape[1])
+            index.init_index(max_elements=self._vectors.shape[0], ef_construction=200,
+                             M=settings.LOCAL_VECTOR_HNSW_M)
+            index.add_items(self._vectors[rows], rows)
+            self._hnsw = index
+            logger.info(f"Built HNSW index over {len(rows)} vectors in {self.collection_name}")
+
+    def _hnsw_search(self, query: np.ndarray, rows: Optional[np.ndarray],
+                     top_k: int) -> Optional[List[Tuple[int, float]]]:
+        """Approximate top_k over every live row, or only `rows`; None when the graph can't answer"""
+        live = self.live_count
+        k = min(top_k, live if rows is None else rows.size)
+        ef = max(settings.LOCAL_VECTOR_HNSW_EF, k)
+        allowed = None
+        if rows is not None:
+            allowed = set(rows.tolist())
+            # The graph walk skips rows the filter excludes, so widen the candidate list to match
+            ef = min(ef * -(-live // rows.size), live)
+        try:
+            self._hnsw.set_ef(ef)
+            labels, distances = self._hnsw.knn_query(
+                query, k=k, num_threads=1, filter=allowed.__contains__ if allowed is not None else None
+            )
+        except RuntimeError as e:
+            # e.g. fewer than k reachable points pass the filter
+            logger.warning(f"HNSW search failed, using exact search: {e}")
+            return None
+        # "ip" distance is 1 - dot product
+        return [(int(label), 1.0 - float(distance)) for label, distance in zip(labels[0], distances[0])]
+
+    def _exact_search(self, query: np.ndarray, rows: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        if rows.size == 0:
+            return []
+        scores = self._vectors[rows] @ query
+        if top_k < scores.size:
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            top = np.arange(scores.size)
+        top = top[np.argsort(-scores[top])]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+    def _search_sync(self, query_embedding: List[float], top_k: int,
+                     conditions: Conditions) -> List[Dict[str, Any]]:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        query = query / norm if norm else query
+
+        with self._lock:
+            if self._vectors is None or not self._rows:
+                return []
+            rows = self._matching_rows(conditions)
+            hits: Optional[List[Tuple[int, float]]] = None
+            # Few matching points are cheaper (and exact) to score directly
+            if self._hnsw is not None and (rows is None or rows.size > self.exact_max):
+                hits = self._hnsw_search(query, rows, top_k)
+            if hits is None:
+                if rows is None:
+                    rows = np.flatnonzero(self._live[:self._size])
+                hits = self._exact_search(query, rows, top_k)
+
+            results = []
+            for row, score in hits:
+                payload = self._payloads[row]
+                results.append({
+                    "text": payload["text"],
+                    "score": score,
+                    "source": payload.get("source", "unknown"),
+                    "doc_id": payload.get("doc_id"),
+                    "metadata": payload.get("metadata", {})
+                })
+            return results
+
+    async def search_similar(self, query: str, top_k: int = 5,
+                             filter: Optional[Dict] = None,
+                             doc_id: Optional[str] = None,
+                             user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Search for similar documents, optionally scoped to a document and/or user"""
+        try:
+            query_embedding = await embedding_service.encode_one(query)
+        except Exception as e:
+            logger.error(f"Search failed: {e}")
+            return []
+
+        return await self.search_by_vector(query_embedding, top_k, filter, doc_id=doc_id, user_id=user_id)
+
+    async def search_by_vector(self, query_embedding: List[float], top_k: int = 5,
+                               filter: Optional[Dict] = None,
+                               doc_id: Optional[str] = None,
+                               user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Search with a precomputed query embedding"""
+        try:
+            conditions = self._conditions(filter, doc_id, user_id)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self._search_sync, query_embedding, top_k, conditions)
+        except Exception as e:
+            logger.error(f"Search failed: {e}")
+            return []
+
+    async def hybrid_search(self, query: str, top_k: int = 5,
+                            filter: Optional[Dict] = None,
+                            doc_id: Optional[str] = None,
+                            user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Hybrid search combining semantic and keyword search"""
+        return await self.search_similar(query, top_k, filter, doc_id=doc_id, user_id=user_id)
+
+    # ---------- Incremental reindexing (see HealthDocumentProcessor.reindex_document) ----------
+    async def get_indexed_pages(self, doc_key: str) -> Optional[Dict[str, Set[str]]]:
+        """Page key -> doc_ids of the versions holding it, for every page indexed under a document key"""
+        with self._lock:
+            pages: Dict[str, Set[str]] = {}
+            for row in self._matching_rows([("doc_key", {doc_key})]).tolist():
+                payload = self._payloads[row]
+                if payload.get("page_key"):
+                    pages.setdefault(payload["page_key"], set()).add(payload.get("doc_id"))
+            return pages
+
+    async def copy_pages(self, doc_key: str, pages: Dict[str, int], payload: Dict[str, Any],
+                         point_id: Callable[[Dict[str, Any]], str]) -> bool:
+        """Copy a document's indexed pages into another version of it (see QdrantHealthClient.copy_pages)"""
+        if not pages:
+            return True
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._copy_pages_sync, doc_key, pages, payload, point_id)
+        return True
+
+    def _copy_pages_sync(self, doc_key: str, pages: Dict[str, int], payload: Dict[str, Any],
+                         point_id: Callable[[Dict[str, Any]], str]):
+        with self._lock:
+            ids: List[str] = []
+            rows: List[int] = []
+            payloads: List[Dict[str, Any]] = []
+            copied: Set[str] = set()
+            for row in self._matching_rows([("doc_key", {doc_key}), ("page_key", set(pages))]).tolist():
+                original = self._payloads[row]
+                if original.get("doc_id") == payload["doc_id"]:
+                    continue
+                copy = {**original, **payload}
+                page_number = pages[copy["page_key"]]
+                copy["page_number"] = page_number
+                copy["metadata"] = {**copy.get("metadata", {}), "page_start": page_number,
+                                    "page_end": page_number}
+                copy_id = point_id(copy)
+                if copy_id not in copied:
+                    copied.add(copy_id)
+                    ids.append(copy_id)
+                    rows.append(row)
+                    payloads.append(copy)
+            if ids:
+                self._store_sync(ids, self._vectors[rows], payloads)
+
+    # ---------- Persistence ----------
+    def _compact(self):
+        # Drop deleted rows so the snapshot only holds live points (the HNSW index is rebuilt)
+        rows = np.flatnonzero(self._live[:self._size])
+        ids = [self._ids[row] for row in rows]
+        payloads = [self._payloads[row] for row in rows]
+        vectors = self._vectors[rows]
+        had_hnsw = self._hnsw is not None
+        self._reset()
+        if ids:
+            self._upsert_sync(ids, vectors, payloads)
+        if had_hnsw:
+            self._maybe_build_hnsw()
+
+    def snapshot(self, path: Optional[str] = None):
+        """Write the store to `path` (default: its own directory), replacing it atomically"""
+        path = path or self.path
+        with self._lock:
+            if self._size - self.live_count > self._size // 4:
+                self._compact()
+
+            temp_path = f"{path}.tmp"
+            shutil.rmtree(temp_path, ignore_errors=True)
+            os.makedirs(temp_path)
+            vectors = self._vectors[:self._size] if self._vectors is not None else np.zeros((0, 0), np.float32)
+            np.save(os.path.join(temp_path, VECTORS_FILE), vectors)
+            with open(os.path.join(temp_path, RECORDS_FILE), "w", encoding="utf-8") as file:
+                json.dump({"collection": self.collection_name, "ids": self._ids,
+                           "payloads": self._payloads}, file)
+            if self._hnsw is not None:
+                self._hnsw.save_index(os.path.join(temp_path, HNSW_FILE))
+
+            old_path = f"{path}.old"
+            shutil.rmtree(old_path, ignore_errors=True)
+            if os.path.exists(path):
+                os.rename(path, old_path)
+            os.rename(temp_path, path)
+            shutil.rmtree(old_path, ignore_errors=True)
+            if path == self.path:
+                self._dirty = False
+        logger.info(f"Snapshot of {self.collection_name} ({self.live_count} points) written to {path}")
+
+    def restore(self, path: Optional[str] = None):
+        """Load a snapshot; vectors are memory-mapped (copy-on-write) rather than read in"""
+        path = path or self.path
+        with open(os.path.join(path, RECORDS_FILE), "r", encoding="utf-8") as file:
+            records = json.load(file)
+        vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="c")
+
+        with self._lock:
+            self._reset()
+            self._ids = records["ids"]
+            self._payloads = records["payloads"]
+            self._size = len(self._ids)
+            self._vectors = vectors if self._size else None
+            self._live = np.array([payload is not None for payload in self._payloads], dtype=bool)
+            for row, (point_id, payload) in enumerate(zip(self._ids, self._payloads)):
+                if payload is not None:
+                    self._rows[point_id] = row
+                    self._index_row(row, payload)
+
+            hnsw_path = os.path.join(path, HNSW_FILE)
+            if _HAS_HNSWLIB and self._size and os.path.exists(hnsw_path):
+                index = hnswlib.Index(space="ip", dim=vectors.shape[1])
+                index.load_index(hnsw_path, max_elements=self._size)
+                self._hnsw = index
+            self._loaded = True
+        self._maybe_build_hnsw()
+        logger.info(f"Restored {self.live_count} points into {self.collection_name} from {path}")
+
+    async def close(self):
+        """Persist unsaved changes"""
+        if self._dirty:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.snapshot)
+
+    async def delete_collection(self):
+        """Delete the collection (for testing/cleanup)"""
+        try:
+            with self._lock:
+                self._reset()
+                shutil.rmtree(self.path, ignore_errors=True)
+            logger.info(f"Deleted collection: {self.collection_name}")
+        except Exception as e:
+            logger.error(f"Failed to delete collection: {e}")
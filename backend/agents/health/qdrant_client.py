@@ -1,67 +1,228 @@
 # agents/health/qdrant_client.py
+import asyncio
 import logging
-from typing import List, Optional, Dict, Any
+from dataclasses import dataclass
+from typing import List, Optional, Dict, Any, Tuple, Callable, Set
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
-from sentence_transformers import SentenceTransformer
 
 from config.settings import settings
+from utils.embedding_service import embedding_service
 
 logger = logging.getLogger(__name__)
 
+# Payload fields used to scope searches and page updates; indexed so filtering stays cheap
+PAYLOAD_INDEX_FIELDS = ("doc_id", "user_id", "doc_key", "page_key")
+EDUCATION_INDEX_FIELDS = ("doc_id",)
+REPORTS_INDEX_FIELDS = ("doc_id", "user_id")
+
+# Points fetched per scroll request when listing a document's indexed pages
+SCROLL_PAGE_SIZE = 1024
+
+def build_quantization_config(mode: str, always_ram: bool = True) -> Optional[models.QuantizationConfig]:
+    """Map a quantization mode name ("none", "scalar", "binary") to a Qdrant config"""
+    if mode == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=always_ram
+            )
+        )
+    if mode == "binary":
+        return models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=always_ram)
+        )
+    if mode not in ("", "none"):
+        logger.warning(f"Unknown quantization mode '{mode}', storing full vectors only")
+    return None
+
+def quantization_mode(config: Any) -> str:
+    """The mode name of a collection's current quantization config ("none" when it has none)"""
+    if isinstance(config, models.ScalarQuantization):
+        return "scalar"
+    if isinstance(config, models.BinaryQuantization):
+        return "binary"
+    if isinstance(config, models.ProductQuantization):
+        return "product"
+    return "none"
+
+def build_search_params(mode: str, rescore: bool = True, oversampling: float = 2.0,
+                        exact: bool = False) -> Optional[models.SearchParams]:
+    """Search params for a collection quantized with the given mode"""
+    if exact:
+        return models.SearchParams(exact=True)
+    if mode not in ("scalar", "binary"):
+        return None
+    return models.SearchParams(
+        quantization=models.QuantizationSearchParams(
+            ignore=False,
+            rescore=rescore,
+            oversampling=oversampling
+        )
+    )
+
+@dataclass(frozen=True)
+class CollectionConfig:
+    """Storage and index settings of one domain's collection"""
+    name: str
+    quantization: str = "none"
+    on_disk: bool = False
+    hnsw_m: int = 16
+    index_fields: Tuple[str, ...] = PAYLOAD_INDEX_FIELDS
+
+def collection_configs() -> Dict[str, CollectionConfig]:
+    """Per-domain collections: domains never scan or rank each other's vectors"""
+    return {
+        "health": CollectionConfig(settings.QDRANT_COLLECTION, settings.QDRANT_QUANTIZATION,
+                                   settings.QDRANT_ON_DISK_VECTORS, settings.QDRANT_HNSW_M,
+                                   PAYLOAD_INDEX_FIELDS),
+        "education": CollectionConfig(settings.QDRANT_EDU_COLLECTION, settings.QDRANT_EDU_QUANTIZATION,
+                                      settings.QDRANT_EDU_ON_DISK_VECTORS, settings.QDRANT_EDU_HNSW_M,
+                                      EDUCATION_INDEX_FIELDS),
+        "reports": CollectionConfig(settings.QDRANT_REPORTS_COLLECTION, settings.QDRANT_REPORTS_QUANTIZATION,
+                                    settings.QDRANT_REPORTS_ON_DISK_VECTORS, settings.QDRANT_REPORTS_HNSW_M,
+                                    REPORTS_INDEX_FIELDS),
+    }
+
 class QdrantHealthClient:
-    def __init__(self):
+    def __init__(self, config: Optional[CollectionConfig] = None):
+        self.config = config or collection_configs()["health"]
         self.client = None
-        self.embedding_model = None
-        self.collection_name = settings.QDRANT_COLLECTION
+        self.collection_name = self.config.name
+        self.quantization = self.config.quantization
         
     async def initialize(self):
-        """Initialize Qdrant client and embedding model"""
+        """Initialize Qdrant client and embedding model (once; later calls are no-ops)"""
+        if self.client is not None:
+            return True
         try:
             # Initialize Qdrant client
-            self.client = QdrantClient(
+            client = QdrantClient(
                 url=settings.QDRANT_URL,
                 api_key=settings.QDRANT_API_KEY,
             )
             
-            # Initialize embedding model
-            self.embedding_model = SentenceTransformer(settings.HF_MODEL_NAME)
+            # Initialize the shared embedding service
+            if not await embedding_service.initialize():
+                return False
             
             # Create collection if it doesn't exist
-            await self._ensure_collection_exists()
+            await self._ensure_collection_exists(client)
+            self.client = client
             
-            logger.info("Qdrant client initialized successfully")
+            logger.info(f"Qdrant client initialized successfully ({self.collection_name})")
             return True
             
         except Exception as e:
             logger.error(f"Failed to initialize Qdrant client: {e}")
             return False
     
-    async def _ensure_collection_exists(self):
+    async def _ensure_collection_exists(self, client: QdrantClient):
         """Ensure the collection exists with proper configuration"""
-        collections = self.client.get_collections().collections
+        collections = client.get_collections().collections
         collection_names = [col.name for col in collections]
         
         if self.collection_name not in collection_names:
             # Create new collection
-            self.client.create_collection(
+            client.create_collection(
                 collection_name=self.collection_name,
                 vectors_config=models.VectorParams(
-                    size=self.embedding_model.get_sentence_embedding_dimension(),
-                    distance=models.Distance.COSINE
+                    size=embedding_service.get_dimension(),
+                    distance=models.Distance.COSINE,
+                    on_disk=self.config.on_disk
+                ),
+                hnsw_config=models.HnswConfigDiff(
+                    m=self.config.hnsw_m,
+                    ef_construct=settings.QDRANT_HNSW_EF_CONSTRUCT
+                ),
+                quantization_config=build_quantization_config(
+                    self.quantization, settings.QDRANT_QUANTIZATION_ALWAYS_RAM
                 )
             )
-            logger.info(f"Created new collection: {self.collection_name}")
+            logger.info(f"Created new collection: {self.collection_name} "
+                        f"(quantization={self.quantization}, on_disk={self.config.on_disk}, "
+                        f"hnsw_m={self.config.hnsw_m})")
+        else:
+            self._update_collection_config(client)
+        
+        await self._ensure_payload_indexes(client)
+    
+    def _update_collection_config(self, client: QdrantClient):
+        """
+        Apply changed quantization / on-disk / HNSW settings to an existing
+        collection (Qdrant rebuilds it in the background). If the server won't,
+        searches use the quantization the collection actually has.
+        """
+        current = client.get_collection(self.collection_name).config
+        current_quantization = quantization_mode(current.quantization_config)
+        current_on_disk = bool(getattr(current.params.vectors, "on_disk", False))
+        wanted_quantization = self.quantization if self.quantization in ("scalar", "binary") else "none"
+        
+        changes: Dict[str, Any] = {}
+        if current_quantization != wanted_quantization:
+            changes["quantization_config"] = build_quantization_config(
+                wanted_quantization, settings.QDRANT_QUANTIZATION_ALWAYS_RAM
+            ) or models.Disabled.DISABLED
+        if current_on_disk != self.config.on_disk:
+            changes["vectors_config"] = {"": models.VectorParamsDiff(on_disk=self.config.on_disk)}
+        if current.hnsw_config.m != self.config.hnsw_m:
+            changes["hnsw_config"] = models.HnswConfigDiff(m=self.config.hnsw_m)
+        if not changes:
+            return
+        
+        try:
+            applied = client.update_collection(collection_name=self.collection_name, **changes)
+        except Exception as e:
+            logger.warning(f"Updating collection {self.collection_name} failed: {e}")
+            applied = False
+        if applied:
+            logger.info(f"Updated collection {self.collection_name}: quantization={wanted_quantization}, "
+                        f"on_disk={self.config.on_disk}, hnsw_m={self.config.hnsw_m}")
+        else:
+            logger.warning(f"Collection {self.collection_name} keeps quantization={current_quantization}, "
+                           f"on_disk={current_on_disk}, hnsw_m={current.hnsw_config.m}; "
+                           f"re-create it to apply the configured settings")
+            self.quantization = current_quantization
+    
+    async def _ensure_payload_indexes(self, client: QdrantClient):
+        """Create keyword payload indexes for the fields searches filter on"""
+        for field_name in self.config.index_fields:
+            try:
+                client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field_name,
+                    field_schema=models.PayloadSchemaType.KEYWORD
+                )
+            except Exception as e:
+                # Index already exists or the server refused; search still works unindexed
+                logger.debug(f"Payload index for {field_name} not created: {e}")
+    
+    def _build_filter(self, filter: Optional[Dict] = None, doc_id: Optional[str] = None,
+                      user_id: Optional[str] = None) -> Optional[models.Filter]:
+        """Combine a raw filter dict with doc/user scoping conditions"""
+        conditions = []
+        if doc_id:
+            conditions.append(models.FieldCondition(key="doc_id", match=models.MatchValue(value=doc_id)))
+        if user_id:
+            conditions.append(models.FieldCondition(key="user_id", match=models.MatchValue(value=user_id)))
+        
+        if not conditions:
+            return models.Filter(**filter) if filter else None
+        
+        if filter:
+            conditions.append(models.Filter(**filter))
+        return models.Filter(must=conditions)
     
     async def store_documents(self, documents: List[Dict[str, Any]]) -> bool:
         """Store documents in Qdrant with embeddings"""
         try:
             points = []
             
-            for doc in documents:
-                # Generate embedding
-                embedding = self.embedding_model.encode(doc["text"]).tolist()
-                
+            # Generate embeddings in one batched call
+            embeddings = await embedding_service.encode([doc["text"] for doc in documents])
+            
+            for doc, embedding in zip(documents, embeddings):
                 point = models.PointStruct(
                     id=doc["id"],
                     vector=embedding,
@@ -69,16 +230,22 @@ class QdrantHealthClient:
                         "text": doc["text"],
                         "source": doc.get("source", "unknown"),
                         "chunk_index": doc.get("chunk_index", 0),
+                        "doc_id": doc.get("doc_id"),
+                        "user_id": doc.get("user_id"),
+                        "doc_key": doc.get("doc_key"),
+                        "page_key": doc.get("page_key"),
+                        "page_number": doc.get("page_number"),
                         "metadata": doc.get("metadata", {})
                     }
                 )
                 points.append(point)
             
-            # Upsert points to Qdrant
-            self.client.upsert(
+            # Upsert points to Qdrant off the event loop
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, lambda: self.client.upsert(
                 collection_name=self.collection_name,
                 points=points
-            )
+            ))
             
             logger.info(f"Stored {len(documents)} documents in Qdrant")
             return True
@@ -88,19 +255,38 @@ class QdrantHealthClient:
             return False
     
     async def search_similar(self, query: str, top_k: int = 5, 
-                           filter: Optional[Dict] = None) -> List[Dict[str, Any]]:
-        """Search for similar documents using semantic search"""
+                           filter: Optional[Dict] = None,
+                           doc_id: Optional[str] = None,
+                           user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Search for similar documents, optionally scoped to a document and/or user"""
         try:
             # Generate query embedding
-            query_embedding = self.embedding_model.encode(query).tolist()
-            
-            # Perform search
-            search_results = self.client.search(
+            query_embedding = await embedding_service.encode_one(query)
+        except Exception as e:
+            logger.error(f"Search failed: {e}")
+            return []
+        
+        return await self.search_by_vector(query_embedding, top_k, filter, doc_id=doc_id, user_id=user_id)
+    
+    async def search_by_vector(self, query_embedding: List[float], top_k: int = 5,
+                               filter: Optional[Dict] = None,
+                               doc_id: Optional[str] = None,
+                               user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Search with a precomputed query embedding"""
+        try:
+            # Perform search off the event loop so concurrent searches overlap
+            loop = asyncio.get_running_loop()
+            search_results = await loop.run_in_executor(None, lambda: self.client.search(
                 collection_name=self.collection_name,
                 query_vector=query_embedding,
-                query_filter=models.Filter(**filter) if filter else None,
+                query_filter=self._build_filter(filter, doc_id, user_id),
+                search_params=build_search_params(
+                    self.quantization,
+                    rescore=settings.QDRANT_SEARCH_RESCORE,
+                    oversampling=settings.QDRANT_SEARCH_OVERSAMPLING
+                ),
                 limit=top_k
-            )
+            ))
             
             # Format results
             results = []
@@ -109,6 +295,7 @@ class QdrantHealthClient:
                     "text": result.payload["text"],
                     "score": result.score,
                     "source": result.payload.get("source", "unknown"),
+                    "doc_id": result.payload.get("doc_id"),
                     "metadata": result.payload.get("metadata", {})
                 })
             
@@ -119,9 +306,131 @@ class QdrantHealthClient:
             return []
     
     async def hybrid_search(self, query: str, top_k: int = 5, 
-                          filter: Optional[Dict] = None) -> List[Dict[str, Any]]:
+                          filter: Optional[Dict] = None,
+                          doc_id: Optional[str] = None,
+                          user_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """Hybrid search combining semantic and keyword search"""
-        return await self.search_similar(query, top_k, filter)
+        return await self.search_similar(query, top_k, filter, doc_id=doc_id, user_id=user_id)
+    
+    def _doc_key_filter(self, doc_key: str, page_keys: Optional[List[str]] = None,
+                        exclude_doc_id: Optional[str] = None) -> models.Filter:
+        conditions = [models.FieldCondition(key="doc_key", match=models.MatchValue(value=doc_key))]
+        if page_keys is not None:
+            conditions.append(models.FieldCondition(key="page_key", match=models.MatchAny(any=page_keys)))
+        must_not = None
+        if exclude_doc_id is not None:
+            must_not = [models.FieldCondition(key="doc_id", match=models.MatchValue(value=exclude_doc_id))]
+        return models.Filter(must=conditions, must_not=must_not)
+    
+    async def get_indexed_pages(self, doc_key: str) -> Optional[Dict[str, Set[str]]]:
+        """Page key -> doc_ids of the versions holding it, for every page indexed under a document key"""
+        try:
+            loop = asyncio.get_running_loop()
+            pages: Dict[str, Set[str]] = {}
+            offset = None
+            while True:
+                points, offset = await loop.run_in_executor(None, lambda: self.client.scroll(
+                    collection_name=self.collection_name,
+                    scroll_filter=self._doc_key_filter(doc_key),
+                    limit=SCROLL_PAGE_SIZE,
+                    offset=offset,
+                    with_payload=["page_key", "doc_id"],
+                    with_vectors=False
+                ))
+                for point in points:
+                    page_key = point.payload.get("page_key")
+                    if page_key:
+                        pages.setdefault(page_key, set()).add(point.payload.get("doc_id"))
+                if offset is None:
+                    return pages
+        except Exception as e:
+            logger.error(f"Failed to list indexed pages for {doc_key}: {e}")
+            return None
+    
+    async def copy_pages(self, doc_key: str, pages: Dict[str, int], payload: Dict[str, Any],
+                         point_id: Callable[[Dict[str, Any]], str]) -> bool:
+        """
+        Copy the indexed chunks of a document's pages into another version of it,
+        vectors included, so kept pages need no embedding. `pages` maps page key
+        -> page number in the new version, `payload` (with its "doc_id") is set on
+        every copy and `point_id` names it. The originals are left untouched.
+        """
+        if not pages:
+            return True
+        try:
+            loop = asyncio.get_running_loop()
+            page_filter = self._doc_key_filter(doc_key, list(pages), exclude_doc_id=payload["doc_id"])
+            copied: Set[str] = set()
+            offset = None
+            while True:
+                points, offset = await loop.run_in_executor(None, lambda: self.client.scroll(
+                    collection_name=self.collection_name,
+                    scroll_filter=page_filter,
+                    limit=SCROLL_PAGE_SIZE,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=True
+                ))
+                copies = []
+                for point in points:
+                    copy = {**point.payload, **payload}
+                    page_number = pages[copy["page_key"]]
+                    copy["page_number"] = page_number
+                    copy["metadata"] = {**copy.get("metadata", {}), "page_start": page_number,
+                                        "page_end": page_number}
+                    # Older versions may hold the same page too; one copy is enough
+                    copy_id = point_id(copy)
+                    if copy_id not in copied:
+                        copied.add(copy_id)
+                        copies.append(models.PointStruct(id=copy_id, vector=point.vector, payload=copy))
+                if copies:
+                    await loop.run_in_executor(None, lambda: self.client.upsert(
+                        collection_name=self.collection_name,
+                        points=copies
+                    ))
+                if offset is None:
+                    return True
+        except Exception as e:
+            logger.error(f"Failed to copy pages of {doc_key}: {e}")
+            return False
+    
+    async def count_documents(self, filter: Optional[Dict] = None, doc_id: Optional[str] = None,
+                              user_id: Optional[str] = None) -> int:
+        """Number of points matching the filter/scope (0 on error)"""
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(None, lambda: self.client.count(
+                collection_name=self.collection_name,
+                count_filter=self._build_filter(filter, doc_id, user_id),
+                exact=True
+            ))
+            return result.count
+        except Exception as e:
+            logger.error(f"Failed to count documents: {e}")
+            return 0
+    
+    async def delete_documents(self, filter: Optional[Dict] = None, doc_id: Optional[str] = None,
+                               user_id: Optional[str] = None) -> bool:
+        """Delete every point matching the filter/scope"""
+        try:
+            points_filter = self._build_filter(filter, doc_id, user_id)
+            if points_filter is None:
+                raise ValueError("Refusing to delete without a filter; use delete_collection()")
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, lambda: self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=models.FilterSelector(filter=points_filter)
+            ))
+            return True
+        except Exception as e:
+            logger.error(f"Failed to delete documents: {e}")
+            return False
+    
+    async def close(self):
+        """Release the connection"""
+        if self.client is not None:
+            self.client.close()
+            self.client = None
     
     async def delete_collection(self):
         """Delete the collection (for testing/cleanup)"""
@@ -131,5 +440,18 @@ class QdrantHealthClient:
         except Exception as e:
             logger.error(f"Failed to delete collection: {e}")
 
-# Global Qdrant client instance
-qdrant_client = QdrantHealthClient()
\ No newline at end of file
+def create_vector_store(config: CollectionConfig):
+    """Qdrant, or the in-process store when VECTOR_BACKEND=local"""
+    if settings.VECTOR_BACKEND == "local":
+        from agents.health.local_vector_store import LocalVectorStore
+        return LocalVectorStore(collection_name=config.name, index_fields=config.index_fields)
+    return QdrantHealthClient(config)
+
+async def close_vector_stores():
+    """Close (or persist) every domain's store"""
+    for store in vector_stores.values():
+        await store.close()
+
+# Global vector store instances, one per domain; qdrant_client is the health store
+vector_stores = {domain: create_vector_store(config) for domain, config in collection_configs().items()}
+qdrant_client = vector_stores["health"]
\ No newline at end of file
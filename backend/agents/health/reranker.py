@@ -0,0 +1,106 @@
+# agents/health/reranker.py
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+from sentence_transformers import CrossEncoder
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class CrossEncoderReranker:
+    """
+    Rescores (query, chunk) pairs with a small CPU cross-encoder.
+    Pair scores are kept in an LRU cache so repeated questions over the
+    same document only pay for the pairs not seen before.
+    """
+
+    def __init__(self, model_name: Optional[str] = None, cache_size: Optional[int] = None):
+        self.model = None
+        self.model_name = model_name or settings.RERANK_MODEL_NAME
+        self.cache_size = cache_size or settings.RERANK_CACHE_SIZE
+        self._score_cache: "OrderedDict[str, float]" = OrderedDict()
+        self._init_lock: Optional[asyncio.Lock] = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    async def initialize(self):
+        """Load the cross-encoder model (once, off the event loop)"""
+        if self.model is not None:
+            return True
+        if self._init_lock is None:
+            self._init_lock = asyncio.Lock()
+        async with self._init_lock:
+            # Concurrent first requests wait here for a single load
+            if self.model is not None:
+                return True
+            try:
+                loop = asyncio.get_running_loop()
+                self.model = await loop.run_in_executor(
+                    None, lambda: CrossEncoder(self.model_name, device="cpu")
+                )
+                logger.info(f"Loaded reranker model: {self.model_name}")
+                return True
+            except Exception as e:
+                logger.error(f"Failed to load reranker model: {e}")
+                return False
+
+    def _cache_key(self, query: str, text: str) -> str:
+        return hashlib.sha1(f"{query}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[float]:
+        score = self._score_cache.get(key)
+        if score is not None:
+            self._score_cache.move_to_end(key)
+        return score
+
+    def _cache_put(self, key: str, score: float):
+        self._score_cache[key] = score
+        self._score_cache.move_to_end(key)
+        while len(self._score_cache) > self.cache_size:
+            self._score_cache.popitem(last=False)
+
+    def _predict(self, pairs: List[List[str]]) -> List[float]:
+        scores = self.model.predict(pairs, batch_size=settings.RERANK_BATCH_SIZE,
+                                    show_progress_bar=False)
+        return [float(score) for score in scores]
+
+    async def score(self, query: str, texts: List[str]) -> List[float]:
+        """Score every text against the query, running uncached pairs in one batch"""
+        keys = [self._cache_key(query, text) for text in texts]
+        scores: List[Optional[float]] = [self._cache_get(key) for key in keys]
+
+        missing = [i for i, score in enumerate(scores) if score is None]
+        self.cache_hits += len(texts) - len(missing)
+        self.cache_misses += len(missing)
+
+        if missing:
+            pairs = [[query, texts[i]] for i in missing]
+            # Model inference is CPU-bound; keep it off the event loop
+            loop = asyncio.get_running_loop()
+            new_scores = await loop.run_in_executor(None, self._predict, pairs)
+            for i, new_score in zip(missing, new_scores):
+                scores[i] = new_score
+                self._cache_put(keys[i], new_score)
+
+        return scores
+
+    async def rerank(self, query: str, results: List[Dict[str, Any]],
+                     top_n: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Reorder search results by cross-encoder score and keep the best top_n"""
+        top_n = top_n or settings.RERANK_TOP_N
+        if not results:
+            return []
+
+        if not await self.initialize():
+            return results[:top_n]
+
+        scores = await self.score(query, [result["text"] for result in results])
+        reranked = [dict(result, rerank_score=score) for result, score in zip(results, scores)]
+        reranked.sort(key=lambda result: result["rerank_score"], reverse=True)
+        return reranked[:top_n]
+
+# Global reranker instance
+reranker = CrossEncoderReranker()
@@ -0,0 +1,184 @@
+# backend/agents/ingestion/bulk_indexer.py
+"""
+Offline bulk indexing of a directory of PDFs into its domain's vector collection.
+
+Usage (from the repository root):
+    python -m backend index ./corpus --domain health --concurrency 4
+
+Files are indexed concurrently under a cap. Pages are extracted in the shared
+process pool, and chunks from every file in flight share the embedding
+service's micro-batches. Each finished file is recorded in a JSON manifest
+(by content hash), so an interrupted run resumes where it stopped and files
+that haven't changed are skipped.
+"""
+
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from config.settings import settings
+from agents.health.qdrant_client import vector_stores
+from agents.health.document_processor import document_processor
+from agents.education.document_processor import education_processor
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = ".index_manifest.json"
+DOMAINS = ("health", "education")
+
+
+class IndexManifest:
+    """Per-file completion record, saved atomically after every file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                self.files = json.load(file).get("files", {})
+
+    def is_done(self, relative_path: str, sha256: str, domain: str) -> bool:
+        entry = self.files.get(relative_path)
+        return bool(entry) and entry["sha256"] == sha256 and entry["domain"] == domain
+
+    def mark_done(self, relative_path: str, entry: Dict[str, Any]):
+        self.files[relative_path] = entry
+        self.save()
+
+    def save(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"files": self.files}, file, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+
+@dataclass
+class IndexReport:
+    indexed: int = 0
+    skipped: int = 0
+    failed: List[str] = field(default_factory=list)
+    pages: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages / self.seconds if self.seconds else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+
+def find_pdfs(root: str) -> List[str]:
+    """Every PDF under `root`, as sorted paths relative to it"""
+    found = []
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories[:] = sorted(name for name in subdirectories if not name.startswith("."))
+        for filename in filenames:
+            if filename.lower().endswith(".pdf"):
+                found.append(os.path.relpath(os.path.join(directory, filename), root))
+    return sorted(found)
+
+
+class BulkIndexer:
+    def __init__(self, root: str, domain: str = "health", manifest_path: Optional[str] = None,
+                 concurrency: Optional[int] = None, user_id: Optional[str] = None,
+                 force: bool = False):
+        if domain not in DOMAINS:
+            raise ValueError(f"Unknown domain '{domain}', expected one of {DOMAINS}")
+        self.root = root
+        self.domain = domain
+        self.manifest = IndexManifest(manifest_path or os.path.join(root, MANIFEST_FILENAME))
+        self.concurrency = concurrency or settings.INDEX_CONCURRENCY
+        self.user_id = user_id
+        self.force = force
+
+    async def _delete_previous_version(self, relative_path: str, sha256: str) -> bool:
+        """
+        Drop the chunks of the version of a file indexed before this one.
+        Education chunks are keyed by content hash alone, so the new version
+        never overwrites them; a hash another file still has is kept.
+        """
+        previous = self.manifest.files.get(relative_path)
+        if not previous or previous["domain"] != self.domain or previous["sha256"] == sha256:
+            return True
+        if any(entry["sha256"] == previous["sha256"] and entry["domain"] == self.domain
+               for path, entry in self.manifest.files.items() if path != relative_path):
+            return True
+        return await vector_stores[self.domain].delete_documents(doc_id=previous["sha256"])
+
+    async def _index_file(self, relative_path: str, report: IndexReport, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            path = os.path.join(self.root, relative_path)
+            loop = asyncio.get_running_loop()
+            sha256 = await loop.run_in_executor(None, document_processor.compute_doc_id, path)
+            if not self.force and self.manifest.is_done(relative_path, sha256, self.domain):
+                report.skipped += 1
+                return
+
+            stats: Dict[str, int] = {}
+            started = time.perf_counter()
+            if self.domain == "health":
+                # The corpus path is the document key, so re-runs only re-embed changed pages
+                success = await document_processor.process_and_store_documents(
+                    path, doc_id=sha256, user_id=self.user_id,
+                    doc_key=f"corpus/{relative_path}", stats=stats
+                )
+            else:
+                success = await education_processor.process_educational_content(path, stats=stats, doc_id=sha256)
+                if success:
+                    success = await self._delete_previous_version(relative_path, sha256)
+            elapsed = time.perf_counter() - started
+
+            report.pages += stats.get("pages", 0)
+            report.chunks += stats.get("chunks", 0)
+            if not success:
+                report.failed.append(relative_path)
+                print(f"FAILED  {relative_path}")
+                return
+
+            report.indexed += 1
+            self.manifest.mark_done(relative_path, {
+                "sha256": sha256,
+                "domain": self.domain,
+                "pages": stats.get("pages", 0),
+                "chunks": stats.get("chunks", 0),
+                "seconds": round(elapsed, 3),
+                "indexed_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            })
+            print(f"indexed {relative_path}: {stats.get('pages', 0)} pages, "
+                  f"{stats.get('chunks', 0)} chunks in {elapsed:.1f}s")
+
+    async def run(self) -> IndexReport:
+        """Index every PDF under the root that the manifest doesn't already cover"""
+        report = IndexReport()
+        files = find_pdfs(self.root)
+        if not files:
+            return report
+
+        # Each domain indexes into its own collection
+        store = vector_stores[self.domain]
+        if not await store.initialize():
+            raise RuntimeError(f"Failed to initialize the {settings.VECTOR_BACKEND} vector store")
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(self._index_file(relative_path, report, semaphore) for relative_path in files),
+            return_exceptions=True
+        )
+        report.seconds = time.perf_counter() - started
+        # Persists the local vector store, if that is the configured backend
+        await store.close()
+
+        for relative_path, result in zip(files, results):
+            if isinstance(result, Exception):
+                logger.error(f"Indexing {relative_path} failed: {result}")
+                report.failed.append(relative_path)
+        return report
@@ -0,0 +1,117 @@
+# benchmarks/chunker_throughput.py
+"""
+Throughput of utils.text_chunker.TextChunker vs the chunkers it replaced.
+
+The two legacy implementations are copied verbatim (minus the Qdrant/metadata
+plumbing) from HealthDocumentProcessor.chunk_text and
+EducationDocumentProcessor.chunk_educational_content before the switch.
+
+Usage (from backend/):
+    python -m benchmarks.chunker_throughput                # synthetic text
+    python -m benchmarks.chunker_throughput --pdf guide.pdf --repeat 5
+"""
+
+from __future__ import annotations
+import argparse
+import random
+import re
+import time
+from typing import Callable, List, Tuple
+
+from utils.text_chunker import TextChunker, PAGE_SEPARATOR
+
+
+def legacy_health_chunk_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[str]:
+    sentences = re.split(r'(?<=[.!?])\s+', text)
+    chunks = []
+    current_chunk = ""
+    for sentence in sentences:
+        if len(current_chunk) + len(sentence) < chunk_size:
+            current_chunk += sentence + " "
+        else:
+            if current_chunk:
+                chunks.append(current_chunk.strip())
+            overlap_start = max(0, len(current_chunk) - chunk_overlap)
+            current_chunk = current_chunk[overlap_start:] + sentence + " "
+    if current_chunk:
+        chunks.append(current_chunk.strip())
+    return chunks
+
+
+def legacy_education_chunk(text: str, chunk_size: int = 800) -> List[str]:
+    sections = re.split(r'(?:\n\s*){2,}', text)
+    chunks = []
+    for section in sections:
+        if not section.strip():
+            continue
+        if len(section) > chunk_size:
+            sentences = re.split(r'(?<=[.!?])\s+', section)
+            current_chunk = ""
+            for sentence in sentences:
+                if len(current_chunk) + len(sentence) <= chunk_size:
+                    current_chunk += sentence + " "
+                else:
+                    if current_chunk.strip():
+                        chunks.append(current_chunk.strip())
+                    current_chunk = sentence + " "
+            if current_chunk.strip():
+                chunks.append(current_chunk.strip())
+        else:
+            chunks.append(section.strip())
+    return chunks
+
+
+def _synthetic_pages(num_pages: int, seed: int) -> List[Tuple[int, str]]:
+    rng = random.Random(seed)
+    vocab = ["patient", "treatment", "insulin", "glucose", "clinical", "the", "of", "and",
+             "dose", "therapy", "theorem", "proof", "method", "example", "a", "is", "with"]
+    pages = []
+    for number in range(1, num_pages + 1):
+        paragraphs = []
+        for _ in range(rng.randint(3, 6)):
+            sentences = [" ".join(rng.choice(vocab) for _ in range(rng.randint(6, 30))).capitalize() + "."
+                         for _ in range(rng.randint(2, 8))]
+            paragraphs.append(" ".join(sentences))
+        pages.append((number, "\n\n".join(paragraphs)))
+    return pages
+
+
+def _time(label: str, fn: Callable[[], int], size_mb: float, repeat: int):
+    best = float("inf")
+    chunks = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chunks = fn()
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<34}{chunks:>8}{best * 1000:>12.1f}{size_mb / best:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pdf", help="benchmark on a real PDF instead of synthetic text")
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.pdf:
+        from utils.pdf_extraction import iter_pdf_pages
+        pages = list(iter_pdf_pages(args.pdf))
+    else:
+        pages = _synthetic_pages(args.pages, args.seed)
+    text = PAGE_SEPARATOR.join(page_text for _, page_text in pages)
+    size_mb = len(text.encode("utf-8")) / 2 ** 20
+
+    health = TextChunker(256, 48)
+    education = TextChunker(200, split_on_paragraphs=True)
+
+    print(f"{len(pages)} pages, {size_mb:.2f} MiB of text, best of {args.repeat}")
+    print(f"{'chunker':<34}{'chunks':>8}{'ms':>12}{'MiB/s':>12}")
+    _time("legacy health chunk_text", lambda: len(legacy_health_chunk_text(text)), size_mb, args.repeat)
+    _time("TextChunker (health, streamed)", lambda: sum(1 for _ in health.iter_chunks(pages)), size_mb, args.repeat)
+    _time("legacy education chunker", lambda: len(legacy_education_chunk(text)), size_mb, args.repeat)
+    _time("TextChunker (education, streamed)", lambda: sum(1 for _ in education.iter_chunks(pages)), size_mb, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# benchmarks/qdrant_quantization.py
+"""
+Recall@k and latency of quantized vs full-precision Qdrant search.
+
+Loads vectors (sampled from an existing collection, or random unit vectors),
+copies them into one scratch collection per storage setting and compares each
+setting's top-k against exact (brute-force) search on full vectors.
+
+Usage (from backend/):
+    python -m benchmarks.qdrant_quantization --source-collection health_documents --k 5
+    python -m benchmarks.qdrant_quantization --synthetic 50000 --dim 384 --queries 200
+"""
+
+from __future__ import annotations
+import argparse
+import statistics
+import time
+from typing import List, Tuple
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from config.settings import settings
+from agents.health.qdrant_client import build_quantization_config, build_search_params
+
+# (label, quantization mode, rescore, on-disk originals)
+SETUPS = [
+    ("float32", "none", False, False),
+    ("scalar-int8", "scalar", False, False),
+    ("scalar-int8+rescore", "scalar", True, True),
+    ("binary", "binary", False, False),
+    ("binary+rescore", "binary", True, True),
+]
+
+# Bytes per dimension of the quantized copy held in RAM
+QUANTIZED_BYTES_PER_DIM = {"none": 0.0, "scalar": 1.0, "binary": 1 / 8}
+
+
+def _load_vectors(client: QdrantClient, args) -> np.ndarray:
+    if args.synthetic:
+        rng = np.random.default_rng(args.seed)
+        vectors = rng.standard_normal((args.synthetic, args.dim)).astype(np.float32)
+    else:
+        vectors, offset = [], None
+        while len(vectors) < args.limit:
+            points, offset = client.scroll(
+                collection_name=args.source_collection,
+                limit=min(1000, args.limit - len(vectors)),
+                offset=offset,
+                with_vectors=True,
+                with_payload=False,
+            )
+            vectors.extend(point.vector for point in points)
+            if offset is None:
+                break
+        vectors = np.asarray(vectors, dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def _build_collection(client: QdrantClient, name: str, vectors: np.ndarray,
+                      mode: str, on_disk: bool, batch_size: int):
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    client.create_collection(
+        collection_name=name,
+        vectors_config=models.VectorParams(
+            size=vectors.shape[1], distance=models.Distance.COSINE, on_disk=on_disk
+        ),
+        quantization_config=build_quantization_config(mode),
+    )
+    for start in range(0, len(vectors), batch_size):
+        batch = vectors[start:start + batch_size]
+        client.upsert(
+            collection_name=name,
+            points=models.Batch(ids=list(range(start, start + len(batch))), vectors=batch.tolist()),
+            wait=True,
+        )
+
+
+def _search(client: QdrantClient, name: str, queries: np.ndarray, k: int,
+            params) -> Tuple[List[set], List[float]]:
+    hits, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results = client.search(collection_name=name, query_vector=query.tolist(),
+                                limit=k, search_params=params)
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits.append({result.id for result in results})
+    return hits, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--source-collection", default=settings.QDRANT_COLLECTION)
+    parser.add_argument("--synthetic", type=int, default=0, help="use N random vectors instead")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--limit", type=int, default=20000, help="max vectors sampled from source")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=settings.TOP_K_RESULTS)
+    parser.add_argument("--oversampling", type=float, default=settings.QDRANT_SEARCH_OVERSAMPLING)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep", action="store_true", help="keep scratch collections")
+    args = parser.parse_args()
+
+    client = QdrantClient(url=settings.QDRANT_URL, api_key=settings.QDRANT_API_KEY)
+    vectors = _load_vectors(client, args)
+    rng = np.random.default_rng(args.seed)
+    # Perturbed copies of stored vectors stand in for realistic queries
+    queries = vectors[rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)]
+    queries = queries + rng.normal(scale=0.05, size=queries.shape).astype(np.float32)
+
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}")
+    print(f"{'setup':<22}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}{'RAM MiB':>10}")
+
+    exact = None
+    for label, mode, rescore, on_disk in SETUPS:
+        name = f"bench_quant_{label.replace('+', '_').replace('-', '_')}"
+        _build_collection(client, name, vectors, mode, on_disk, args.batch_size)
+        if exact is None:
+            exact, _ = _search(client, name, queries, args.k, build_search_params(mode, exact=True))
+
+        params = build_search_params(mode, rescore=rescore, oversampling=args.oversampling)
+        hits, latencies = _search(client, name, queries, args.k, params)
+        recall = statistics.mean(len(h & e) / len(e) for h, e in zip(hits, exact) if e)
+        p95 = sorted(latencies)[int(0.95 * (len(latencies) - 1))]
+
+        # Full vectors stay in RAM unless moved to disk; quantized copies always do
+        ram_bytes = QUANTIZED_BYTES_PER_DIM[mode] + (0.0 if on_disk else 4.0)
+        ram_mib = len(vectors) * vectors.shape[1] * ram_bytes / 2 ** 20
+        print(f"{label:<22}{recall:>10.3f}{statistics.median(latencies):>10.2f}{p95:>10.2f}{ram_mib:>10.1f}")
+
+        if not args.keep:
+            client.delete_collection(name)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,24 @@
 # config/settings.py
+import logging
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Rough characters per token, for settings that used to be in characters
+CHARS_PER_TOKEN = 4
+
+def _tokens_from_env(name: str, legacy_name: str, default: int) -> int:
+    """A token count, converted from the character-based setting it replaced when only that one is set"""
+    if name in os.environ or legacy_name not in os.environ:
+        return int(os.getenv(name, default))
+    tokens = -(-int(os.environ[legacy_name]) // CHARS_PER_TOKEN)
+    logger.warning(f"{legacy_name} is deprecated (chunks are sized in tokens now); "
+                   f"using {name}={tokens}, set {name} to silence this")
+    return tokens
+
 class Settings:
     # GROQ Configuration
     GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
@@ -13,16 +28,129 @@ class Settings:
     QDRANT_URL = os.getenv("QDRANT_URL", "https://your-cluster-url.qdrant.io")
     QDRANT_API_KEY = os.getenv("QDRANT_API_KEY", "")
     QDRANT_COLLECTION = os.getenv("QDRANT_COLLECTION", "health_documents")
+    # Vector storage: "none" | "scalar" | "binary" quantization, originals on disk
+    QDRANT_QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "none").lower()
+    QDRANT_QUANTIZATION_ALWAYS_RAM = os.getenv("QDRANT_QUANTIZATION_ALWAYS_RAM", "true").lower() == "true"
+    QDRANT_ON_DISK_VECTORS = os.getenv("QDRANT_ON_DISK_VECTORS", "false").lower() == "true"
+    # Two-phase search: quantized candidates, then rescoring with full vectors
+    QDRANT_SEARCH_RESCORE = os.getenv("QDRANT_SEARCH_RESCORE", "true").lower() == "true"
+    QDRANT_SEARCH_OVERSAMPLING = float(os.getenv("QDRANT_SEARCH_OVERSAMPLING", 2.0))
+    # HNSW graph: links per node (per collection below) and build-time candidate list
+    QDRANT_HNSW_M = int(os.getenv("QDRANT_HNSW_M", 16))
+    QDRANT_HNSW_EF_CONSTRUCT = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", 100))
+
+    # One collection per domain, each tuned on its own; unset values follow the health defaults above
+    QDRANT_EDU_COLLECTION = os.getenv("QDRANT_EDU_COLLECTION", "education_documents")
+    QDRANT_EDU_QUANTIZATION = os.getenv("QDRANT_EDU_QUANTIZATION", QDRANT_QUANTIZATION).lower()
+    QDRANT_EDU_ON_DISK_VECTORS = os.getenv("QDRANT_EDU_ON_DISK_VECTORS", str(QDRANT_ON_DISK_VECTORS)).lower() == "true"
+    QDRANT_EDU_HNSW_M = int(os.getenv("QDRANT_EDU_HNSW_M", QDRANT_HNSW_M))
+    QDRANT_REPORTS_COLLECTION = os.getenv("QDRANT_REPORTS_COLLECTION", "report_documents")
+    QDRANT_REPORTS_QUANTIZATION = os.getenv("QDRANT_REPORTS_QUANTIZATION", QDRANT_QUANTIZATION).lower()
+    QDRANT_REPORTS_ON_DISK_VECTORS = os.getenv("QDRANT_REPORTS_ON_DISK_VECTORS", str(QDRANT_ON_DISK_VECTORS)).lower() == "true"
+    QDRANT_REPORTS_HNSW_M = int(os.getenv("QDRANT_REPORTS_HNSW_M", QDRANT_HNSW_M))
+
+    # Vector store backend: "qdrant", or "local" for the in-process store (no network)
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant").lower()
+    LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", "./vector_store")
+    LOCAL_VECTOR_EXACT_MAX = int(os.getenv("LOCAL_VECTOR_EXACT_MAX", 20000))  # above this many matching points, HNSW search
+    LOCAL_VECTOR_HNSW_M = int(os.getenv("LOCAL_VECTOR_HNSW_M", 16))
+    LOCAL_VECTOR_HNSW_EF = int(os.getenv("LOCAL_VECTOR_HNSW_EF", 128))
     
     # Hugging Face Configuration
     HF_MODEL_NAME = os.getenv("HF_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
     HF_TOKEN = os.getenv("HF_TOKEN", "")
+    # Embedding micro-batching (utils/embedding_service.py)
+    EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", 64))
+    EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", 5))
     
     # Processing settings
-    CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 1000))
-    CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 200))
+    # Chunk sizes are in tokens (see utils/text_chunker.py)
+    CHUNK_TOKENS = _tokens_from_env("CHUNK_TOKENS", "CHUNK_SIZE", 256)
+    CHUNK_OVERLAP_TOKENS = _tokens_from_env("CHUNK_OVERLAP_TOKENS", "CHUNK_OVERLAP", 48)
+    EDU_CHUNK_TOKENS = int(os.getenv("EDU_CHUNK_TOKENS", 200))
     TOP_K_RESULTS = int(os.getenv("TOP_K_RESULTS", 5))
 
+    # Education analysis: "map_reduce" covers every section of the document, "single" only the start
+    EDU_ANALYSIS_MODE = os.getenv("EDU_ANALYSIS_MODE", "map_reduce").lower()
+    EDU_SECTION_TOKENS = int(os.getenv("EDU_SECTION_TOKENS", 1500))
+    EDU_MAX_SECTIONS = int(os.getenv("EDU_MAX_SECTIONS", 16))
+    EDU_ANALYSIS_CONCURRENCY = int(os.getenv("EDU_ANALYSIS_CONCURRENCY", 8))
+
+    # Sectioned MCQ generation: parallel per-section calls, near-duplicates dropped by embedding similarity
+    MCQ_SECTION_TOKENS = int(os.getenv("MCQ_SECTION_TOKENS", 1500))
+    MCQ_CONCURRENCY = int(os.getenv("MCQ_CONCURRENCY", 6))
+    MCQ_DEDUP_THRESHOLD = float(os.getenv("MCQ_DEDUP_THRESHOLD", 0.9))
+
+    # Per-document MCQ bank, filled in the background after /process-education
+    QUESTION_BANK_ENABLED = os.getenv("QUESTION_BANK_ENABLED", "true").lower() == "true"
+    QUESTION_BANK_TARGET = int(os.getenv("QUESTION_BANK_TARGET", 30))  # questions per difficulty
+    QUESTION_BANK_LOW_WATER = int(os.getenv("QUESTION_BANK_LOW_WATER", 10))
+    QUESTION_BANK_MAX_DOCS = int(os.getenv("QUESTION_BANK_MAX_DOCS", 200))
+    # Difficulties filled as soon as a document is processed; the rest on first request
+    QUESTION_BANK_PREFILL = [difficulty.strip() for difficulty in
+                             os.getenv("QUESTION_BANK_PREFILL", "medium").split(",") if difficulty.strip()]
+    QUESTION_BANK_FILL_CONCURRENCY = int(os.getenv("QUESTION_BANK_FILL_CONCURRENCY", 2))  # background fills, process-wide
+
+    # /process-education results cached by PDF content hash (memory, plus Redis when enabled)
+    EDU_CACHE_ENABLED = os.getenv("EDU_CACHE_ENABLED", "true").lower() == "true"
+    EDU_CACHE_TTL_SECONDS = float(os.getenv("EDU_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+    EDU_CACHE_MAX_ENTRIES = int(os.getenv("EDU_CACHE_MAX_ENTRIES", 256))
+    EDU_CACHE_REDIS = os.getenv("EDU_CACHE_REDIS", "false").lower() == "true"
+    EDU_CACHE_VERSION = os.getenv("EDU_CACHE_VERSION", "1")  # bump to invalidate every cached result
+
+    # "Ask the textbook": processed documents are indexed and questions answered from their top chunks
+    EDU_QA_ENABLED = os.getenv("EDU_QA_ENABLED", "true").lower() == "true"
+    EDU_QA_TOP_K = int(os.getenv("EDU_QA_TOP_K", 4))
+    EDU_QA_CONTEXT_TOKENS = int(os.getenv("EDU_QA_CONTEXT_TOKENS", 1200))  # context budget per question
+
+    # Quiz feedback: "template" (score-bucket templates, no LLM call) or "llm" (one call per quiz)
+    FEEDBACK_MODE = os.getenv("FEEDBACK_MODE", "template").lower()
+    FEEDBACK_REFRESH_SECONDS = float(os.getenv("FEEDBACK_REFRESH_SECONDS", 0))  # 0 disables LLM refresh of templates
+
+    # Bulk answer-sheet grading: regex parsing first, the LLM only for pages it can't read
+    BULK_GRADE_MAX_FILES = int(os.getenv("BULK_GRADE_MAX_FILES", 60))
+    BULK_GRADE_MAX_TOTAL_BYTES = int(os.getenv("BULK_GRADE_MAX_TOTAL_BYTES", 200 * 1024 * 1024))  # all sheets together
+    BULK_GRADE_CONCURRENCY = int(os.getenv("BULK_GRADE_CONCURRENCY", 4))  # sheets graded at once
+    BULK_GRADE_LLM_CONCURRENCY = int(os.getenv("BULK_GRADE_LLM_CONCURRENCY", 4))  # page parses in flight
+
+    # Interactive quiz sessions kept in Redis, answers graded one at a time
+    QUIZ_SESSION_TTL_SECONDS = int(os.getenv("QUIZ_SESSION_TTL_SECONDS", 1800))  # idle time before a session expires
+    QUIZ_SESSION_MAX_QUESTIONS = int(os.getenv("QUIZ_SESSION_MAX_QUESTIONS", 50))
+
+    # Uploads: streamed in chunks, rejected past the size cap
+    MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 50 * 1024 * 1024))
+    UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+    UPLOAD_TEMP_DIR = os.getenv("UPLOAD_TEMP_DIR", "")
+    # Parse uploads straight from memory instead of spooling them to disk
+    UPLOAD_IN_MEMORY = os.getenv("UPLOAD_IN_MEMORY", "true").lower() == "true"
+
+    # PDF extraction (process pool, off the event loop)
+    PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+    PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 16))
+    PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", 1000))
+
+    # Offline bulk indexing (python -m backend index): files processed at once
+    INDEX_CONCURRENCY = int(os.getenv("INDEX_CONCURRENCY", 4))
+
+    # Reranking settings (cross-encoder over a wider dense candidate set)
+    RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+    RERANK_MODEL_NAME = os.getenv("RERANK_MODEL_NAME", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", 20))
+    RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", 3))
+    RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", 32))
+    RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", 10000))
+
+    # Semantic answer cache for /health-query (per document hash)
+    ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.92))
+    ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", 3600))
+    ANSWER_CACHE_MAX_PER_DOC = int(os.getenv("ANSWER_CACHE_MAX_PER_DOC", 256))
+    ANSWER_CACHE_MAX_DOCS = int(os.getenv("ANSWER_CACHE_MAX_DOCS", 1024))
+
+    # Batch question API
+    HEALTH_BATCH_CONCURRENCY = int(os.getenv("HEALTH_BATCH_CONCURRENCY", 4))
+    HEALTH_BATCH_MAX_QUESTIONS = int(os.getenv("HEALTH_BATCH_MAX_QUESTIONS", 20))
+
     MCQ_DIFFICULTY_LEVELS = ["easy", "medium", "hard"]
     DEFAULT_NUM_QUESTIONS = 5
     DEFAULT_DIFFICULTY = "medium"
@@ -15,11 +15,22 @@ import json
 import asyncio
 from datetime import datetime
 from agents.health.health_agent import HealthAgent
+from config.settings import settings
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form
 import os
 from typing import Dict
 import json
 from agents.orchestrator.orchestrator_agent import build_pipeline
+from utils.pdf_extraction import shutdown_process_pool
+from agents.health.qdrant_client import close_vector_stores
+from utils.embedding_service import embedding_service
+from utils.uploads import received_upload, receive_upload, remove_upload, save_upload
+from agents.education.education_agent import education_agent
+from agents.education.result_cache import education_result_cache
+from agents.education.textbook_qa import textbook_qa
+from agents.education.question_bank import question_bank
+from agents.education.bulk_grader import bulk_grader, parse_answer_key
+from agents.education.quiz_sessions import QuizSessionError, quiz_sessions
 
 
 # --- Safe imports with clear failure messages ---
@@ -66,6 +77,13 @@ app.add_middleware(
 # --- Pipeline Graph instance ---
 pipeline = build_pipeline()
 
+
+@app.on_event("shutdown")
+async def shutdown_workers() -> None:
+    """Stop the PDF extraction process pool and close (or persist) the vector stores"""
+    shutdown_process_pool()
+    await close_vector_stores()
+
 # --- Global state for tracking agent thinking ---
 agent_thoughts: Dict[str, List[Dict[str, Any]]] = {}
 
@@ -347,6 +365,11 @@ async def list_active_sessions() -> Dict[str, Any]:
         "total_sessions": len(agent_thoughts)
     }
 
+@app.get("/debug/embedding-metrics", tags=["debugging"])
+async def get_embedding_metrics() -> Dict[str, Any]:
+    """Queue depth and micro-batch statistics of the shared embedding service"""
+    return embedding_service.get_metrics()
+
 @app.get("/debug/pipeline-info", tags=["debugging"]) 
 async def get_pipeline_info() -> Dict[str, Any]:
     """Get information about the pipeline structure"""
@@ -364,51 +387,54 @@ class HealthQueryResponse(BaseModel):
     confidence: float
     sources: list
     errors: Optional[list] = None
+    cache_hit: bool = False
 
 # Initialize the health agent (you might want to do this as a singleton)
 health_agent = HealthAgent()
 
+def document_key(user_id: Optional[str], doc_key: Optional[str]) -> Optional[str]:
+    """
+    Per-user name of a document across versions, only when the caller chose one.
+    Without it the upload is indexed under its content hash alone, as before.
+    """
+    return f"{user_id}/{doc_key}" if doc_key else None
+
 @app.post("/health-query", response_model=HealthQueryResponse)
 async def process_health_query(
     pdf_file: UploadFile = File(...),
     question: str = Form(...),
     user_context: Optional[str] = Form(None),
-    user_id: Optional[str] = Form("default_user")
+    user_id: Optional[str] = Form("default_user"),
+    doc_key: Optional[str] = Form(None, description="stable name of this document across uploads; "
+                                                    "new versions only re-embed changed pages")
 ):
     """
     Process a health query with an uploaded PDF file
     """
     try:
-        # Save the uploaded PDF temporarily
-        pdf_path = f"temp_{pdf_file.filename}"
-        with open(pdf_path, "wb") as buffer:
-            content = await pdf_file.read()
-            buffer.write(content)
-        
-        # Process the health query using the same logic as test.py
-        result = await health_agent.process_health_query(
-            pdf_path=pdf_path,
-            question=question,
-            user_context=user_context or "No additional context provided",
-            user_id=user_id
-        )
-        
-        # Clean up the temporary file
-        if os.path.exists(pdf_path):
-            os.remove(pdf_path)
+        # Read the upload (in memory or to a unique temp file); released when the block exits
+        async with received_upload(pdf_file) as upload:
+            # Process the health query using the same logic as test.py
+            result = await health_agent.process_health_query(
+                pdf_path=upload.source,
+                question=question,
+                user_context=user_context or "No additional context provided",
+                user_id=user_id,
+                doc_id=upload.sha256,
+                doc_key=document_key(user_id, doc_key)
+            )
         
         return HealthQueryResponse(
             answer=result['answer'],
             confidence=result['confidence'],
             sources=result['sources'],
-            errors=result.get('errors', [])
+            errors=result.get('errors', []),
+            cache_hit=result.get('cache_hit', False)
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        # Clean up the temporary file in case of error
-        if 'pdf_path' in locals() and os.path.exists(pdf_path):
-            os.remove(pdf_path)
-        
         raise HTTPException(status_code=500, detail=f"Error processing health query: {str(e)}")
 
 
@@ -424,47 +450,83 @@ async def test_health_agent_route(
     Test route that mimics the exact behavior of test.py but with uploaded PDF
     """
     try:
-        # Save the uploaded PDF temporarily
-        pdf_path = f"temp_test_{pdf_file.filename}"
-        with open(pdf_path, "wb") as buffer:
-            content = await pdf_file.read()
-            buffer.write(content)
-        
-        # Use the same parameters as in test.py
-        result = await health_agent.process_health_query(
-            pdf_path=pdf_path,
-            question=question,
-            user_context=user_context,
-            user_id=user_id
-        )
-        
-        # Clean up the temporary file
-        if os.path.exists(pdf_path):
-            os.remove(pdf_path)
+        # Read the upload (in memory or to a unique temp file); released when the block exits
+        async with received_upload(pdf_file) as upload:
+            # Use the same parameters as in test.py
+            result = await health_agent.process_health_query(
+                pdf_path=upload.source,
+                question=question,
+                user_context=user_context,
+                user_id=user_id,
+                doc_id=upload.sha256
+            )
         
         return HealthQueryResponse(
             answer=result['answer'],
             confidence=result['confidence'],
             sources=result['sources'],
-            errors=result.get('errors', [])
+            errors=result.get('errors', []),
+            cache_hit=result.get('cache_hit', False)
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        # Clean up the temporary file in case of error
-        if 'pdf_path' in locals() and os.path.exists(pdf_path):
-            os.remove(pdf_path)
-        
         raise HTTPException(status_code=500, detail=f"Test failed: {str(e)}")
     
 
+@app.post("/health-query/batch", tags=["health"])
+async def process_health_query_batch(
+    pdf_file: UploadFile = File(...),
+    questions: List[str] = Form(..., description="repeat the field once per question"),
+    user_context: Optional[str] = Form(None),
+    user_id: Optional[str] = Form("default_user"),
+    doc_key: Optional[str] = Form(None, description="stable name of this document across uploads; "
+                                                    "new versions only re-embed changed pages")
+) -> StreamingResponse:
+    """
+    Answer many questions about one uploaded PDF.
+    The document is ingested once; answers stream back as newline-delimited
+    JSON, one object per question (with its index), as each one completes.
+    """
+    questions = [question.strip() for question in questions if question.strip()]
+    if not questions:
+        raise HTTPException(status_code=400, detail="At least one question is required")
+    if len(questions) > settings.HEALTH_BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.HEALTH_BATCH_MAX_QUESTIONS} questions per batch"
+        )
+    
+    # Read the upload (in memory or to a unique temp file)
+    upload = await receive_upload(pdf_file)
+    
+    async def generate_answers():
+        try:
+            async for result in health_agent.process_batch_questions(
+                pdf_path=upload.source,
+                questions=questions,
+                user_context=user_context or "No additional context provided",
+                user_id=user_id,
+                doc_id=upload.sha256,
+                doc_key=document_key(user_id, doc_key)
+            ):
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            yield json.dumps({"index": -1, "errors": [f"Batch failed: {e}"]}) + "\n"
+        finally:
+            # Release the upload once every answer has been sent
+            remove_upload(upload)
+    
+    return StreamingResponse(generate_answers(), media_type="application/x-ndjson")
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
 
 
-from agents.education.education_agent import education_agent
-
 # Pydantic response model
 class EducationResponse(BaseModel):
     success: bool
@@ -484,26 +546,222 @@ async def process_education_pdf(pdf_file: UploadFile = File(...)):
             detail="Only PDF files are supported"
         )
     
-    pdf_path = None
     try:
-        # Save uploaded PDF temporarily
-        pdf_path = f"temp_education_{pdf_file.filename}"
-        with open(pdf_path, "wb") as buffer:
-            content = await pdf_file.read()
-            buffer.write(content)
-        
-        # Process with education agent
-        result = await education_agent.process_pdf(pdf_path)
+        # Read the upload (in memory or to a unique temp file); released when the block exits
+        async with received_upload(pdf_file) as upload:
+            # Process with education agent
+            result = await education_agent.process_pdf(upload.source, doc_id=upload.sha256)
         
         return EducationResponse(**result)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, 
             detail=f"Processing failed: {str(e)}"
         )
-        
-    finally:
-        # Clean up temporary file
-        if pdf_path and os.path.exists(pdf_path):
-            os.remove(pdf_path)
\ No newline at end of file
+
+
+@app.delete("/education/cache/{doc_id}", tags=["education"])
+async def invalidate_education_result(doc_id: str) -> Dict[str, Any]:
+    """Forget the cached /process-education result for a document (its content hash)"""
+    return {"doc_id": doc_id, "invalidated": await education_result_cache.invalidate(doc_id)}
+
+@app.get("/debug/education-cache", tags=["debugging"])
+async def get_education_cache_stats() -> Dict[str, Any]:
+    """Entry count and hit/miss counters of the /process-education result cache"""
+    return education_result_cache.get_stats()
+
+
+class TextbookQuestionRequest(BaseModel):
+    doc_id: str
+    question: str
+    top_k: Optional[int] = None
+
+class TextbookAnswerResponse(BaseModel):
+    doc_id: str
+    question: str
+    answer: str
+    sources: List[Dict[str, Any]]
+
+@app.post("/education/ask", response_model=TextbookAnswerResponse, tags=["education"])
+async def ask_textbook(request: TextbookQuestionRequest):
+    """
+    Answer a student's question about a document processed by
+    /process-education (doc_id is returned in its result), using only the
+    document's most relevant passages.
+    """
+    if not request.question.strip():
+        raise HTTPException(status_code=400, detail="Question must not be empty")
+    if request.top_k is not None and not 1 <= request.top_k <= 20:
+        raise HTTPException(status_code=400, detail="top_k must be between 1 and 20")
+    try:
+        result = await textbook_qa.ask(request.doc_id, request.question.strip(), request.top_k)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown document; process it with /process-education first")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Answering failed: {str(e)}")
+    
+    return TextbookAnswerResponse(**result)
+
+
+class QuizResponse(BaseModel):
+    doc_id: str
+    difficulty: str
+    questions: List[Dict[str, Any]]
+    bank: Dict[str, Any]
+
+@app.get("/education/quiz/{doc_id}", response_model=QuizResponse, tags=["education"])
+async def get_education_quiz(doc_id: str, num_questions: int = 10, difficulty: str = "medium",
+                             wait: bool = True):
+    """
+    Assemble a quiz from the question bank of a document processed by
+    /process-education (doc_id is returned in its result). Sampling is
+    instant once the bank is filled; with wait=false a partially filled
+    bank returns what it has.
+    """
+    if not question_bank.has_document(doc_id):
+        raise HTTPException(status_code=404, detail="Unknown document; process it with /process-education first")
+    if not 1 <= num_questions <= 50:
+        raise HTTPException(status_code=400, detail="num_questions must be between 1 and 50")
+    try:
+        questions = await question_bank.get_quiz(doc_id, num_questions, difficulty, wait=wait)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return QuizResponse(doc_id=doc_id, difficulty=difficulty, questions=questions,
+                        bank=question_bank.get_stats(doc_id))
+
+
+@app.post("/education/grade/bulk", tags=["education"])
+async def grade_answer_sheets(
+    files: List[UploadFile] = File(..., description="one answer-sheet PDF per student"),
+    answer_key: Optional[str] = Form(None, description="correct options in question order, e.g. 'A,C,B,D'")
+) -> StreamingResponse:
+    """
+    Grade a class's answer sheets in one request.
+    Results stream back as newline-delimited JSON: one "student" object per
+    sheet as soon as it is graded, then a "summary" object with class-level
+    aggregates. Without an answer key, each sheet must state correct answers.
+    """
+    if len(files) > settings.BULK_GRADE_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BULK_GRADE_MAX_FILES} answer sheets per request")
+    if any(not (sheet.filename or "").lower().endswith('.pdf') for sheet in files):
+        raise HTTPException(status_code=400, detail="Only PDF files are supported")
+    try:
+        key = parse_answer_key(answer_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Spool every sheet to its own temp file before streaming starts, so a
+    # class's PDFs are never held in memory together
+    total_too_large = HTTPException(
+        status_code=413,
+        detail=f"Answer sheets exceed the {settings.BULK_GRADE_MAX_TOTAL_BYTES // (1024 * 1024)} MB per-request limit"
+    )
+    uploads = []
+    try:
+        for sheet in files:
+            remaining = settings.BULK_GRADE_MAX_TOTAL_BYTES - sum(upload.size for upload in uploads)
+            if remaining <= 0 or (sheet.size is not None and sheet.size > remaining):
+                raise total_too_large
+            try:
+                uploads.append(await save_upload(sheet, max_bytes=min(settings.MAX_UPLOAD_BYTES, remaining)))
+            except HTTPException as e:
+                # Past what is left of the request's budget rather than the per-file limit
+                if e.status_code == 413 and remaining < settings.MAX_UPLOAD_BYTES:
+                    raise total_too_large
+                raise
+    except Exception:
+        for upload in uploads:
+            remove_upload(upload)
+        raise
+    
+    async def generate_results():
+        sheets = [(os.path.splitext(upload.filename)[0], upload.source) for upload in uploads]
+        try:
+            async for result in bulk_grader.grade_sheets(sheets, answer_key=key):
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "errors": [f"Grading failed: {e}"]}) + "\n"
+        finally:
+            for upload in uploads:
+                remove_upload(upload)
+    
+    return StreamingResponse(generate_results(), media_type="application/x-ndjson")
+
+
+class QuizSessionQuestion(BaseModel):
+    question: str
+    options: Dict[str, str]
+    correct_answer: str
+    explanation: Optional[str] = None
+
+class QuizSessionRequest(BaseModel):
+    doc_id: Optional[str] = None
+    num_questions: int = 10
+    difficulty: str = "medium"
+    questions: Optional[List[QuizSessionQuestion]] = None
+
+class QuizAnswerRequest(BaseModel):
+    question_index: int
+    answer: str
+
+QUIZ_SESSION_ERROR_STATUS = {"expired": 404, "bad_question": 400, "bad_answer": 400, "answered": 409,
+                             "unavailable": 503}
+
+@app.post("/education/quiz-sessions", tags=["education"])
+async def create_quiz_session(request: QuizSessionRequest) -> Dict[str, Any]:
+    """
+    Start an interactive quiz: either sampled from the question bank of a
+    document processed by /process-education (doc_id), or from MCQs the
+    client already has (questions, in the generator's format). Answers and
+    explanations stay on the server until each question is answered.
+    """
+    if request.questions is not None:
+        questions = [question.model_dump() for question in request.questions]
+    else:
+        if not request.doc_id or not question_bank.has_document(request.doc_id):
+            raise HTTPException(status_code=404, detail="Unknown document; process it with /process-education first")
+        if not 1 <= request.num_questions <= settings.QUIZ_SESSION_MAX_QUESTIONS:
+            raise HTTPException(status_code=400,
+                                detail=f"num_questions must be between 1 and {settings.QUIZ_SESSION_MAX_QUESTIONS}")
+        try:
+            questions = await question_bank.get_quiz(request.doc_id, request.num_questions, request.difficulty)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return await quiz_sessions.create(questions, doc_id=request.doc_id, difficulty=request.difficulty)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except QuizSessionError as e:
+        raise HTTPException(status_code=QUIZ_SESSION_ERROR_STATUS[e.reason], detail=str(e))
+
+@app.post("/education/quiz-sessions/{session_id}/answers", tags=["education"])
+async def answer_quiz_question(session_id: str, request: QuizAnswerRequest) -> Dict[str, Any]:
+    """Grade one answer (each question can be answered once) and return the running score"""
+    try:
+        return await quiz_sessions.answer(session_id, request.question_index, request.answer)
+    except QuizSessionError as e:
+        raise HTTPException(status_code=QUIZ_SESSION_ERROR_STATUS[e.reason], detail=str(e))
+
+@app.get("/education/quiz-sessions/{session_id}", tags=["education"])
+async def get_quiz_session(session_id: str) -> Dict[str, Any]:
+    """Questions, graded answers so far and the running score of a quiz session"""
+    try:
+        session = await quiz_sessions.get(session_id)
+    except QuizSessionError as e:
+        raise HTTPException(status_code=QUIZ_SESSION_ERROR_STATUS[e.reason], detail=str(e))
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired quiz session")
+    return session
+
+@app.delete("/education/quiz-sessions/{session_id}", tags=["education"])
+async def delete_quiz_session(session_id: str) -> Dict[str, Any]:
+    """End a quiz session early"""
+    try:
+        deleted = await quiz_sessions.delete(session_id)
+    except QuizSessionError as e:
+        raise HTTPException(status_code=QUIZ_SESSION_ERROR_STATUS[e.reason], detail=str(e))
+    return {"session_id": session_id, "deleted": deleted}
@@ -0,0 +1,57 @@
+# tests/test_feedback_templates.py
+import pytest
+
+pytest.importorskip("groq")
+
+from agents.education import feedback_templates as module
+from agents.education.feedback_templates import FeedbackTemplates, _is_valid_template, score_bucket
+
+
+@pytest.fixture
+def templates():
+    # refresh_seconds=0: no background LLM refresh
+    return FeedbackTemplates(refresh_seconds=0)
+
+
+@pytest.mark.parametrize("percentage, bucket", [
+    (100.0, "perfect"), (99.9, "excellent"), (85.0, "excellent"),
+    (65.0, "good"), (40.0, "fair"), (39.9, "needs_work"), (0.0, "needs_work"),
+])
+def test_score_bucket(percentage, bucket):
+    assert score_bucket(percentage) == bucket
+
+
+@pytest.mark.parametrize("template", [
+    "You got {correct} of {total} ({percentage}%).",
+    "No placeholders at all.",
+    "Score: {percentage:>3}%",
+])
+def test_valid_templates(template):
+    assert _is_valid_template(template)
+
+
+@pytest.mark.parametrize("template", [
+    "Hello {name}",             # unknown field
+    "{0} right",                # positional
+    "{total.x} questions",      # attribute access
+    "{correct[0]} right",       # indexing
+    "{percentage:.1f}%",        # render() passes percentage as a string
+    "{correct:s} right",        # but correct and total as ints
+    "unbalanced {",
+    "",
+    "x" * 401,
+])
+def test_invalid_templates(template):
+    assert not _is_valid_template(template)
+
+
+def test_render_fills_fields(templates):
+    templates.templates["good"] = ["{correct}/{total} = {percentage}%"]
+    assert templates.render(total=8, correct=6, percentage=75.0) == "6/8 = 75%"
+
+
+def test_render_falls_back_to_builtin_template(templates, monkeypatch):
+    templates.templates["good"] = ["{total.x}"]
+    monkeypatch.setattr(module.random, "choice", lambda items: items[0])
+    assert templates.render(total=8, correct=6, percentage=75.0) == \
+        module.DEFAULT_TEMPLATES["good"][0].format(correct=6, total=8, percentage="75")
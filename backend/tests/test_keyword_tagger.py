@@ -0,0 +1,35 @@
+# tests/test_keyword_tagger.py
+from utils.keyword_tagger import KeywordTagger
+
+
+def test_counts_substring_hits_per_tag():
+    tagger = KeywordTagger({"medical": ["patient", "dose"], "pharma": ["dose"]})
+    assert tagger.tag("The patient's Dose was doubled; DOSES vary.") == {"medical": 3, "pharma": 2}
+
+
+def test_longest_keyword_wins_at_same_position():
+    tagger = KeywordTagger({"short": ["press"], "long": ["pressure"]})
+    assert tagger.tag("blood pressure, press") == {"short": 1, "long": 1}
+
+
+def test_dotted_and_dotless_i():
+    tagger = KeywordTagger({"drug": ["insulin"], "turkish": ["ılaç"]})
+    # "İ".lower() is "i̇" and "I" matches "ı" under IGNORECASE, so neither maps back by lower()
+    assert tagger.tag("İNSULİN, insulin, ILAÇ") == {"drug": 2, "turkish": 1}
+    assert tagger.tag_batch(["İnsulin", "", "ılaç and INSULIN"]) == [
+        {"drug": 1, "turkish": 0},
+        {"drug": 0, "turkish": 0},
+        {"drug": 1, "turkish": 1},
+    ]
+
+
+def test_batch_matches_single():
+    tagger = KeywordTagger({"a": ["heart", "lung"], "b": ["liver"]})
+    texts = ["Heart and lung", "", "liver liver", "no hits", "LUNG"]
+    assert tagger.tag_batch(texts) == [tagger.tag(text) for text in texts]
+
+
+def test_empty_vocabulary():
+    tagger = KeywordTagger({"empty": []})
+    assert tagger.tag("anything") == {"empty": 0}
+    assert tagger.tag_batch(["a", "b"]) == [{"empty": 0}, {"empty": 0}]
@@ -0,0 +1,67 @@
+# tests/test_local_vector_store.py
+import asyncio
+
+import numpy as np
+import pytest
+
+pytest.importorskip("hnswlib")
+# local_vector_store imports the shared embedding service
+pytest.importorskip("sentence_transformers")
+
+from agents.health.local_vector_store import LocalVectorStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LocalVectorStore(collection_name="ann_test", path=str(tmp_path),
+                             index_fields=("doc_id", "user_id"), exact_max=200)
+    rng = np.random.default_rng(7)
+    vectors = rng.normal(size=(3000, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    payloads = [{"text": f"chunk {i}", "doc_id": f"doc-{i % 3}", "user_id": "small" if i < 150 else "big"}
+                for i in range(len(vectors))]
+    store._store_sync([str(i) for i in range(len(vectors))], vectors, payloads)
+    store.vectors = vectors
+    return store
+
+
+def search(store, query, **scope):
+    return asyncio.run(store.search_by_vector(query.tolist(), top_k=10, **scope))
+
+
+def exact_texts(store, query, rows):
+    scores = store.vectors[rows] @ query
+    return {f"chunk {rows[i]}" for i in np.argsort(-scores)[:10]}
+
+
+def test_hnsw_is_built_past_exact_max(store):
+    assert store._hnsw is not None
+
+
+@pytest.mark.parametrize("scope, rows", [
+    ({}, np.arange(3000)),
+    ({"doc_id": "doc-1"}, np.arange(1, 3000, 3)),
+    # Few matches: scored exactly rather than through the graph
+    ({"user_id": "small"}, np.arange(150)),
+])
+def test_filtered_search_finds_the_nearest_matching_points(store, scope, rows):
+    rng = np.random.default_rng(11)
+    recall = []
+    for query in rng.normal(size=(20, 16)).astype(np.float32):
+        query /= np.linalg.norm(query)
+        results = search(store, query, **scope)
+        assert len(results) == 10
+        if "doc_id" in scope:
+            assert {result["doc_id"] for result in results} == {scope["doc_id"]}
+        recall.append(len({result["text"] for result in results} & exact_texts(store, query, rows)) / 10)
+    assert np.mean(recall) >= 0.95
+
+
+def test_large_filtered_matches_use_the_graph(store, monkeypatch):
+    def no_exact(*args):
+        raise AssertionError("exact search used")
+
+    monkeypatch.setattr(store, "_exact_search", no_exact)
+    assert len(search(store, store.vectors[4], doc_id="doc-1")) == 10
+    with pytest.raises(AssertionError):
+        store._search_sync(store.vectors[4].tolist(), 10, [("user_id", {"small"})])
@@ -0,0 +1,137 @@
+# tests/test_quiz_sessions.py
+import asyncio
+
+import pytest
+
+pytest.importorskip("groq")
+pytest.importorskip("redis")
+fakeredis = pytest.importorskip("fakeredis")
+# The grading script runs in fakeredis' embedded Lua interpreter
+pytest.importorskip("lupa")
+
+import utils.redis_memory as redis_memory
+from agents.education import quiz_sessions as module
+from agents.education.feedback_templates import FeedbackTemplates
+from agents.education.quiz_sessions import QuizSessionError, QuizSessionStore
+
+QUESTIONS = [
+    {"question": "2 + 2?", "options": {"A": "3", "B": "4", "C": "5", "D": "22"},
+     "correct_answer": "b", "explanation": "Basic addition."},
+    {"question": "Capital of France?", "options": {"A": "Paris", "B": "Rome", "C": "Oslo", "D": "Bern"},
+     "correct_answer": "A"},
+    # Not usable: missing an option / no valid answer letter
+    {"question": "Broken", "options": {"A": "x", "B": "y", "C": "z"}, "correct_answer": "A"},
+    {"question": "Also broken", "options": {"A": "w", "B": "x", "C": "y", "D": "z"}, "correct_answer": "E"},
+]
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis_memory, "_shared_client", fakeredis.FakeRedis(server=server))
+    # refresh_seconds=0: no background LLM refresh when a quiz finishes
+    monkeypatch.setattr(module, "feedback_templates", FeedbackTemplates(refresh_seconds=0))
+    return server
+
+
+@pytest.fixture
+def store(server):
+    return QuizSessionStore(ttl_seconds=600, max_questions=10)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_create_keeps_only_complete_questions_and_hides_answers(store):
+    session = run(store.create(QUESTIONS, doc_id="doc-1", difficulty="easy"))
+    assert session["total_questions"] == 2
+    assert session["answered"] == 0 and not session["finished"]
+    assert session["questions"] == [
+        {"question_index": 0, "question": "2 + 2?", "options": QUESTIONS[0]["options"]},
+        {"question_index": 1, "question": "Capital of France?", "options": QUESTIONS[1]["options"]},
+    ]
+
+
+def test_create_rejects_unusable_questions(store):
+    with pytest.raises(ValueError):
+        run(store.create(QUESTIONS[2:]))
+
+
+def test_create_caps_question_count(server):
+    store = QuizSessionStore(ttl_seconds=600, max_questions=1)
+    assert run(store.create(QUESTIONS))["total_questions"] == 1
+
+
+def test_answers_are_graded_once_with_a_running_score(store):
+    async def scenario():
+        session_id = (await store.create(QUESTIONS))["session_id"]
+        wrong = await store.answer(session_id, 0, " c ")
+        with pytest.raises(QuizSessionError) as answered:
+            await store.answer(session_id, 0, "B")
+        right = await store.answer(session_id, 1, "a")
+        return wrong, answered.value, right, await store.get(session_id)
+
+    wrong, answered, right, session = run(scenario())
+    assert wrong["answer"] == "C" and wrong["correct_answer"] == "B" and not wrong["is_correct"]
+    assert wrong["explanation"] == "Basic addition."
+    assert (wrong["answered"], wrong["correct_answers"], wrong["finished"]) == (1, 0, False)
+    assert "overall_feedback" not in wrong
+
+    # A second answer to the same question is refused and doesn't change the score
+    assert answered.reason == "answered"
+
+    assert right["is_correct"] and right["explanation"] == ""
+    assert (right["answered"], right["correct_answers"], right["score_percentage"]) == (2, 1, 50.0)
+    assert right["finished"] and right["overall_feedback"]
+
+    assert [result["is_correct"] for result in session["results"]] == [False, True]
+    assert session["finished"] and session["overall_feedback"]
+
+
+def test_get_reveals_only_answered_questions(store):
+    async def scenario():
+        session_id = (await store.create(QUESTIONS))["session_id"]
+        await store.answer(session_id, 1, "A")
+        return await store.get(session_id)
+
+    session = run(scenario())
+    assert session["results"] == [{"question_index": 1, "answer": "A", "correct_answer": "A",
+                                   "is_correct": True, "explanation": ""}]
+    assert 0 < session["expires_in"] <= 600
+    assert "correct_answer" not in session["questions"][0]
+
+
+@pytest.mark.parametrize("question_index, answer, reason", [
+    (0, "E", "bad_answer"),
+    (5, "A", "bad_question"),
+])
+def test_invalid_answers(store, question_index, answer, reason):
+    async def scenario():
+        session_id = (await store.create(QUESTIONS))["session_id"]
+        await store.answer(session_id, question_index, answer)
+
+    with pytest.raises(QuizSessionError) as error:
+        run(scenario())
+    assert error.value.reason == reason
+
+
+def test_unknown_and_deleted_sessions(store):
+    async def scenario():
+        session_id = (await store.create(QUESTIONS))["session_id"]
+        deleted = await store.delete(session_id)
+        with pytest.raises(QuizSessionError) as expired:
+            await store.answer(session_id, 0, "B")
+        return deleted, expired.value, await store.get(session_id), await store.delete(session_id)
+
+    deleted, expired, session, deleted_again = run(scenario())
+    assert deleted and not deleted_again
+    assert expired.reason == "expired"
+    assert session is None
+
+
+def test_redis_failures_are_reported_as_unavailable(store, server):
+    server.connected = False
+    with pytest.raises(QuizSessionError) as error:
+        run(store.create(QUESTIONS))
+    assert error.value.reason == "unavailable"
@@ -0,0 +1,116 @@
+# tests/test_reindex.py
+import asyncio
+import hashlib
+
+import pytest
+
+# agents.health imports the health agent, and with it the Qdrant, LLM and PDF libraries
+pytest.importorskip("PyPDF2")
+pytest.importorskip("groq")
+pytest.importorskip("langgraph")
+pytest.importorskip("qdrant_client")
+pytest.importorskip("sentence_transformers")
+
+from agents.health import document_processor as module
+from agents.health.document_processor import document_processor
+from agents.health.local_vector_store import LocalVectorStore
+from agents.health.qdrant_client import collection_configs
+from utils.embedding_service import embedding_service
+from utils.pdf_extraction import PageText
+
+DOC_KEY = "user-1/leaflet.pdf"
+V1 = ["Aspirin reduces fever.", "Take it with food.", "Store below 25 degrees."]
+# Page 1 changed, page 2 moved to page 3, a page was added
+V2 = ["Aspirin reduces fever and pain.", "Ask a pharmacist.", "Take it with food.", "Store below 25 degrees."]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = LocalVectorStore(collection_name="reindex_test", path=str(tmp_path),
+                             index_fields=collection_configs()["health"].index_fields)
+    monkeypatch.setattr(module, "qdrant_client", store)
+    return store
+
+
+@pytest.fixture
+def embedded(monkeypatch):
+    """Texts sent to the embedding model, with a deterministic stand-in for it"""
+    texts = []
+
+    async def encode(batch):
+        texts.extend(batch)
+        return [list(hashlib.sha256(text.encode()).digest()[:8]) for text in batch]
+
+    monkeypatch.setattr(embedding_service, "encode", encode)
+    return texts
+
+
+def reindex(monkeypatch, pages, doc_id):
+    async def page_batches(source):
+        yield [PageText(number, text) for number, text in enumerate(pages, start=1)]
+
+    monkeypatch.setattr(module, "stream_pdf_page_batches", page_batches)
+    stats = {}
+    ok = asyncio.run(document_processor.reindex_document(b"%PDF", DOC_KEY, doc_id=doc_id,
+                                                         user_id="user-1", stats=stats))
+    return ok, stats
+
+
+def indexed(store):
+    return sorted((payload["doc_id"], payload["page_number"], payload["text"])
+                  for payload in store._payloads if payload is not None)
+
+
+def test_first_version_embeds_every_page(monkeypatch, store, embedded):
+    ok, stats = reindex(monkeypatch, V1, "v1")
+    assert ok and stats == {"pages": 3, "chunks": 3}
+    assert sorted(embedded) == sorted(V1)
+    assert indexed(store) == [("v1", 1, V1[0]), ("v1", 2, V1[1]), ("v1", 3, V1[2])]
+
+
+def test_new_version_embeds_only_changed_pages(monkeypatch, store, embedded):
+    reindex(monkeypatch, V1, "v1")
+    embedded.clear()
+
+    ok, stats = reindex(monkeypatch, V2, "v2")
+    assert ok and stats == {"pages": 4, "chunks": 2}
+    assert sorted(embedded) == sorted([V2[0], V2[1]])
+    # Kept pages are copied with their new page numbers and the old version is gone
+    assert indexed(store) == [("v2", page, text) for page, text in enumerate(V2, start=1)]
+    pages = asyncio.run(store.get_indexed_pages(DOC_KEY))
+    assert len(pages) == 4 and all(versions == {"v2"} for versions in pages.values())
+
+
+def test_same_version_again_is_a_no_op(monkeypatch, store, embedded):
+    reindex(monkeypatch, V1, "v1")
+    before = indexed(store)
+    embedded.clear()
+
+    ok, stats = reindex(monkeypatch, V1, "v1")
+    assert ok and stats == {"pages": 3, "chunks": 0}
+    assert embedded == []
+    assert indexed(store) == before
+
+
+def test_repeated_pages_are_kept_apart(monkeypatch, store, embedded):
+    pages = ["Same text.", "Other text.", "Same text."]
+    reindex(monkeypatch, pages, "v1")
+    assert len(asyncio.run(store.get_indexed_pages(DOC_KEY))) == 3
+
+    ok, _ = reindex(monkeypatch, pages[:2], "v2")
+    assert ok
+    assert indexed(store) == [("v2", 1, "Same text."), ("v2", 2, "Other text.")]
+
+
+def test_failed_store_keeps_the_previous_version(monkeypatch, store, embedded):
+    reindex(monkeypatch, V1, "v1")
+
+    async def fail(documents):
+        return False
+
+    monkeypatch.setattr(store, "store_documents", fail)
+    ok, _ = reindex(monkeypatch, V2, "v2")
+    assert not ok
+    # v1 stays complete and searchable; the copies made for v2 are superseded next time
+    assert [row for row in indexed(store) if row[0] == "v1"] == [
+        ("v1", 1, V1[0]), ("v1", 2, V1[1]), ("v1", 3, V1[2])]
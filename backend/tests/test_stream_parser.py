@@ -0,0 +1,158 @@
+# tests/test_stream_parser.py
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from utils.stream_parser import JsonStreamParser, MCQStreamParser, loads_lenient, stream_completion
+
+DOCUMENT = {
+    "subject": "Biology",
+    "concepts": ["cell", "membrane \"lipid\" bilayer", "ATP\\ADP"],
+    "questions": [{"q": "What is a cell?", "n": 1}, {"q": "Name an organelle", "n": -2.5e3}],
+    "flags": {"reviewed": True, "score": None},
+}
+REPLY = "Sure! Here is the analysis:\n```json\n" + json.dumps(DOCUMENT, indent=2) + "\n```\nAnything else?"
+
+MCQ_TEXT = """Here are your questions.
+Question 1: What carries oxygen in the blood?
+A) Platelets
+B) Red blood cells
+C) Plasma
+D) White blood cells
+Correct Answer: B
+Explanation: Haemoglobin in red cells binds oxygen.
+Question 2: Which organ filters blood
+and produces urine?
+A) Liver
+B) Heart
+C) Kidney (Correct)
+D) Lung
+Explanation: The kidneys filter blood.
+Question 3: Unfinished question?
+A) Only one option
+"""
+
+
+def _feed(parser, text, size):
+    events = []
+    for start in range(0, len(text), size):
+        events += parser.feed(text[start:start + size])
+    return events
+
+
+@pytest.mark.parametrize("size", [1, 3, 17, len(REPLY)])
+def test_json_events_in_any_chunking(size):
+    parser = JsonStreamParser(max_depth=2)
+    events = _feed(parser, REPLY, size)
+    assert parser.done
+    assert parser.close() == DOCUMENT
+    assert events == [
+        (("subject",), "Biology"),
+        (("concepts", 0), "cell"),
+        (("concepts", 1), "membrane \"lipid\" bilayer"),
+        (("concepts", 2), "ATP\\ADP"),
+        (("concepts",), DOCUMENT["concepts"]),
+        (("questions", 0), DOCUMENT["questions"][0]),
+        (("questions", 1), DOCUMENT["questions"][1]),
+        (("questions",), DOCUMENT["questions"]),
+        (("flags", "reviewed"), True),
+        (("flags", "score"), None),
+        (("flags",), DOCUMENT["flags"]),
+    ]
+
+
+def test_max_depth_limits_events():
+    parser = JsonStreamParser(max_depth=1)
+    paths = [path for path, _ in parser.feed(REPLY)]
+    assert paths == [("subject",), ("concepts",), ("questions",), ("flags",)]
+
+
+@pytest.mark.parametrize("cut, expected", [
+    # Cut inside a string value: the partial text is kept
+    ('{"summary": "The heart pumps', {"summary": "The heart pumps"}),
+    # Cut inside an escape sequence
+    ('{"summary": "line\\u00', {"summary": "line"}),
+    # Cut inside a member of an array: complete elements survive, the open one is closed empty
+    ('{"items": [1, 2, {"a": 3}, {"b":', {"items": [1, 2, {"a": 3}, {}]}),
+    ('{"items": [1, 2, 3', {"items": [1, 2]}),
+    # Cut inside a key: the half-written member is dropped
+    ('{"done": true, "una', {"done": True}),
+])
+def test_truncated_json_is_repaired(cut, expected):
+    parser = JsonStreamParser()
+    parser.feed(cut)
+    assert not parser.done
+    assert parser.close() == expected
+
+
+def test_unsalvageable_json_raises():
+    with pytest.raises(ValueError):
+        JsonStreamParser().close()
+    parser = JsonStreamParser()
+    parser.feed("no json here")
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_loads_lenient():
+    assert loads_lenient('{"a": [1, 2]}') == {"a": [1, 2]}
+    assert loads_lenient('{"a": [1, 2]} trailing chatter') == {"a": [1, 2]}
+    assert loads_lenient('```json\n[{"a": 1}, {"b": 2}, {"c"') == [{"a": 1}, {"b": 2}, {}]
+    with pytest.raises(ValueError):
+        loads_lenient("plain prose")
+
+
+@pytest.mark.parametrize("size", [1, 10, len(MCQ_TEXT)])
+def test_mcq_questions_are_emitted_when_complete(size):
+    parser = MCQStreamParser()
+    fed = [(start, question) for start in range(0, len(MCQ_TEXT), size)
+           for question in parser.feed(MCQ_TEXT[start:start + size])]
+    closed = parser.close()
+
+    # The first question is complete at its explanation, before the second one starts
+    assert fed[0][0] < MCQ_TEXT.index("Question 2")
+    assert [question for _, question in fed] == [
+        {"question": "What carries oxygen in the blood?",
+         "options": {"A": "Platelets", "B": "Red blood cells", "C": "Plasma", "D": "White blood cells"},
+         "correct_answer": "B", "explanation": "Haemoglobin in red cells binds oxygen."},
+        {"question": "Which organ filters blood and produces urine?",
+         "options": {"A": "Liver", "B": "Heart", "C": "Kidney", "D": "Lung"},
+         "correct_answer": "C", "explanation": "The kidneys filter blood."},
+    ]
+    # The incomplete last question is only handed over on close()
+    assert closed == [{"question": "Unfinished question?", "options": {"A": "Only one option"},
+                       "correct_answer": "", "explanation": ""}]
+
+
+def _completion_chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+def test_stream_completion_yields_deltas():
+    def create():
+        yield _completion_chunk("Hel")
+        yield _completion_chunk(None)
+        yield SimpleNamespace(choices=[])
+        yield _completion_chunk("lo")
+
+    async def collect():
+        return [delta async for delta in stream_completion(create)]
+
+    assert asyncio.run(collect()) == ["Hel", "lo"]
+
+
+def test_stream_completion_raises_client_errors():
+    def create():
+        yield _completion_chunk("partial")
+        raise ConnectionError("stream dropped")
+
+    async def collect():
+        deltas = []
+        with pytest.raises(ConnectionError):
+            async for delta in stream_completion(create):
+                deltas.append(delta)
+        return deltas
+
+    assert asyncio.run(collect()) == ["partial"]
@@ -0,0 +1,95 @@
+# tests/test_text_chunker.py
+import pytest
+
+from utils.text_chunker import PAGE_SEPARATOR, TextChunker, count_tokens, split_into_sections
+
+PAGES = [
+    (1, "Aspirin reduces fever. It also thins the blood!\n\nDosage depends on age. Ask a doctor?"),
+    (2, "Children under 16 should avoid it.   Side effects include nausea, heartburn and bleeding."),
+    (3, "\n  Store below 25°C. Keep out of reach of children.\n\nSee the leaflet.  "),
+]
+
+
+def _words(text):
+    return " ".join(text.split())
+
+
+@pytest.mark.parametrize("text, tokens", [
+    ("", 0),
+    ("   ", 0),
+    ("one two three", 3),
+    ("Hello, world!", 4),
+    ("  spaced   out\n\ttext. ", 4),
+    ("naïve café, s'il vous plaît.", 8),
+])
+def test_count_tokens(text, tokens):
+    assert count_tokens(text) == tokens
+
+
+@pytest.mark.parametrize("chunk_tokens, overlap_tokens", [(8, 0), (12, 4), (30, 10), (1000, 0)])
+def test_chunks_are_sized_and_point_back_into_the_document(chunk_tokens, overlap_tokens):
+    document = PAGE_SEPARATOR.join(text for _, text in PAGES)
+    chunks = list(TextChunker(chunk_tokens, overlap_tokens).iter_chunks(PAGES))
+
+    assert [chunk.chunk_index for chunk in chunks] == list(range(len(chunks)))
+    for chunk in chunks:
+        assert 0 < chunk.token_count <= chunk_tokens
+        assert chunk.token_count == count_tokens(chunk.text)
+        assert _words(document[chunk.start:chunk.end]) == _words(chunk.text)
+        assert 1 <= chunk.page_start <= chunk.page_end <= 3
+    # Nothing is lost: the first chunk starts at the first word, the last ends at the last one
+    assert chunks[0].start == 0 and chunks[-1].end == len(document.rstrip())
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous.start < chunk.start and previous.end < chunk.end
+        if not overlap_tokens:
+            assert chunk.start > previous.end
+
+
+def test_overlap_repeats_whole_sentences():
+    text = "One two three. Four five six. Seven eight nine. Ten eleven twelve."
+    chunks = TextChunker(chunk_tokens=8, overlap_tokens=4).chunk_text(text)
+    assert [chunk.text for chunk in chunks] == [
+        "One two three. Four five six.",
+        "Four five six. Seven eight nine.",
+        "Seven eight nine. Ten eleven twelve.",
+    ]
+
+
+def test_oversized_sentence_is_split_on_whitespace():
+    text = " ".join(f"word{i}" for i in range(25))
+    chunks = TextChunker(chunk_tokens=10).chunk_text(text)
+    assert [chunk.token_count for chunk in chunks] == [10, 10, 5]
+    assert " ".join(chunk.text for chunk in chunks) == text
+    assert all(text[chunk.start:chunk.end] == chunk.text for chunk in chunks)
+
+
+def test_split_on_paragraphs():
+    text = "First paragraph. Still first.\n\nSecond paragraph.\n\nThird."
+    chunks = TextChunker(chunk_tokens=100, split_on_paragraphs=True).chunk_text(text)
+    assert [chunk.text for chunk in chunks] == ["First paragraph. Still first.", "Second paragraph.", "Third."]
+    assert len(TextChunker(chunk_tokens=100).chunk_text(text)) == 1
+
+
+def test_stream_matches_iter_chunks():
+    chunker = TextChunker(chunk_tokens=12, overlap_tokens=3)
+    stream = chunker.stream()
+    streamed = [chunk for page_number, text in PAGES for chunk in stream.feed(page_number, text)]
+    streamed += stream.flush()
+    assert streamed == list(chunker.iter_chunks(PAGES))
+
+
+def test_custom_token_counter():
+    chunks = TextChunker(chunk_tokens=10, token_counter=len).chunk_text("abcd efgh. ijkl. mnop qrst.")
+    assert [chunk.text for chunk in chunks] == ["abcd efgh.", "ijkl.", "mnop qrst."]
+
+
+def test_overlap_must_be_smaller_than_chunk():
+    with pytest.raises(ValueError):
+        TextChunker(chunk_tokens=10, overlap_tokens=10)
+
+
+def test_split_into_sections_covers_the_text():
+    text = PAGE_SEPARATOR.join(text for _, text in PAGES) * 3
+    sections = split_into_sections(text, section_tokens=5, max_sections=4)
+    assert len(sections) <= 4
+    assert _words(" ".join(sections)) == _words(text)
@@ -0,0 +1,158 @@
+# utils/embedding_service.py
+"""
+In-process embedding service with dynamic micro-batching.
+
+Usage:
+    from utils.embedding_service import embedding_service
+    await embedding_service.initialize()
+    vectors = await embedding_service.encode(["chunk one", "chunk two"])
+    query_vector = await embedding_service.encode_one("what are the symptoms?")
+
+One SentenceTransformer instance is shared by every caller. Concurrent encode
+requests are queued and merged into one model call once either
+EMBED_MAX_BATCH_SIZE texts are waiting or EMBED_MAX_WAIT_MS has passed since
+the first one arrived. Inference runs on a dedicated thread, so the event loop
+is never blocked.
+"""
+
+from __future__ import annotations
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from sentence_transformers import SentenceTransformer
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_Request = Tuple[List[str], "asyncio.Future[List[List[float]]]"]
+
+
+class EmbeddingService:
+    def __init__(self, model_name: Optional[str] = None, max_batch_size: Optional[int] = None,
+                 max_wait_ms: Optional[float] = None):
+        self.model_name = model_name or settings.HF_MODEL_NAME
+        self.max_batch_size = max_batch_size or settings.EMBED_MAX_BATCH_SIZE
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.EMBED_MAX_WAIT_MS) / 1000
+        self.model: Optional[SentenceTransformer] = None
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._init_lock: Optional[asyncio.Lock] = None
+
+        self._metrics = {
+            "requests": 0,
+            "texts": 0,
+            "batches": 0,
+            "last_batch_size": 0,
+            "max_batch_size_seen": 0,
+            "inference_seconds": 0.0,
+        }
+
+    async def initialize(self) -> bool:
+        """Load the model (once) and start the batching worker on the running loop"""
+        if self._init_lock is None:
+            self._init_lock = asyncio.Lock()
+        async with self._init_lock:
+            try:
+                if self.model is None:
+                    loop = asyncio.get_running_loop()
+                    self.model = await loop.run_in_executor(
+                        self._executor, SentenceTransformer, self.model_name
+                    )
+                    logger.info(f"Loaded embedding model: {self.model_name}")
+                if self._worker is None or self._worker.done():
+                    self._queue = asyncio.Queue()
+                    self._worker = asyncio.create_task(self._batch_loop())
+                return True
+            except Exception as e:
+                logger.error(f"Failed to initialize embedding service: {e}")
+                return False
+
+    def get_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    async def encode(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts; concurrent callers are served from shared batches"""
+        if not texts:
+            return []
+        if self._worker is None or self._worker.done():
+            if not await self.initialize():
+                raise RuntimeError("Embedding service is not available")
+
+        future = asyncio.get_running_loop().create_future()
+        self._metrics["requests"] += 1
+        await self._queue.put((list(texts), future))
+        return await future
+
+    async def encode_one(self, text: str) -> List[float]:
+        return (await self.encode([text]))[0]
+
+    def _encode_sync(self, texts: List[str]) -> List[List[float]]:
+        return self.model.encode(texts, batch_size=self.max_batch_size,
+                                 show_progress_bar=False).tolist()
+
+    async def _next_batch(self) -> List[_Request]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        size = len(batch[0][0])
+        deadline = loop.time() + self.max_wait
+
+        while size < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                request = await asyncio.wait_for(self._queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            batch.append(request)
+            size += len(request[0])
+        return batch
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            texts = [text for request_texts, _ in batch for text in request_texts]
+
+            started = loop.time()
+            try:
+                vectors = await loop.run_in_executor(self._executor, self._encode_sync, texts)
+            except Exception as e:
+                logger.error(f"Embedding batch of {len(texts)} texts failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self._metrics["batches"] += 1
+            self._metrics["texts"] += len(texts)
+            self._metrics["last_batch_size"] = len(texts)
+            self._metrics["max_batch_size_seen"] = max(self._metrics["max_batch_size_seen"], len(texts))
+            self._metrics["inference_seconds"] += loop.time() - started
+
+            # Hand each caller back its own slice of the batch
+            offset = 0
+            for request_texts, future in batch:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(request_texts)])
+                offset += len(request_texts)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Queue depth and batching statistics"""
+        batches = self._metrics["batches"]
+        return {
+            **self._metrics,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "avg_batch_size": round(self._metrics["texts"] / batches, 2) if batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+
+# Global embedding service instance
+embedding_service = EmbeddingService()
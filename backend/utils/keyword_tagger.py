@@ -0,0 +1,86 @@
+# utils/keyword_tagger.py
+"""
+Single-pass multi-keyword tagger for chunk metadata.
+
+Usage:
+    from utils.keyword_tagger import KeywordTagger
+    tagger = KeywordTagger({"medical": ["patient", "dose"], "hard": ["theorem"]})
+    tagger.tag("The patient's dose...")          # {"medical": 2, "hard": 0}
+    tagger.tag_batch(["...", "..."])             # one regex pass over all texts
+
+All vocabularies are compiled into one case-insensitive alternation, so a text
+is scanned once no matter how many tags or keywords there are. Keywords match
+as substrings (like the `keyword in text.lower()` checks this replaces), and a
+keyword may belong to several tags. A match is mapped back to its keyword by
+lower-casing it; spellings that IGNORECASE matches but lower() doesn't map
+back (Turkish "İ" and "ı") are resolved against the keywords once and cached.
+"""
+
+from __future__ import annotations
+import re
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Mapping
+
+# Joins texts for a batched scan; never part of a keyword
+_BATCH_SEPARATOR = "\x00"
+
+
+class KeywordTagger:
+    def __init__(self, vocabularies: Mapping[str, Iterable[str]]):
+        self.tags = list(vocabularies)
+        self._keyword_tags: Dict[str, List[str]] = {}
+        for tag, keywords in vocabularies.items():
+            for keyword in keywords:
+                tags = self._keyword_tags.setdefault(keyword.lower(), [])
+                if tag not in tags:
+                    tags.append(tag)
+
+        # Longest keywords first so e.g. "pressure" wins over "press" at the same position
+        self._keywords = sorted(self._keyword_tags, key=len, reverse=True)
+        alternation = "|".join(map(re.escape, self._keywords))
+        self._pattern = re.compile(alternation, re.IGNORECASE) if alternation else None
+        # Matched spellings whose lower() is not a keyword -> tags of the keyword they matched
+        self._spelling_tags: Dict[str, List[str]] = {}
+
+    def _empty(self) -> Dict[str, int]:
+        return dict.fromkeys(self.tags, 0)
+
+    def _tags_for(self, matched: str) -> List[str]:
+        tags = self._keyword_tags.get(matched.lower())
+        if tags is not None:
+            return tags
+        tags = self._spelling_tags.get(matched)
+        if tags is None:
+            # The first keyword in alternation order is the branch the pattern took
+            tags = next((self._keyword_tags[keyword] for keyword in self._keywords
+                         if re.fullmatch(re.escape(keyword), matched, re.IGNORECASE)), [])
+            self._spelling_tags[matched] = tags
+        return tags
+
+    def tag(self, text: str) -> Dict[str, int]:
+        """Keyword hit counts per tag for one text"""
+        counts = self._empty()
+        if self._pattern is None:
+            return counts
+        for match in self._pattern.finditer(text):
+            for tag in self._tags_for(match.group()):
+                counts[tag] += 1
+        return counts
+
+    def tag_batch(self, texts: List[str]) -> List[Dict[str, int]]:
+        """Keyword hit counts per tag for many texts, in a single regex pass"""
+        results = [self._empty() for _ in texts]
+        if self._pattern is None or not texts:
+            return results
+
+        # Start offset of every text inside the joined string
+        starts, offset = [], 0
+        for text in texts:
+            starts.append(offset)
+            offset += len(text) + len(_BATCH_SEPARATOR)
+
+        for match in self._pattern.finditer(_BATCH_SEPARATOR.join(texts)):
+            counts = results[bisect_right(starts, match.start()) - 1]
+            for tag in self._tags_for(match.group()):
+                counts[tag] += 1
+        return results
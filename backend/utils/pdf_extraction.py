@@ -0,0 +1,271 @@
+# utils/pdf_extraction.py
+"""
+Shared page-by-page PDF text extraction.
+
+Usage:
+    from utils.pdf_extraction import iter_pdf_pages, stream_pdf_page_batches
+    for page in iter_pdf_pages("guide.pdf"):
+        print(page.page_number, len(page.text))
+
+    # uploads can be parsed straight from memory, no temp file needed
+    pages = list(iter_pdf_pages(await pdf_file.read()))
+
+    # from async code: CPU work runs in a process pool, batches arrive in page order
+    async for pages in stream_pdf_page_batches("guide.pdf"):
+        ...
+
+Pages are yielded one at a time so callers can chunk/embed incrementally and
+never hold more than a page of text. PyMuPDF is used when installed (much
+faster), with PyPDF2 as the fallback.
+
+Every function takes a PdfSource: a file path, or the PDF itself as bytes,
+bytearray or memoryview. In-memory sources are opened with PyMuPDF's stream
+open (or a BytesIO for PyPDF2) without copying, and are handed to the process
+pool through shared memory instead of being pickled for every page range;
+workers read the shared block in place rather than copying it per range.
+"""
+
+from __future__ import annotations
+import asyncio
+import io
+import logging
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import AsyncIterator, Iterator, List, NamedTuple, Optional, Union
+
+import PyPDF2
+
+from config.settings import settings
+
+# optional: use PyMuPDF if present
+try:
+    import fitz  # type: ignore  # PyMuPDF
+    _HAS_PYMUPDF = True
+except Exception:
+    _HAS_PYMUPDF = False
+
+logger = logging.getLogger(__name__)
+
+
+# A PDF file path, or the document itself held in memory
+PdfSource = Union[str, bytes, bytearray, memoryview]
+
+
+class PageText(NamedTuple):
+    page_number: int  # 1-based
+    text: str
+
+
+def is_in_memory(source: PdfSource) -> bool:
+    return isinstance(source, (bytes, bytearray, memoryview))
+
+
+def describe_source(source: PdfSource) -> str:
+    """Short label for logs; never dumps the PDF bytes"""
+    if is_in_memory(source):
+        return f"<in-memory PDF, {memoryview(source).nbytes} bytes>"
+    return str(source)
+
+
+def _buffer(source: PdfSource) -> Union[bytes, memoryview]:
+    # PyMuPDF opens bytes and flat byte views in place but copies a bytearray
+    if isinstance(source, bytes) or (isinstance(source, memoryview) and source.format == "B"
+                                     and source.ndim == 1 and source.c_contiguous):
+        return source
+    view = memoryview(source)
+    return view.cast("B") if view.c_contiguous else view.tobytes()
+
+
+def _open_pymupdf(source: PdfSource):
+    if is_in_memory(source):
+        return fitz.open(stream=_buffer(source), filetype="pdf")
+    return fitz.open(source)
+
+
+def _open_pypdf2(source: PdfSource):
+    if is_in_memory(source):
+        return io.BytesIO(_buffer(source))
+    return open(source, 'rb')
+
+
+def _iter_pages_pymupdf(source: PdfSource, start: int, stop: Optional[int]) -> Iterator[PageText]:
+    with _open_pymupdf(source) as doc:
+        stop = doc.page_count if stop is None else min(stop, doc.page_count)
+        for index in range(start, stop):
+            text = doc.load_page(index).get_text()
+            if text and text.strip():
+                yield PageText(index + 1, text)
+
+
+def _iter_pages_pypdf2(source: PdfSource, start: int, stop: Optional[int]) -> Iterator[PageText]:
+    with _open_pypdf2(source) as file:
+        reader = PyPDF2.PdfReader(file)
+        stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+        for index in range(start, stop):
+            text = reader.pages[index].extract_text()
+            if text and text.strip():
+                yield PageText(index + 1, text)
+
+
+def iter_pdf_pages(source: PdfSource, start: int = 0, stop: Optional[int] = None) -> Iterator[PageText]:
+    """
+    Yield the non-empty pages of a PDF in order, from page index `start`
+    (0-based, inclusive) to `stop` (exclusive, default: end of document).
+    """
+    if _HAS_PYMUPDF:
+        pages = _iter_pages_pymupdf(source, start, stop)
+        try:
+            first = next(pages, None)
+        except Exception as e:
+            # Only fall back before anything was yielded, so pages never repeat
+            logger.warning(f"PyMuPDF could not read {describe_source(source)}, falling back to PyPDF2: {e}")
+        else:
+            if first is not None:
+                yield first
+                yield from pages
+            return
+
+    yield from _iter_pages_pypdf2(source, start, stop)
+
+
+def get_page_count(source: PdfSource) -> int:
+    """Number of pages in a PDF, without extracting any text"""
+    if _HAS_PYMUPDF:
+        try:
+            with _open_pymupdf(source) as doc:
+                return doc.page_count
+        except Exception as e:
+            logger.warning(f"PyMuPDF could not open {describe_source(source)}, falling back to PyPDF2: {e}")
+    with _open_pypdf2(source) as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+# ---------- Process-pool extraction ----------
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Lazily created process pool shared by all PDF extraction"""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=settings.PDF_EXTRACT_WORKERS)
+    return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+class _SharedPdf(NamedTuple):
+    # Handle to an in-memory PDF placed in shared memory for the worker processes
+    name: str
+    size: int
+
+
+@contextmanager
+def _attached(source) -> Iterator[PdfSource]:
+    """A task's PDF; a shared block stays attached and is read in place until the task ends"""
+    if not isinstance(source, _SharedPdf):
+        yield source
+        return
+    block = shared_memory.SharedMemory(name=source.name)
+    view = block.buf[:source.size]
+    try:
+        yield view
+    finally:
+        # The openers only borrow the buffer while open, so the view can be released now
+        view.release()
+        block.close()
+
+
+def _count_pages(source) -> int:
+    # Runs in a worker process
+    with _attached(source) as pdf:
+        return get_page_count(pdf)
+
+
+def _extract_page_range(source, start: int, stop: int) -> List[PageText]:
+    # Runs in a worker process
+    with _attached(source) as pdf:
+        return list(iter_pdf_pages(pdf, start, stop))
+
+
+async def stream_pdf_page_batches(source: PdfSource, max_pages: Optional[int] = None,
+                                  pages_per_task: Optional[int] = None) -> AsyncIterator[List[PageText]]:
+    """
+    Extract a PDF across the process pool in page ranges and yield each
+    range's pages in document order. At most two ranges per worker are in
+    flight, so memory stays bounded for very long documents.
+    Raises ValueError when the document exceeds the page limit.
+    """
+    max_pages = max_pages or settings.PDF_MAX_PAGES
+    pages_per_task = pages_per_task or settings.PDF_PAGES_PER_TASK
+    pool = get_process_pool()
+
+    # In-memory PDFs are copied into shared memory once instead of pickled per range
+    block = None
+    task_source = source
+    if is_in_memory(source):
+        view = memoryview(source).cast("B")
+        block = shared_memory.SharedMemory(create=True, size=max(1, view.nbytes))
+        block.buf[:view.nbytes] = view
+        task_source = _SharedPdf(block.name, view.nbytes)
+
+    # The pool's own futures, oldest first: unlike asyncio wrappers, they stay
+    # pending until a started task has really finished
+    in_flight: deque = deque()
+    try:
+        in_flight.append(pool.submit(_count_pages, task_source))
+        page_count = await asyncio.wrap_future(in_flight[0])
+        in_flight.popleft()
+        if page_count > max_pages:
+            raise ValueError(f"PDF has {page_count} pages, limit is {max_pages}")
+
+        ranges = deque((start, min(start + pages_per_task, page_count))
+                       for start in range(0, page_count, pages_per_task))
+        window = max(1, settings.PDF_EXTRACT_WORKERS * 2)
+        while ranges or in_flight:
+            while ranges and len(in_flight) < window:
+                start, stop = ranges.popleft()
+                in_flight.append(pool.submit(_extract_page_range, task_source, start, stop))
+            # Await the oldest range first so results come back in order
+            pages = await asyncio.wrap_future(in_flight[0])
+            in_flight.popleft()
+            yield pages
+    finally:
+        # Ranges that already started can't be cancelled; wait for them to
+        # detach from the shared block before it is unlinked
+        started = [future for future in in_flight if not future.cancel()]
+        if started:
+            await asyncio.wait([asyncio.wrap_future(future) for future in started])
+        if block is not None:
+            block.close()
+            block.unlink()
+
+
+async def extract_pdf_text(source: PdfSource, page_template: str = "{text}\n",
+                           max_pages: Optional[int] = None) -> str:
+    """Full document text, extracted in the process pool and joined in page order"""
+    parts: List[str] = []
+    async for pages in stream_pdf_page_batches(source, max_pages=max_pages):
+        parts.extend(page_template.format(page_number=page.page_number, text=page.text)
+                     for page in pages)
+    return "".join(parts)
+
+
+# Page template that split_marked_pages() can undo
+PAGE_MARKER_TEMPLATE = "--- Page {page_number} ---\n{text}\n\n"
+_PAGE_MARKER = re.compile(r"^--- Page (\d+) ---\n", re.MULTILINE)
+
+
+def split_marked_pages(text: str) -> List[PageText]:
+    """Pages back out of text extracted with PAGE_MARKER_TEMPLATE"""
+    parts = _PAGE_MARKER.split(text)
+    return [PageText(int(number), body[:-2] if body.endswith("\n\n") else body)
+            for number, body in zip(parts[1::2], parts[2::2])]
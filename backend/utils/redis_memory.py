@@ -143,3 +143,13 @@ class RedisMemory:
 
     def get_length(self, session_id: str) -> int:
         return self.client.llen(self._msg_key(session_id))
+
+# Global shared client: one connection pool for every store in the process
+_shared_client: Optional["redis.Redis"] = None
+
+def shared_client() -> "redis.Redis":
+    """The process-wide Redis client (REDIS_HOST/REDIS_PORT/REDIS_PASSWORD), created on first use"""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = RedisMemory().client
+    return _shared_client
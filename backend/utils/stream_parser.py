@@ -0,0 +1,307 @@
+# utils/stream_parser.py
+"""
+Incremental parsing of LLM output.
+
+Completions are consumed as their tokens arrive instead of after the whole
+reply: JsonStreamParser emits each top-level field (and each element of a
+top-level array field) as soon as its value closes, MCQStreamParser emits
+each "Question X: ..." block as soon as it is complete. Both salvage what
+they can when the reply is cut off (max_tokens) or followed by chatter, so
+a malformed tail no longer throws away the whole call.
+"""
+
+import asyncio
+import json
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+Path = Tuple[Union[str, int], ...]
+
+# Incomplete escape at the very end of a truncated string
+_DANGLING_ESCAPE = re.compile(r'\\(?:u[0-9a-fA-F]{0,3})?$')
+
+
+@dataclass
+class _Frame:
+    kind: str                   # "{" or "["
+    path: Path
+    expecting: str              # "key", "colon", "value" or "comma"
+    key: Optional[str] = None
+    key_start: int = -1
+    index: int = 0
+    value_start: int = -1
+    scalar: bool = False        # the open child is a bare number / true / false / null
+
+    @property
+    def child(self) -> Union[str, int]:
+        return self.key if self.kind == "{" else self.index
+
+
+class JsonStreamParser:
+    """
+    Feed a JSON completion chunk by chunk; feed() returns (path, value) for
+    every value up to `max_depth` that closed in that chunk, e.g.
+    (("questions", 0), {...}) and later (("questions",), [...]).
+    Text before the first { or [ (prose, code fences) and after the root
+    closes is ignored. close() returns the whole value, repaired if the
+    stream was cut off.
+    """
+
+    def __init__(self, max_depth: int = 2):
+        self.max_depth = max_depth
+        self.done = False
+        self._text = ""
+        self._pos = 0
+        self._root_start = -1
+        self._root_end = -1
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._string_is_key = False
+        self._escape = False
+        # Longest prefix known to become valid JSON once the open containers are closed
+        self._safe_end = -1
+        self._safe_closers = ""
+
+    def feed(self, chunk: str) -> List[Tuple[Path, Any]]:
+        events: List[Tuple[Path, Any]] = []
+        if self.done or not chunk:
+            return events
+        self._text += chunk
+        text = self._text
+        while self._pos < len(text) and not self.done:
+            i = self._pos
+            ch = text[i]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._string_closed(i, events)
+                continue
+
+            if not self._stack:
+                if ch in "{[":
+                    self._root_start = i
+                    self._push(ch, (), i)
+                continue
+
+            frame = self._stack[-1]
+            if frame.scalar and (ch in ",}]" or ch.isspace()):
+                self._child_closed(frame, i, events)
+
+            if ch == '"':
+                self._in_string = True
+                self._string_is_key = frame.kind == "{" and frame.expecting == "key"
+                if self._string_is_key:
+                    frame.key_start = i
+                else:
+                    self._open_child(frame, i)
+            elif ch in "{[":
+                self._open_child(frame, i)
+                self._push(ch, frame.path + (frame.child,), i)
+            elif ch in "}]":
+                self._stack.pop()
+                if not self._stack:
+                    self.done = True
+                    self._root_end = i + 1
+                else:
+                    self._child_closed(self._stack[-1], i + 1, events)
+            elif ch == ":":
+                frame.expecting = "value"
+            elif ch == ",":
+                frame.expecting = "key" if frame.kind == "{" else "value"
+            elif not ch.isspace() and frame.expecting == "value":
+                self._open_child(frame, i)
+                frame.scalar = True
+        return events
+
+    def close(self) -> Any:
+        """The complete value; a truncated stream is repaired. Raises ValueError if nothing is salvageable."""
+        if self.done:
+            return json.loads(self._text[self._root_start:self._root_end])
+        if self._root_start < 0:
+            raise ValueError("No JSON object or array in the response")
+
+        closers = self._closers()
+        if self._in_string and not self._string_is_key:
+            # Keep the partial string value: long text fields are worth more cut than dropped
+            head = _DANGLING_ESCAPE.sub("", self._text[self._root_start:])
+            try:
+                return json.loads(head + '"' + closers)
+            except ValueError:
+                pass
+        if self._safe_end < 0:
+            raise ValueError("Truncated before any complete value")
+        return json.loads(self._text[self._root_start:self._safe_end] + self._safe_closers)
+
+    def _closers(self) -> str:
+        return "".join("}" if frame.kind == "{" else "]" for frame in reversed(self._stack))
+
+    def _push(self, kind: str, path: Path, start: int):
+        self._stack.append(_Frame(kind=kind, path=path, expecting="key" if kind == "{" else "value"))
+        self._safe_end, self._safe_closers = start + 1, self._closers()
+
+    def _open_child(self, frame: _Frame, start: int):
+        frame.value_start = start
+        frame.expecting = "comma"
+
+    def _string_closed(self, end: int, events: List[Tuple[Path, Any]]):
+        frame = self._stack[-1]
+        if self._string_is_key:
+            try:
+                frame.key = json.loads(self._text[frame.key_start:end + 1])
+            except ValueError:
+                frame.key = self._text[frame.key_start + 1:end]
+            frame.expecting = "colon"
+        else:
+            self._child_closed(frame, end + 1, events)
+
+    def _child_closed(self, frame: _Frame, end: int, events: List[Tuple[Path, Any]]):
+        path = frame.path + (frame.child,)
+        raw = self._text[frame.value_start:end]
+        frame.scalar = False
+        if frame.kind == "[":
+            frame.index += 1
+        self._safe_end, self._safe_closers = end, self._closers()
+        if len(path) > self.max_depth:
+            return
+        try:
+            events.append((path, json.loads(raw)))
+        except ValueError:
+            # A malformed value (e.g. a bad literal) only costs itself
+            logger.debug(f"Skipping malformed JSON value at {path}: {raw[:80]!r}")
+
+
+def loads_lenient(text: str) -> Any:
+    """json.loads(), falling back to repairing truncated output or trailing garbage"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        parser = JsonStreamParser(max_depth=0)
+        parser.feed(text)
+        return parser.close()
+
+
+class MCQStreamParser:
+    """
+    Incremental parser for the MCQ text format (Question X: / A) ... D) /
+    Correct Answer: / Explanation:). feed() returns questions as soon as
+    they have a stem, four options, a correct letter and an explanation;
+    anything less complete is returned when the next question starts or
+    on close().
+    """
+
+    def __init__(self):
+        self._partial = ""
+        self._current: Optional[Dict[str, Any]] = None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        questions: List[Dict[str, Any]] = []
+        *lines, self._partial = (self._partial + chunk).split("\n")
+        for line in lines:
+            self._line(line.strip(), questions)
+        return questions
+
+    def close(self) -> List[Dict[str, Any]]:
+        questions: List[Dict[str, Any]] = []
+        if self._partial.strip():
+            self._line(self._partial.strip(), questions)
+        self._partial = ""
+        if self._current:
+            questions.append(self._current)
+            self._current = None
+        return questions
+
+    def _line(self, line: str, questions: List[Dict[str, Any]]):
+        current = self._current
+
+        # Detect question start
+        if line.lower().startswith('question'):
+            if current:
+                questions.append(current)
+            self._current = {
+                'question': line.split(':', 1)[1].strip() if ':' in line else line,
+                'options': {},
+                'correct_answer': '',
+                'explanation': ''
+            }
+            return
+        if current is None:
+            return
+
+        # Detect options
+        if re.match(r'^[A-D]\)', line):
+            option = line[0]
+            option_text = line[3:].strip()
+            if '(Correct)' in option_text:
+                option_text = option_text.replace('(Correct)', '').strip()
+                current['correct_answer'] = option
+            current['options'][option] = option_text
+
+        # Detect correct answer
+        elif line.lower().startswith('correct answer:'):
+            current['correct_answer'] = line.split(':', 1)[1].strip()
+
+        # Detect explanation
+        elif line.lower().startswith('explanation:'):
+            current['explanation'] = line.split(':', 1)[1].strip()
+            if len(current['options']) == 4 and current['correct_answer'] in ('A', 'B', 'C', 'D'):
+                questions.append(current)
+                self._current = None
+
+        # Continue building current question text
+        elif line and not current['options']:
+            current['question'] += ' ' + line
+
+
+async def stream_completion(create: Callable[[], Iterable[Any]]) -> AsyncIterator[str]:
+    """
+    Content deltas of a streamed Groq completion (`create` makes the call with
+    stream=True). The synchronous client is drained in a worker thread, so
+    the event loop is never blocked; stopping early abandons the stream.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    finished = object()
+    stopped = threading.Event()
+
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # Loop already closed
+            stopped.set()
+
+    def drain():
+        try:
+            for chunk in create():
+                if stopped.is_set():
+                    break
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    put(delta)
+        except Exception as e:
+            put(e)
+        finally:
+            put(finished)
+
+    loop.run_in_executor(None, drain)
+    try:
+        while True:
+            item = await queue.get()
+            if item is finished:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stopped.set()
@@ -0,0 +1,290 @@
+# utils/text_chunker.py
+"""
+Token-aware, single-pass text chunker shared by the health and education
+processors.
+
+Usage:
+    from utils.text_chunker import TextChunker
+    chunker = TextChunker(chunk_tokens=256, overlap_tokens=48)
+    for chunk in chunker.iter_chunks(iter_pdf_pages("guide.pdf")):
+        print(chunk.page_start, chunk.start, chunk.end, chunk.token_count)
+
+    # push-style, for pages arriving from async code
+    stream = chunker.stream()
+    for chunk in stream.feed(page_number, text): ...
+    for chunk in stream.flush(): ...
+
+Text is walked once as sentence spans. Chunks are sized in tokens and overlap
+by whole sentences, so words are never cut. A sentence longer than a chunk is
+split on whitespace into chunk-sized pieces, which do not overlap each other.
+Every chunk keeps (start, end) character offsets into the document (page texts
+joined by PAGE_SEPARATOR) and the range of pages it covers.
+
+Each page is split into sentences in one regex pass, and chunk boundaries are
+found by bisecting the running token total rather than by a loop per sentence.
+"""
+
+from __future__ import annotations
+import re
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from itertools import accumulate, compress, repeat
+from operator import add, ge
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+# Offsets are computed as if pages were joined with this separator
+PAGE_SEPARATOR = "\n\n"
+
+# A sentence ends at [.!?] followed by whitespace, or at a blank line. The
+# pattern opens with one character class so `re` can skip straight to
+# candidate characters; split() returns (sentence, boundary, mark) triples.
+_SENTENCE_BOUNDARY = re.compile(r'(([.!?\n])(?:(?<=[.!?])\s+|(?<=\n)\s*\n\s*))')
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WORD = re.compile(r'\S+')
+
+
+def count_tokens(text: str) -> int:
+    """Cheap tokenizer-free estimate: whitespace-separated words plus punctuation marks"""
+    return len(text.split()) + len(_PUNCTUATION.findall(text))
+
+
+@dataclass
+class Chunk:
+    text: str
+    chunk_index: int
+    start: int          # document character offset, inclusive
+    end: int            # document character offset, exclusive
+    page_start: int     # 1-based page numbers, 0 when the text had no pages
+    page_end: int
+    token_count: int
+
+
+class ChunkStream:
+    """Incremental chunking state for one document"""
+
+    def __init__(self, chunker: "TextChunker"):
+        self.chunker = chunker
+        # Spans still in the window or not yet reached, as parallel lists.
+        # _cum[i] is the token total before span i; it only ever grows, so
+        # window sizes are differences and cut points are bisections.
+        self._texts: List[str] = []
+        self._starts: List[int] = []
+        self._pages: List[int] = []
+        self._cum: List[int] = [0]
+        self._paragraphs: List[int] = []    # indexes of spans that begin a paragraph
+        self._window = 0                    # first span of the current window
+        self._emitted = 0                   # spans before this index are in an emitted chunk
+        self._offset = 0
+        self._next_index = 0
+
+    def feed(self, page_number: int, text: str) -> List[Chunk]:
+        """Add the next page of text and return the chunks it completed"""
+        if self._offset:
+            self._offset += len(PAGE_SEPARATOR)
+        base = self._offset
+        self._offset += len(text)
+
+        texts, starts, tokens, paragraph_starts = self.chunker._page_spans(text, base)
+        position = len(self._texts)
+        self._texts += texts
+        self._starts += starts
+        self._pages += repeat(page_number, len(texts))
+        self._cum += accumulate(tokens, initial=self._cum.pop())
+        if paragraph_starts is not None:
+            self._paragraphs += compress(range(position, position + len(texts)), paragraph_starts)
+
+        chunks: List[Chunk] = []
+        self._cut(position, chunks)
+        self._trim()
+        return chunks
+
+    def flush(self) -> List[Chunk]:
+        """Emit whatever is left once the document has ended"""
+        chunks: List[Chunk] = []
+        count = len(self._texts)
+        # A window holding only overlap from the previous chunk is not emitted again
+        if count > self._window and count > self._emitted:
+            chunks.append(self._emit(self._window, count))
+        self._texts, self._starts, self._pages = [], [], []
+        self._cum, self._paragraphs = [0], []
+        self._window = self._emitted = 0
+        return chunks
+
+    def _cut(self, position: int, chunks: List[Chunk]):
+        """Add spans from `position` on, closing the window at each one that doesn't fit or starts a paragraph"""
+        chunker, cum, paragraphs = self.chunker, self._cum, self._paragraphs
+        limit = chunker.chunk_tokens
+        count = len(self._texts)
+        while True:
+            window = self._window
+            # A span never closes an empty window
+            first = max(position, window + 1)
+            if first >= count:
+                return
+            cut = max(bisect_right(cum, cum[window] + limit, window) - 1, first)
+            force_break = False
+            if chunker.split_on_paragraphs:
+                next_paragraph = bisect_left(paragraphs, first)
+                if next_paragraph < len(paragraphs) and paragraphs[next_paragraph] <= cut:
+                    cut, force_break = paragraphs[next_paragraph], True
+            if cut >= count:
+                return
+
+            if cut > self._emitted:
+                chunks.append(self._emit(window, cut))
+            # Keep trailing whole sentences as overlap, leaving room for the new span
+            keep = 0 if force_break else min(chunker.overlap_tokens, limit - (cum[cut + 1] - cum[cut]))
+            self._window = bisect_left(cum, cum[cut] - max(keep, 0), window, cut)
+            position = cut + 1
+
+    def _trim(self):
+        """Forget spans that have left the window"""
+        drop = self._window
+        if not drop:
+            return
+        del self._texts[:drop], self._starts[:drop], self._pages[:drop], self._cum[:drop]
+        self._paragraphs = [index - drop for index in self._paragraphs[bisect_left(self._paragraphs, drop):]]
+        self._window = 0
+        self._emitted -= drop
+
+    def _emit(self, start: int, stop: int) -> Chunk:
+        last = stop - 1
+        chunk = Chunk(
+            text=" ".join(self._texts[start:stop]),
+            chunk_index=self._next_index,
+            start=self._starts[start],
+            end=self._starts[last] + len(self._texts[last]),
+            page_start=self._pages[start],
+            page_end=self._pages[last],
+            token_count=self._cum[stop] - self._cum[start],
+        )
+        self._next_index += 1
+        self._emitted = stop
+        return chunk
+
+
+class TextChunker:
+    def __init__(self, chunk_tokens: int = 256, overlap_tokens: int = 0,
+                 split_on_paragraphs: bool = False,
+                 token_counter: Optional[Callable[[str], int]] = None):
+        if overlap_tokens >= chunk_tokens:
+            raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.split_on_paragraphs = split_on_paragraphs
+        self.token_counter = token_counter or count_tokens
+
+    def stream(self) -> ChunkStream:
+        return ChunkStream(self)
+
+    def iter_chunks(self, pages: Iterable[Tuple[int, str]]) -> Iterator[Chunk]:
+        """Chunk an iterable of (page_number, text) pairs, e.g. PageText"""
+        stream = self.stream()
+        for page_number, text in pages:
+            yield from stream.feed(page_number, text)
+        yield from stream.flush()
+
+    def chunk_text(self, text: str) -> List[Chunk]:
+        """Chunk a single text without page information"""
+        return list(self.iter_chunks([(0, text)]))
+
+    def _page_spans(self, text: str, base: int) -> Tuple[List[str], List[int], List[int], Optional[List[bool]]]:
+        """
+        Sentences of one page as parallel lists: texts, document offsets,
+        token counts and (when splitting on paragraphs) paragraph starts.
+        Each text is an exact slice of the page, so it ends at start + len.
+        """
+        parts = _SENTENCE_BOUNDARY.split(text)
+        raws, boundaries, marks = parts[0::3], parts[1::3], parts[2::3]
+        del parts[2::3]
+        starts = list(accumulate(map(len, parts), initial=base))[0::2]
+
+        # Sentence-ending punctuation stays with its sentence; a "\n" mark is stripped off again
+        marks.append("")
+        texts = list(map(str.strip, map(add, raws, marks)))
+        # Boundaries swallow the whitespace after them, so only the page can start with any
+        starts[0] += len(raws[0]) - len(raws[0].lstrip())
+        paragraph_starts = None
+        if self.split_on_paragraphs:
+            paragraph_starts = [True]
+            paragraph_starts += map(ge, map(str.count, boundaries, repeat("\n")), repeat(2))
+
+        if not all(texts):
+            keep = list(map(bool, texts))
+            texts, starts = list(compress(texts, keep)), list(compress(starts, keep))
+            if paragraph_starts is not None:
+                paragraph_starts = list(compress(paragraph_starts, keep))
+
+        tokens = list(map(self.token_counter, texts))
+
+        if tokens and max(tokens) > self.chunk_tokens:
+            return self._split_oversized(texts, starts, tokens, paragraph_starts)
+        return texts, starts, tokens, paragraph_starts
+
+    def _split_oversized(self, texts: List[str], starts: List[int], tokens: List[int],
+                         paragraph_starts: Optional[List[bool]]
+                         ) -> Tuple[List[str], List[int], List[int], Optional[List[bool]]]:
+        """
+        Break sentences longer than a chunk on whitespace, so words stay whole.
+        Each piece fills a chunk on its own, so there is no room to repeat the
+        previous piece: consecutive pieces of one sentence do not overlap.
+        """
+        split_texts: List[str] = []
+        split_starts: List[int] = []
+        split_tokens: List[int] = []
+        split_paragraphs: List[bool] = []
+        for index, (sentence, start, sentence_tokens) in enumerate(zip(texts, starts, tokens)):
+            paragraph_start = paragraph_starts is not None and paragraph_starts[index]
+            pieces = ([(0, len(sentence), sentence_tokens)] if sentence_tokens <= self.chunk_tokens
+                      else self._sentence_pieces(sentence))
+            for piece_start, piece_end, piece_tokens in pieces:
+                split_texts.append(sentence[piece_start:piece_end])
+                split_starts.append(start + piece_start)
+                split_tokens.append(piece_tokens)
+                split_paragraphs.append(paragraph_start)
+                paragraph_start = False
+        return (split_texts, split_starts, split_tokens,
+                split_paragraphs if paragraph_starts is not None else None)
+
+    def _sentence_pieces(self, sentence: str) -> Iterator[Tuple[int, int, int]]:
+        """(start, end, tokens) of whole-word pieces of one sentence, in a single walk over its words"""
+        default_counter = self.token_counter is count_tokens
+        if default_counter:
+            # A word is one token plus its punctuation marks, located once for the sentence
+            marks = [match.start() for match in _PUNCTUATION.finditer(sentence)]
+        next_mark = 0
+        piece_start = piece_end = None
+        piece_tokens = 0
+        for word in _WORD.finditer(sentence):
+            if default_counter:
+                counted = next_mark
+                while next_mark < len(marks) and marks[next_mark] < word.end():
+                    next_mark += 1
+                word_tokens = 1 + next_mark - counted
+            else:
+                word_tokens = self.token_counter(word.group())
+            if piece_start is not None and piece_tokens + word_tokens > self.chunk_tokens:
+                yield piece_start, piece_end, piece_tokens
+                piece_start, piece_tokens = None, 0
+            if piece_start is None:
+                piece_start = word.start()
+            piece_end = word.end()
+            piece_tokens += word_tokens
+        if piece_start is not None:
+            yield piece_start, piece_end, piece_tokens
+
+
+def split_into_sections(text: str, section_tokens: int, max_sections: int) -> List[str]:
+    """
+    Consecutive token-budgeted sections covering the whole text (sections grow
+    so there are never more than `max_sections`). Each section is a slice of
+    the original text, so line breaks and page markers survive.
+    """
+    max_sections = max(1, max_sections)
+    section_tokens = max(section_tokens, -(-count_tokens(text) // max_sections))
+    chunks = TextChunker(section_tokens).chunk_text(text)
+    # Whole sentences can leave sections short of the budget; the tail is folded into the last one
+    if len(chunks) > max_sections:
+        chunks[max_sections - 1].end = chunks[-1].end
+        del chunks[max_sections:]
+    return [text[chunk.start:chunk.end] for chunk in chunks]
@@ -0,0 +1,159 @@
+# utils/uploads.py
+"""
+Streamed, size-limited handling of uploaded files.
+
+Usage:
+    from utils.uploads import received_upload
+    async with received_upload(pdf_file) as upload:
+        await agent.process(upload.source, doc_id=upload.sha256)
+
+The upload is read in UPLOAD_CHUNK_SIZE pieces, hashed on the way through, and
+rejected with 413 as soon as it passes MAX_UPLOAD_BYTES. With UPLOAD_IN_MEMORY
+it is kept in one growing buffer and `source` is a memoryview over it that the
+PDF extraction parses directly; otherwise it is copied to a uniquely named
+temp file (so concurrent uploads with the same filename never collide) and
+`source` is that path.
+"""
+
+from __future__ import annotations
+import hashlib
+import logging
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional, Union
+
+from fastapi import HTTPException, UploadFile, status
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SavedUpload:
+    path: str
+    filename: str
+    size: int
+    sha256: str
+
+    @property
+    def source(self) -> str:
+        return self.path
+
+
+@dataclass
+class BufferedUpload:
+    data: memoryview
+    filename: str
+    size: int
+    sha256: str
+
+    @property
+    def source(self) -> memoryview:
+        return self.data
+
+
+Upload = Union[SavedUpload, BufferedUpload]
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit",
+    )
+
+
+def _check_declared_size(upload: UploadFile, max_bytes: int) -> None:
+    # Reject up front when the client told us the size
+    if upload.size is not None and upload.size > max_bytes:
+        raise _too_large(max_bytes)
+
+
+def remove_upload(upload: Upload) -> None:
+    if isinstance(upload, BufferedUpload):
+        # Nothing on disk; the buffer is freed with its last reference
+        return
+    try:
+        os.remove(upload.path)
+    except FileNotFoundError:
+        pass
+
+
+async def read_upload(upload: UploadFile, max_bytes: Optional[int] = None,
+                      chunk_size: Optional[int] = None) -> BufferedUpload:
+    """Read an upload into memory, hashing it and enforcing the size cap"""
+    max_bytes = max_bytes or settings.MAX_UPLOAD_BYTES
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    _check_declared_size(upload, max_bytes)
+
+    buffer = bytearray()
+    digest = hashlib.sha256()
+    while True:
+        block = await upload.read(chunk_size)
+        if not block:
+            break
+        if len(buffer) + len(block) > max_bytes:
+            raise _too_large(max_bytes)
+        digest.update(block)
+        buffer += block
+
+    return BufferedUpload(data=memoryview(buffer), filename=upload.filename or "",
+                          size=len(buffer), sha256=digest.hexdigest())
+
+
+async def save_upload(upload: UploadFile, max_bytes: Optional[int] = None,
+                      chunk_size: Optional[int] = None, suffix: str = ".pdf") -> SavedUpload:
+    """Stream an upload to a unique temp file, hashing it and enforcing the size cap"""
+    max_bytes = max_bytes or settings.MAX_UPLOAD_BYTES
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    _check_declared_size(upload, max_bytes)
+
+    fd, path = tempfile.mkstemp(prefix="upload_", suffix=suffix, dir=settings.UPLOAD_TEMP_DIR or None)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                block = await upload.read(chunk_size)
+                if not block:
+                    break
+                size += len(block)
+                if size > max_bytes:
+                    raise _too_large(max_bytes)
+                digest.update(block)
+                out.write(block)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    return SavedUpload(path=path, filename=upload.filename or "", size=size, sha256=digest.hexdigest())
+
+
+@asynccontextmanager
+async def spooled_upload(upload: UploadFile, max_bytes: Optional[int] = None,
+                         suffix: str = ".pdf") -> AsyncIterator[SavedUpload]:
+    """save_upload() as a context manager that always removes the temp file"""
+    saved = await save_upload(upload, max_bytes=max_bytes, suffix=suffix)
+    try:
+        yield saved
+    finally:
+        remove_upload(saved)
+
+
+async def receive_upload(upload: UploadFile, max_bytes: Optional[int] = None) -> Upload:
+    """read_upload() or save_upload(), depending on UPLOAD_IN_MEMORY"""
+    if settings.UPLOAD_IN_MEMORY:
+        return await read_upload(upload, max_bytes=max_bytes)
+    return await save_upload(upload, max_bytes=max_bytes)
+
+
+@asynccontextmanager
+async def received_upload(upload: UploadFile, max_bytes: Optional[int] = None) -> AsyncIterator[Upload]:
+    """receive_upload() as a context manager that always releases the upload"""
+    received = await receive_upload(upload, max_bytes=max_bytes)
+    try:
+        yield received
+    finally:
+        remove_upload(received)